@@ -34,8 +34,8 @@ def is_non_answer(text: str) -> bool:
     text_lower = text.lower()
     return any(t in text_lower for t in triggers)
 
-def is_graph_intent(question: str) -> bool:
-    lang = detect_language(question)
+def is_graph_intent(question: str, lang: str = None) -> bool:
+    lang = lang or detect_language(question)
     # q = question.lower()
 
     # graph_triggers = [
@@ -56,8 +56,8 @@ def is_graph_intent(question: str) -> bool:
     return len(ents) > 0
 
 
-def graph_query_from_question(question: str):
-    lang = detect_language(question)
+def graph_query_from_question(question: str, lang: str = None):
+    lang = lang or detect_language(question)
     ents = extract_entities_smart(question, lang)
     return ents[0]["name"] if ents else None
 
@@ -77,11 +77,11 @@ def answer(question: str):
     # 0. Detect graph-native intent
     if query_lang == "ar":
         doc_specific = is_document_specific(question)
-    graph_intent = is_graph_intent(question)
+    graph_intent = is_graph_intent(question, query_lang)
 
     # 1. GRAPH-FIRST for graph-native questions
     if graph_intent:
-        entity = graph_query_from_question(question)
+        entity = graph_query_from_question(question, query_lang)
         graph_hits = graph_search(entity)
 
         if graph_hits:
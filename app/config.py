@@ -32,6 +32,12 @@ NEO4J_USER = neo4j_creds["NEO4J_USERNAME"]
 NEO4J_PASSWORD = neo4j_creds["NEO4J_PASSWORD"]
 NEO4J_DATABASE = neo4j_creds.get("NEO4J_DATABASE", "neo4j")
 
+# One pooled driver per process (plus an async one in the API)
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT_S = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT_S", "30"))
+NEO4J_CONNECTION_TIMEOUT_S = float(os.getenv("NEO4J_CONNECTION_TIMEOUT_S", "15"))
+NEO4J_MAX_CONNECTION_LIFETIME_S = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME_S", "3600"))
+
 
 FERNET_KEY = os.getenv("FERNET_KEY")  # or from secure store
 cipher = Fernet(FERNET_KEY.encode())
@@ -47,8 +53,115 @@ for line in decrypted.splitlines():
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
 
+# Language ID: memoized results per distinct text (queries, chunks)
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "65536"))
+
 AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
 AZURE_DOCUMENT_INTELLIGENCE_KEY = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_KEY")
 
-FAISS_INDEX_PATH = "./data/faiss.index"
-METADATA_PATH = "./data/metadata.pkl"
+# OCR: azure | stub (offline, uses the PDF's text layer). PDFs are split into
+# page-range parts analysed concurrently, so size is no longer capped at the
+# 20MB inline request limit; INGEST_MAX_UPLOAD_MB bounds uploads instead
+OCR_BACKEND = os.getenv("OCR_BACKEND", "azure")
+OCR_PAGES_PER_PART = int(os.getenv("OCR_PAGES_PER_PART", "10"))
+OCR_MAX_PART_MB = int(os.getenv("OCR_MAX_PART_MB", "20"))
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))
+OCR_STUB_LATENCY_MS = int(os.getenv("OCR_STUB_LATENCY_MS", "0"))
+INGEST_MAX_UPLOAD_MB = int(os.getenv("INGEST_MAX_UPLOAD_MB", "500"))
+
+# Near-duplicate chunks (SimHash over word 3-grams) are dropped before embedding.
+# Scope: document (repeats within one PDF) | corpus (also chunks already stored) | off.
+# Max Hamming distance out of 64 bits; at most 3 (the band index relies on it)
+NEAR_DUP_SCOPE = os.getenv("NEAR_DUP_SCOPE", "document")
+NEAR_DUP_MAX_DISTANCE = min(int(os.getenv("NEAR_DUP_MAX_DISTANCE", "3")), 3)
+
+# Embedding provider: openai | hashing (local, deterministic, offline).
+# EMBEDDING_DIM is also the vector store's dimension
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "3072"))
+
+# Embedding requests: token/item-bounded batches sent concurrently, with
+# adaptive backoff on 429s (API caps: 300k tokens / 2048 inputs per request)
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "512"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+
+# Content-addressed embedding cache: (model, sha256(text)) -> vector, LRU-evicted
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+EMBEDDING_CACHE_PATH = "./data/embeddings.db"
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "2048"))
+
+# spaCy NER (English chunks): model, nlp.pipe batch size, and worker processes
+# for large batches (1 = in-process)
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))
+
+# LLM entity extraction (non-English chunks): chunks packed into one request,
+# requests sent concurrently, results cached by (model, sha256(language, text))
+ENTITY_LLM_MODEL = os.getenv("ENTITY_LLM_MODEL", "gpt-4o-mini")
+ENTITY_LLM_BATCH_CHUNKS = int(os.getenv("ENTITY_LLM_BATCH_CHUNKS", "16"))
+ENTITY_LLM_BATCH_MAX_CHARS = int(os.getenv("ENTITY_LLM_BATCH_MAX_CHARS", "24000"))
+ENTITY_LLM_MAX_CONCURRENCY = int(os.getenv("ENTITY_LLM_MAX_CONCURRENCY", "4"))
+ENTITY_LLM_MAX_RETRIES = int(os.getenv("ENTITY_LLM_MAX_RETRIES", "3"))
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+ENTITY_CACHE_PATH = "./data/entities.db"
+
+# Per-document stage outputs of unfinished ingestions (resumed on rerun)
+INGEST_CHECKPOINT_DIR = "./data/checkpoints"
+
+# Ingestion job queue: uploads are queued and run by worker processes
+INGEST_JOBS_PATH = "./data/jobs.db"
+INGEST_UPLOAD_DIR = "./data/uploads"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+INGEST_JOB_STALE_S = int(os.getenv("INGEST_JOB_STALE_S", "60"))
+# A failed attempt waits INGEST_JOB_RETRY_DELAY_S, doubling per attempt
+INGEST_JOB_RETRY_DELAY_S = float(os.getenv("INGEST_JOB_RETRY_DELAY_S", "30"))
+
+# Bulk ingestion (python -m ingestion.bulk): threads per stage, bounded
+# queues between stages, FAISS/Neo4j writes batched across documents
+BULK_OCR_WORKERS = int(os.getenv("BULK_OCR_WORKERS", "2"))
+BULK_ENTITY_WORKERS = int(os.getenv("BULK_ENTITY_WORKERS", "4"))
+BULK_QUEUE_SIZE = int(os.getenv("BULK_QUEUE_SIZE", "4"))
+BULK_WRITE_BATCH_DOCS = int(os.getenv("BULK_WRITE_BATCH_DOCS", "16"))
+BULK_WRITE_MAX_WAIT_S = float(os.getenv("BULK_WRITE_MAX_WAIT_S", "30"))
+BULK_REPORT_S = float(os.getenv("BULK_REPORT_S", "10"))
+
+FAISS_INDEX_PATH = "./data/faiss.index"  # legacy single-file index, imported as a segment
+FAISS_SEGMENTS_DIR = "./data/segments"
+FAISS_MANIFEST_PATH = "./data/segments/manifest.json"
+FAISS_MAX_SEGMENTS = int(os.getenv("FAISS_MAX_SEGMENTS", "8"))
+METADATA_PATH = "./data/metadata.db"
+LEGACY_METADATA_PATH = "./data/metadata.pkl"
+
+# Vector index type: flat | ivf_flat | ivf_pq | hnsw
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "1024"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "64"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+
+# Vector encoding inside the index: float32 | fp16 | int8 | pq
+# Lossy encodings re-score FAISS_RERANK_FACTOR * k candidates against the
+# full-precision vectors kept in FAISS_VECTORS_PATH (memory-mapped)
+FAISS_VECTOR_ENCODING = os.getenv("FAISS_VECTOR_ENCODING", "float32")
+FAISS_RERANK_FACTOR = int(os.getenv("FAISS_RERANK_FACTOR", "4"))
+FAISS_VECTORS_PATH = "./data/vectors.f32"
+
+# Matryoshka coarse pass: index only the first N dimensions (renormalized),
+# then re-score FAISS_COARSE_CANDIDATES hits against the full vectors. 0 = off
+FAISS_COARSE_DIM = int(os.getenv("FAISS_COARSE_DIM", "0"))
+FAISS_COARSE_CANDIDATES = int(os.getenv("FAISS_COARSE_CANDIDATES", "100"))
+
+# Filtered searches (language / document_id) over at most this many chunks
+# are scored exactly against the full vectors instead of through the index
+FAISS_FILTER_EXACT_MAX = int(os.getenv("FAISS_FILTER_EXACT_MAX", "4096"))
+
+# Serve queries from memory-mapped, read-only index files so uvicorn workers
+# share one page-cache copy instead of each reading the index into its heap
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() in {"1", "true", "yes"}
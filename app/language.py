@@ -1,10 +1,78 @@
+import re
+import threading
+from functools import lru_cache
+
 from langdetect import detect, DetectorFactory
+from app.config import LANGUAGE_CACHE_SIZE
 
 # Make detection deterministic
 DetectorFactory.seed = 0
 
-def detect_language(text: str) -> str:
+# langdetect builds shared profiles lazily and is not safe to call from many threads
+_model_lock = threading.Lock()
+
+# Share of letters a script needs before the text is taken to be in it
+SCRIPT_THRESHOLD = 0.9
+# Share of words that must be English function words to call Latin text "en"
+ENGLISH_STOPWORD_THRESHOLD = 0.2
+# Below this many letters a script decision is a guess; ask the model
+MIN_LETTERS = 12
+
+ARABIC = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+# Letters Persian and Urdu add to the Arabic script
+NON_ARABIC_LETTERS = re.compile(r"[\u067E\u0686\u0698\u06AF\u0679\u0688\u0691\u06BA\u06BE\u06C1\u06D2]")
+LATIN = re.compile(r"[A-Za-z\u00C0-\u024F]")
+LETTER = re.compile(r"[^\W\d_]")
+WORD = re.compile(r"[a-z']+")
+
+ENGLISH_STOPWORDS = {
+    "the", "of", "and", "to", "in", "is", "for", "on", "that", "with", "as", "by",
+    "this", "are", "be", "it", "from", "at", "or", "an", "was", "which", "what",
+    "how", "who", "were", "has", "have", "not", "can", "all", "their", "its",
+}
+
+
+def _script_language(text: str):
+    """
+    Cheap Unicode-script decision: "ar" for Arabic-script text, "en" for
+    Latin text that reads as English, None when the model has to decide.
+    """
+    letters = "".join(LETTER.findall(text))
+    if len(letters) < MIN_LETTERS:
+        return None
+
+    if len(ARABIC.findall(letters)) / len(letters) >= SCRIPT_THRESHOLD:
+        return None if NON_ARABIC_LETTERS.search(letters) else "ar"
+
+    if len(LATIN.findall(letters)) / len(letters) >= SCRIPT_THRESHOLD:
+        words = WORD.findall(text.lower())
+        if words and sum(w in ENGLISH_STOPWORDS for w in words) / len(words) >= ENGLISH_STOPWORD_THRESHOLD:
+            return "en"
+    return None
+
+
+def _model_language(text: str) -> str:
     try:
-        return detect(text)
+        with _model_lock:
+            return detect(text)
     except Exception:
         return "unknown"
+
+
+@lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def detect_language(text: str) -> str:
+    """
+    ISO 639-1 code of `text` ("unknown" if undecidable). Arabic and English
+    are settled by a Unicode-script pass; only ambiguous text goes to
+    langdetect. Memoized, so repeated texts (a question checked by several
+    helpers, repeated chunks) are detected once.
+    """
+    return _script_language(text) or _model_language(text)
+
+
+def detect_languages(texts: list[str]) -> list[str]:
+    """
+    detect_language for a batch, in order; each distinct text is detected once.
+    """
+    languages = {text: detect_language(text) for text in dict.fromkeys(texts)}
+    return [languages[text] for text in texts]
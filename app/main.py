@@ -1,18 +1,51 @@
 from fastapi import FastAPI, Query, UploadFile, File, HTTPException
-import tempfile
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import os
 import traceback
 
 from app.agent import answer
-from ingestion.ingest import ingest
-from ingestion.dedup import document_hash
+from ingestion.ingest import already_ingested, delete_document
+from ingestion.jobs import JobQueue, WorkerPool, UploadTooLarge, spool_upload, POOL_LOCK_PATH
+from app.config import INGEST_MAX_UPLOAD_MB, INGEST_WORKERS
+from vectorstore.locking import try_lock
+from vectorstore.faiss_store import get_store
+from graph.neo4j_client import get_driver, get_async_driver, close_driver, close_async_driver, pool_metrics
 
-app = FastAPI(title="Hybrid LLM Knowledge Agent")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the vector index once per process instead of on every /ask
+    get_store()
+
+    # One pooled Neo4j driver per process, reused by every request
+    get_driver()
+    get_async_driver()
+
+    # Queued ingestions (including ones interrupted by a restart) run here.
+    # With `uvicorn --workers N` only the API process that takes the pool
+    # lock starts workers, so a host runs INGEST_WORKERS of them, not N times that
+    app.state.jobs = JobQueue()
+    pool_lock = try_lock(POOL_LOCK_PATH) if INGEST_WORKERS else None
+    workers = WorkerPool(INGEST_WORKERS if pool_lock else 0)
+    workers.start()
+    yield
+    workers.stop()
+    if pool_lock:
+        pool_lock.close()
+    close_driver()
+    await close_async_driver()
+
+app = FastAPI(title="Hybrid LLM Knowledge Agent", lifespan=lifespan)
 
 @app.post("/ask")
 def ask(q: str):
     return answer(q)
 
+@app.get("/metrics/neo4j")
+def neo4j_metrics():
+    return pool_metrics()
+
 @app.post("/ingest/pdf")
 async def ingest_pdf(
     file: UploadFile = File(...),
@@ -27,52 +60,83 @@ async def ingest_pdf(
             detail="Only PDF files are supported"
         )
 
-    # -------------------------
-    # Save to temp file
-    # -------------------------
+    pdf_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            contents = await file.read()
-
-            if len(contents) > 20 * 1024 * 1024:
-                raise HTTPException(
-                    status_code=400,
-                    detail="PDF exceeds 20MB Azure Document Intelligence inline limit"
-                )
-
-            tmp.write(contents)
-            tmp_path = tmp.name
-
         # -------------------------
-        # Compute document ID
+        # Stream upload to disk for the workers, computing
+        # the document ID (sha256) in the same pass
         # -------------------------
-        doc_id = document_hash(tmp_path)
+        try:
+            pdf_path, doc_id = await spool_upload(file, INGEST_MAX_UPLOAD_MB * 1024 * 1024)
+        except UploadTooLarge:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF exceeds the {INGEST_MAX_UPLOAD_MB}MB upload limit"
+            )
+
+        if not force and await run_in_threadpool(already_ingested, doc_id):
+            os.remove(pdf_path)
+            return {
+                "status": "skipped",
+                "reason": "document already ingested",
+                "document_id": doc_id
+            }
 
         # -------------------------
-        # Run ingestion pipeline
+        # Queue ingestion pipeline
         # -------------------------
-        result = ingest(tmp_path, force=force)
+        job_id, created = await run_in_threadpool(app.state.jobs.enqueue, pdf_path, doc_id, force)
+        if not created:
+            # Same document already queued or running: report that job
+            os.remove(pdf_path)
 
-        if result["status"] == "success":
-            return {
-                "status": "success",
-                "document_id": doc_id,
-                "pages_ingested": result["pages"],
-                "chunks_created": result["chunks"],
-                "entities_created": result["entities_created"]
-            }
-        else:
-            return result
+        return JSONResponse(status_code=202, content={
+            "status": "queued" if created else "already_queued",
+            "job_id": job_id,
+            "document_id": doc_id
+        })
 
     except HTTPException:
         raise
 
     except Exception as e:
+        if pdf_path and os.path.exists(pdf_path):
+            os.remove(pdf_path)
         raise HTTPException(
             status_code=500,
             detail=f"Ingestion failed: {str(e)}\n\n{''.join(traceback.format_tb(e.__traceback__))}"
         )
 
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+@app.get("/ingest/jobs/{job_id}")
+def ingest_job(job_id: str):
+    job = app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    result = job["result"] or {}
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "document_id": job["document_id"],
+        "stage": job["stage"],
+        "stages": job["stages"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "result": {
+            "status": result.get("status"),
+            "reason": result.get("reason"),
+            "pages_ingested": result.get("pages"),
+            "chunks_created": result.get("chunks"),
+            "entities_created": result.get("entities_created")
+        } if result else None
+    }
+
+@app.delete("/documents/{doc_id}")
+def delete_document_endpoint(doc_id: str):
+    result = delete_document(doc_id)
+    if not result.pop("found"):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"status": "deleted", **result}
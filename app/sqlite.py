@@ -0,0 +1,49 @@
+import sqlite3
+import threading
+
+# SQLite caps bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+def connect(path: str, synchronous: str = None, row_factory=None) -> sqlite3.Connection:
+    """
+    A writable connection in WAL mode, so readers never block the writer.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    conn.execute("PRAGMA journal_mode=WAL")
+    if synchronous:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+    return conn
+
+
+class ThreadLocalConnection:
+    """
+    Callable returning this thread's connection, opened by `open_conn()` on
+    first use: sqlite3 connections must not be shared across threads.
+    """
+
+    def __init__(self, open_conn):
+        self._open = open_conn
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+
+def select_in(conn: sqlite3.Connection, query: str, keys, params=()) -> list:
+    """
+    Rows of `query` for all `keys`, LOOKUP_BATCH keys per statement. `query`
+    marks the IN list as "{keys}"; its placeholders follow `params`.
+    """
+    keys = list(keys)
+    rows = []
+    for i in range(0, len(keys), LOOKUP_BATCH):
+        batch = keys[i:i + LOOKUP_BATCH]
+        sql = query.format(keys=",".join("?" * len(batch)))
+        rows.extend(conn.execute(sql, [*params, *batch]).fetchall())
+    return rows
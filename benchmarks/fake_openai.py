@@ -0,0 +1,220 @@
+"""
+Local stand-in for the OpenAI API, for exercising the embedding batcher and
+the entity extractor (and anything else built on the OpenAI client) without
+cost or network.
+
+    python -m benchmarks.fake_openai --port 8100 --tpm 1000000 --rpm 500
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python -m benchmarks.embedding_batcher
+
+POST /v1/embeddings returns deterministic unit vectors (same text -> same
+vector) in float or base64 encoding. It enforces the real per-request limits
+(2048 inputs, 300k tokens) with a 400, and tokens/requests per minute with a
+429 + Retry-After, like the real endpoint. --fail-rate adds random 429s.
+
+POST /v1/chat/completions answers entity extraction prompts (chunks marked
+as graph_builder.CHUNK_MARKER) with deterministic per-chunk JSON: the
+capitalised words of a chunk, or its long words for non-Latin text. Anything
+else gets an empty result. --drop-rate leaves chunks out of responses, to
+exercise the extractor's retry of missing chunks.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_INPUTS = 2048
+MAX_REQUEST_TOKENS = 300_000
+
+CHUNK = re.compile(r"<<<chunk (\d+) \| language: ([^>]*)>>>\n(.*?)(?=\n\n<<<chunk |\Z)", re.S)
+
+
+def count_tokens(text: str) -> int:
+    # Rough tokenizer (~4 chars/token); the client side uses tiktoken
+    return max(1, len(text) // 4)
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    # Standard library only, so the server runs without the app's dependencies
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector]
+
+
+def fake_entities(text: str, limit: int = 3) -> list[dict]:
+    words = re.findall(r"\w+", text)
+    latin = [w for w in words if w[0].isupper() and w.isascii() and len(w) > 3]
+    names = latin or [w for w in words if not w.isascii() and len(w) > 4]
+    return [{"name": name, "entity_type": "other"} for name in list(dict.fromkeys(names))[:limit]]
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, amount: float) -> float:
+        """
+        Take `amount`; returns 0 on success, else the seconds until it would fit.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            if amount <= self.level:
+                self.level -= amount
+                return 0.0
+            return (amount - self.level) / self.rate
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "fake-openai/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def error(self, status: int, message: str, kind: str, headers: dict = None):
+        self.server.stats[status] = self.server.stats.get(status, 0) + 1
+        self.send_json(status, {"error": {"message": message, "type": kind, "code": None}}, headers)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/") == "/v1/embeddings":
+            return self.embeddings(body)
+        if self.path.rstrip("/") == "/v1/chat/completions":
+            return self.chat(body)
+        self.error(404, f"Unknown path {self.path}", "invalid_request_error")
+
+    def throttle(self, tokens: int) -> bool:
+        server = self.server
+        wait = max(server.requests.take(1), server.tokens.take(tokens))
+        if not wait and random.random() < server.fail_rate:
+            wait = 1.0
+        if wait:
+            self.error(429, "Rate limit reached", "requests", {"retry-after-ms": str(int(wait * 1000) + 1)})
+            return True
+        return False
+
+    def embeddings(self, body: dict):
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        tokens = [count_tokens(t) for t in inputs]
+
+        if not inputs or len(inputs) > MAX_INPUTS:
+            return self.error(400, f"input must have 1..{MAX_INPUTS} items", "invalid_request_error")
+        if sum(tokens) > MAX_REQUEST_TOKENS:
+            return self.error(400, f"max {MAX_REQUEST_TOKENS} tokens per request", "invalid_request_error")
+        if self.throttle(sum(tokens)):
+            return
+
+        time.sleep(self.server.latency_s + sum(tokens) * self.server.per_token_s)
+        dim = body.get("dimensions") or self.server.dim
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_embedding(text, dim)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(array("f", vector).tobytes()).decode()
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        self.server.stats[200] = self.server.stats.get(200, 0) + 1
+        self.send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model"),
+            "usage": {"prompt_tokens": sum(tokens), "total_tokens": sum(tokens)},
+        })
+
+
+    def chat(self, body: dict):
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user")
+        tokens = count_tokens(prompt)
+        if self.throttle(tokens):
+            return
+
+        results = [
+            {"chunk": int(index), "entities": fake_entities(text)}
+            for index, _, text in CHUNK.findall(prompt)
+            if random.random() >= self.server.drop_rate
+        ]
+        time.sleep(self.server.latency_s + tokens * self.server.per_token_s)
+
+        self.server.stats[200] = self.server.stats.get(200, 0) + 1
+        self.send_json(200, {
+            "id": f"chatcmpl-{random.getrandbits(48):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"results": results}, ensure_ascii=False)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": tokens, "completion_tokens": 0, "total_tokens": tokens},
+        })
+
+
+def make_server(port: int = 8100, dim: int = 3072, tpm: float = 1_000_000, rpm: float = 3000,
+                latency_ms: float = 50, per_token_us: float = 2, fail_rate: float = 0.0,
+                verbose: bool = False, drop_rate: float = 0.0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.dim = dim
+    server.tokens = TokenBucket(tpm)
+    server.requests = TokenBucket(rpm)
+    server.latency_s = latency_ms / 1000
+    server.per_token_s = per_token_us / 1_000_000
+    server.fail_rate = fail_rate
+    server.drop_rate = drop_rate
+    server.verbose = verbose
+    server.stats = {}
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="Tokens per minute before 429s")
+    parser.add_argument("--rpm", type=float, default=3000, help="Requests per minute before 429s")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--per-token-us", type=float, default=2)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability of a spurious 429")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability of leaving a chunk out of a chat response")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.dim, args.tpm, args.rpm, args.latency_ms,
+                         args.per_token_us, args.fail_rate, args.verbose, args.drop_rate)
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"responses by status: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Language identification: app.language against plain langdetect.
+
+    python -m benchmarks.language_id                  # sample of stored chunks
+    python -m benchmarks.language_id --sample 20000
+    python -m benchmarks.language_id --synthetic 5000
+
+Runs both detectors over the same texts and reports texts per second, how
+many texts app.language had to send to the model, and how often the two
+agree. The cold run starts with an empty memo cache; the warm run repeats
+the batch, as repeated questions and chunks would.
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from langdetect import detect
+
+from app.language import detect_language, detect_languages, _script_language
+from vectorstore.metadata_store import MetadataStore
+
+SYNTHETIC = [
+    "The control system adjusts the velocity of the actuator based on the feedback signal.",
+    "This report describes the results of the annual review and the recommendations of the committee.",
+    "يعرض هذا التقرير نتائج المراجعة السنوية وتوصيات اللجنة المختصة بالتنفيذ.",
+    "تم تحديث النظام لضمان دقة البيانات وسرعة الاستجابة في جميع الفروع.",
+    "Le rapport présente les résultats de l'examen annuel et les recommandations du comité.",
+    "Section 4.2: Appendix B",
+]
+
+
+def baseline(text: str) -> str:
+    try:
+        return detect(text)
+    except Exception:
+        return "unknown"
+
+
+def load_texts(sample: int, synthetic: int) -> list[str]:
+    if synthetic:
+        rng = random.Random(0)
+        return [f"{rng.choice(SYNTHETIC)} {i}" for i in range(synthetic)]
+    return MetadataStore(read_only=True).sample_texts(sample)
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    result = fn(texts)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Language ID throughput and agreement")
+    parser.add_argument("--sample", type=int, default=5000, help="Stored chunks to sample")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic texts instead")
+    args = parser.parse_args()
+
+    texts = load_texts(args.sample, args.synthetic)
+    if not texts:
+        parser.error("no texts: ingest documents first or pass --synthetic N")
+
+    expected, base_s = timed(lambda ts: [baseline(t) for t in ts], texts)
+
+    detect_language.cache_clear()
+    found, cold_s = timed(detect_languages, texts)
+    _, warm_s = timed(detect_languages, texts)
+
+    model_calls = sum(_script_language(t) is None for t in set(texts))
+    agree = sum(a == b for a, b in zip(found, expected)) / len(texts)
+
+    print(f"{len(texts)} texts ({len(set(texts))} distinct)")
+    print(f"{'detector':<22} {'seconds':>8} {'texts/s':>10}")
+    print(f"{'langdetect':<22} {base_s:>8.2f} {len(texts) / base_s:>10.0f}")
+    print(f"{'app.language (cold)':<22} {cold_s:>8.2f} {len(texts) / cold_s:>10.0f}")
+    print(f"{'app.language (warm)':<22} {warm_s:>8.4f} {len(texts) / max(warm_s, 1e-9):>10.0f}")
+    print(f"model fallbacks: {model_calls} ({model_calls / len(set(texts)):.1%} of distinct texts)")
+    print(f"agreement with langdetect: {agree:.2%}")
+    print("languages:", dict(Counter(found).most_common()))
+
+    disagreements = Counter((b, a) for a, b in zip(found, expected) if a != b)
+    if disagreements:
+        print("disagreements (langdetect -> app.language):", dict(disagreements.most_common(10)))
+
+
+if __name__ == "__main__":
+    main()
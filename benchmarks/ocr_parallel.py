@@ -0,0 +1,57 @@
+"""
+Wall time of page-range parallel OCR against the stub backend.
+
+    OCR_STUB_LATENCY_MS=200 python -m benchmarks.ocr_parallel --pages 120
+    OCR_STUB_LATENCY_MS=200 python -m benchmarks.ocr_parallel --pdf report.pdf --concurrency 1 4 8
+
+The stub sleeps OCR_STUB_LATENCY_MS per page to stand in for Azure's
+per-page analysis time. Each run also checks that the merged page numbers
+are exactly 1..N.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from pypdf import PdfWriter
+
+from ingestion.ocr import ocr_pdf
+from app.config import OCR_PAGES_PER_PART
+
+
+def synthetic_pdf(pages: int) -> str:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel OCR wall time (stub backend)")
+    parser.add_argument("--pdf", help="PDF to OCR instead of a synthetic blank one")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--pages-per-part", type=int, default=OCR_PAGES_PER_PART)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    path = args.pdf or synthetic_pdf(args.pages)
+    try:
+        baseline = None
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            pages = ocr_pdf(path, backend="stub", pages_per_part=args.pages_per_part, max_concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            numbered = [p["page_number"] for p in pages] == list(range(1, len(pages) + 1))
+            print(f"concurrency={concurrency:<3} {len(pages)} pages {elapsed:7.2f}s "
+                  f"speedup x{baseline / elapsed:.1f} page numbers ok: {numbered}")
+    finally:
+        if not args.pdf:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+spaCy NER throughput: the old per-chunk loop (full pipeline, one nlp() call
+per chunk) against nlp.pipe with unused components disabled.
+
+    python -m benchmarks.spacy_ner                    # sample of stored English chunks
+    python -m benchmarks.spacy_ner --synthetic 5000 --n-process 1 2 4
+
+Also checks that the batched path finds the same entities as the loop.
+"""
+import argparse
+import random
+import time
+
+import spacy
+
+from app.config import SPACY_MODEL, SPACY_BATCH_SIZE
+from graph.graph_builder import _doc_entities, extract_entities_spacy_batch
+from vectorstore.metadata_store import MetadataStore
+
+SENTENCES = [
+    "Siemens opened a new plant in Munich to supply Airbus with control units.",
+    "The report by the World Health Organization covers hospitals in Kenya and Uganda.",
+    "Microsoft and the University of Oxford signed an agreement in London last year.",
+    "The committee reviewed the annual budget and the maintenance schedule for the fleet.",
+]
+
+
+def load_texts(sample: int, synthetic: int) -> list[str]:
+    if synthetic:
+        rng = random.Random(0)
+        return [" ".join(rng.choice(SENTENCES) for _ in range(6)) + f" {i}" for i in range(synthetic)]
+    return MetadataStore(read_only=True).sample_texts(sample, language="en")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="spaCy NER chunks/sec: per-chunk loop vs nlp.pipe")
+    parser.add_argument("--sample", type=int, default=2000, help="Stored English chunks to sample")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic chunks instead")
+    parser.add_argument("--batch-size", type=int, default=SPACY_BATCH_SIZE)
+    parser.add_argument("--n-process", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+
+    texts = load_texts(args.sample, args.synthetic)
+    if not texts:
+        parser.error("no English chunks stored: ingest documents first or pass --synthetic N")
+
+    full = spacy.load(SPACY_MODEL)
+    start = time.perf_counter()
+    expected = [_doc_entities(full(text)) for text in texts]
+    loop_s = time.perf_counter() - start
+
+    print(f"{len(texts)} chunks, model {SPACY_MODEL}")
+    print(f"{'mode':<34} {'seconds':>8} {'chunks/s':>10} {'speedup':>8}")
+    print(f"{'nlp(text) per chunk, full pipeline':<34} {loop_s:>8.2f} {len(texts) / loop_s:>10.0f} {1.0:>8.1f}")
+
+    for n_process in args.n_process:
+        start = time.perf_counter()
+        found = extract_entities_spacy_batch(texts, batch_size=args.batch_size, n_process=n_process)
+        elapsed = time.perf_counter() - start
+        label = f"nlp.pipe batch={args.batch_size} n_process={n_process}"
+        print(f"{label:<34} {elapsed:>8.2f} {len(texts) / elapsed:>10.0f} {loop_s / elapsed:>8.1f}")
+
+        same = sum(
+            sorted(e["name"] for e in a) == sorted(e["name"] for e in b) for a, b in zip(found, expected)
+        )
+        if same != len(texts):
+            print(f"  entities differ from the loop on {len(texts) - same} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Recall, latency and memory report for the FAISS index types and vector
+encodings against the flat float32 baseline.
+
+    python -m benchmarks.vector_index                 # vectors from ./data/faiss.index
+    python -m benchmarks.vector_index --synthetic 200000
+    python -m benchmarks.vector_index --types flat --encodings float32 fp16 int8 pq
+    python -m benchmarks.vector_index --types flat --coarse-dims 256 512
+
+A random sample of stored vectors is held out as queries; exact (flat) search
+over the remaining vectors is the ground truth for recall@k. For lossy
+encodings the "rerank" columns re-score FAISS_RERANK_FACTOR * k candidates
+against the full-precision vectors, as FaissStore.search does. With
+--coarse-dims the same is reported for Matryoshka coarse indexes built over the
+first N dimensions, re-scored against the full vectors.
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from vectorstore.faiss_store import (
+    FaissStore,
+    INDEX_TYPES,
+    ENCODINGS,
+    IVF_MAX_TRAIN_PER_LIST,
+    build_index,
+    min_train_size,
+    normalize_config,
+    rerank_exact,
+    truncate_vectors,
+)
+from app.config import FAISS_IVF_NLIST, FAISS_RERANK_FACTOR, FAISS_COARSE_CANDIDATES, EMBEDDING_DIM
+
+
+def load_vectors(synthetic: int, dim: int) -> np.ndarray:
+    if synthetic:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((synthetic, dim)).astype("float32")
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    store = FaissStore()
+    store.load()
+    return store.vectors()
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def bytes_per_vector(index: faiss.Index) -> float:
+    return len(faiss.serialize_index(index)) / max(index.ntotal, 1)
+
+
+def timed_search(index, queries, k, params=None, full_vectors=None, coarse_dim=0):
+    """
+    One query per call, like /ask, so latency is per request. With
+    `full_vectors`, over-fetch and re-score exactly before taking the top k.
+    With `coarse_dim`, the index is searched with the truncated query.
+    """
+    fetch = k
+    if full_vectors is not None:
+        fetch = max(k * FAISS_RERANK_FACTOR, FAISS_COARSE_CANDIDATES if coarse_dim else 0)
+    results = []
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        probe = truncate_vectors(q[None, :], coarse_dim) if coarse_dim else q[None, :]
+        _, I = index.search(probe, fetch, params=params)
+        ids = I[0]
+        if full_vectors is not None:
+            _, ids = rerank_exact(q, ids, full_vectors, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(np.pad(ids, (0, k - len(ids)), constant_values=-1))
+    return np.array(results), np.array(latencies)
+
+
+def sweep(index_type: str):
+    if index_type in {"ivf_flat", "ivf_pq"}:
+        return [(f"nprobe={n}", faiss.SearchParametersIVF(nprobe=n)) for n in (1, 4, 16, 64, 256)]
+    if index_type == "hnsw":
+        return [(f"efSearch={e}", faiss.SearchParametersHNSW(efSearch=e)) for e in (16, 32, 64, 128, 256)]
+    return [("-", None)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS index recall/latency/memory report")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the stored index")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", nargs="+", default=sorted(INDEX_TYPES), choices=sorted(INDEX_TYPES))
+    parser.add_argument("--encodings", nargs="+", default=["float32"], choices=sorted(ENCODINGS))
+    parser.add_argument("--coarse-dims", nargs="+", type=int, default=[])
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.synthetic, args.dim)
+    dim = vectors.shape[1]
+
+    rng = np.random.default_rng(1)
+    held_out = rng.choice(len(vectors), min(args.queries, len(vectors) // 10 or 1), replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[held_out] = False
+    queries, base = vectors[held_out], vectors[mask]
+
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(base)
+    truth, flat_latency = timed_search(flat, queries, args.k)
+
+    print(f"{len(base)} vectors, dim={dim}, {len(queries)} queries, k={args.k}, rerank x{FAISS_RERANK_FACTOR}")
+    print(f"{'index':<10} {'encoding':<8} {'params':<13} {'build s':>8} {'B/vec':>7} "
+          f"{'recall':>7} {'p50 ms':>7} {'rerank':>7} {'p50 ms':>7}")
+    print(f"{'flat':<10} {'float32':<8} {'(baseline)':<13} {'':>8} {bytes_per_vector(flat):>7.0f} "
+          f"{1.0:>7.3f} {np.percentile(flat_latency, 50):>7.2f}")
+
+    configs = []
+    for index_type in args.types:
+        for encoding in args.encodings:
+            config = normalize_config(index_type, encoding)
+            if config != ("flat", "float32") and config not in configs:
+                configs.append(config)
+
+    for index_type, encoding in configs:
+        needed = min_train_size(index_type, encoding)
+        if len(base) < needed:
+            print(f"{index_type:<10} {encoding:<8} skipped: needs {needed} vectors to train")
+            continue
+
+        start = time.perf_counter()
+        index = build_index(dim, index_type, encoding)
+        if not index.is_trained:
+            sample_size = min(len(base), max(needed, FAISS_IVF_NLIST * IVF_MAX_TRAIN_PER_LIST))
+            index.train(base[rng.choice(len(base), sample_size, replace=False)])
+        index.add(base)
+        build_s = time.perf_counter() - start
+        memory = bytes_per_vector(index)
+
+        for label, params in sweep(index_type):
+            found, latency = timed_search(index, queries, args.k, params)
+            row = (f"{index_type:<10} {encoding:<8} {label:<13} {build_s:>8.1f} {memory:>7.0f} "
+                   f"{recall_at_k(found, truth):>7.3f} {np.percentile(latency, 50):>7.2f}")
+
+            if encoding != "float32":
+                found, latency = timed_search(index, queries, args.k, params, full_vectors=base)
+                row += f" {recall_at_k(found, truth):>7.3f} {np.percentile(latency, 50):>7.2f}"
+            print(row)
+
+    for coarse_dim in args.coarse_dims:
+        if coarse_dim >= dim:
+            continue
+
+        start = time.perf_counter()
+        index = faiss.IndexFlatL2(coarse_dim)
+        index.add(truncate_vectors(base, coarse_dim))
+        build_s = time.perf_counter() - start
+
+        found, latency = timed_search(index, queries, args.k, coarse_dim=coarse_dim)
+        row = (f"{'flat':<10} {'float32':<8} {f'coarse={coarse_dim}':<13} {build_s:>8.1f} "
+               f"{bytes_per_vector(index):>7.0f} {recall_at_k(found, truth):>7.3f} "
+               f"{np.percentile(latency, 50):>7.2f}")
+
+        found, latency = timed_search(index, queries, args.k, full_vectors=base, coarse_dim=coarse_dim)
+        row += f" {recall_at_k(found, truth):>7.3f} {np.percentile(latency, 50):>7.2f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
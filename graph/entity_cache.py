@@ -0,0 +1,49 @@
+import os
+import json
+import hashlib
+from app.config import ENTITY_CACHE_PATH
+from app.sqlite import ThreadLocalConnection, connect, select_in
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    model    TEXT NOT NULL,
+    sha256   TEXT NOT NULL,
+    entities TEXT NOT NULL,             -- JSON list
+    PRIMARY KEY (model, sha256)
+);
+"""
+
+
+def chunk_key(text: str, language: str) -> str:
+    return hashlib.sha256(f"{language}\n{text}".encode("utf-8")).hexdigest()
+
+
+class EntityCache:
+    """
+    LLM entity extraction results in SQLite, keyed by (model, chunk hash).
+
+    Entities are small and re-extraction costs an LLM call, so nothing is
+    evicted. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: str = ENTITY_CACHE_PATH):
+        self.path = path
+        self._conn = ThreadLocalConnection(lambda: connect(path, synchronous="NORMAL"))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def get_many(self, model: str, keys: list[str]) -> dict[str, list[dict]]:
+        rows = select_in(self._conn(), "SELECT sha256, entities FROM entities WHERE model = ? AND sha256 IN ({keys})",
+                         keys, [model])
+        return {key: json.loads(entities) for key, entities in rows}
+
+    def put_many(self, model: str, items: dict[str, list[dict]]):
+        if not items:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entities VALUES (?, ?, ?)",
+                ((model, key, json.dumps(entities, ensure_ascii=False)) for key, entities in items.items())
+            )
@@ -1,11 +1,44 @@
 import re
+import time
 import spacy
 from openai import OpenAI
 import json
-
-client = OpenAI()
-
-nlp = spacy.load("en_core_web_sm")
+from concurrent.futures import ThreadPoolExecutor
+from app.config import (
+    SPACY_MODEL,
+    SPACY_BATCH_SIZE,
+    SPACY_N_PROCESS,
+    ENTITY_LLM_MODEL,
+    ENTITY_LLM_BATCH_CHUNKS,
+    ENTITY_LLM_BATCH_MAX_CHARS,
+    ENTITY_LLM_MAX_CONCURRENCY,
+    ENTITY_LLM_MAX_RETRIES,
+    ENTITY_CACHE_ENABLED,
+)
+from graph.entity_cache import EntityCache, chunk_key
+from observability.logging import log_event, log_error
+
+# Rate limits and transient errors are retried with backoff by the client
+client = OpenAI(max_retries=ENTITY_LLM_MAX_RETRIES)
+# Malformed or partial responses are re-asked after 1s, 2s, 4s, ...
+RETRY_BACKOFF_S = 1.0
+
+# NER needs none of these; the lemmatizer depends on the tagger and attribute ruler
+SPACY_DISABLED = ["tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+_nlp = None
+
+
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLED)
+        # The shared tok2vec only feeds the tagger and parser in the sm/md/lg
+        # pipelines, whose NER embeds tokens itself; keep it if NER listens to it
+        if "tok2vec" in nlp.pipe_names and "ner" not in nlp.get_pipe("tok2vec").listening_components:
+            nlp.disable_pipe("tok2vec")
+        _nlp = nlp
+    return _nlp
 
 SIGNAL_KEYWORDS = {
     "velocity",
@@ -57,17 +90,10 @@ def is_valid_entity(text: str, label: str) -> bool:
     return True
 
 
-def extract_entities_llm(text: str, lang: str) -> list[dict]:
-    """
-    Multilingual entity extraction using LLM.
-    Works especially well for Arabic.
-    Returns the SAME entity schema used elsewhere.
-    """
-
-    prompt = f"""
+ENTITY_PROMPT = """
 You are a named entity extraction system.
 
-Extract meaningful named entities from the following text.
+Extract meaningful named entities from each of the numbered text chunks below.
 Entities should be real-world concepts such as:
 - people
 - organizations
@@ -78,58 +104,184 @@ Entities should be real-world concepts such as:
 - events
 
 Rules:
+- Treat every chunk independently
 - Ignore generic words and abstract concepts
 - Ignore numbers and measurements
 - Do NOT hallucinate entities
 - Preserve original language (do NOT translate)
 
-Return ONLY valid JSON in the following format:
-[
-  {{
-    "name": "<entity text>",
-    "entity_type": "<person|organization|location|product|event|law|language|other>"
-  }}
-]
+Return ONLY a valid JSON object with one result per chunk, in the following format:
+{{
+  "results": [
+    {{
+      "chunk": <chunk number>,
+      "entities": [
+        {{
+          "name": "<entity text>",
+          "entity_type": "<person|organization|location|product|event|law|language|other>"
+        }}
+      ]
+    }}
+  ]
+}}
+
+Chunks:
+{chunks}
+"""
 
-Text language: {lang}
+CHUNK_MARKER = "<<<chunk {index} | language: {lang}>>>"
 
-Text:
-\"\"\"{text}\"\"\"
-"""
+# Bump when ENTITY_PROMPT changes, so cached results are not reused
+PROMPT_VERSION = 2
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
+_entity_cache = None
 
-        content = response.choices[0].message.content.strip()
 
-        # Defensive cleanup (LLMs sometimes wrap JSON)
-        content = re.sub(r"^```json|```$", "", content, flags=re.MULTILINE).strip()
+def get_entity_cache() -> EntityCache:
+    global _entity_cache
+    if _entity_cache is None:
+        _entity_cache = EntityCache()
+    return _entity_cache
 
-        entities = json.loads(content)
 
-        # Normalize to your existing schema
-        normalized = []
-        for e in entities:
-            if not e.get("name"):
-                continue
+def _normalize_llm_entities(entities, lang: str) -> list[dict]:
+    # Normalize to your existing schema
+    normalized = []
+    for e in entities:
+        if not isinstance(e, dict) or not e.get("name"):
+            continue
 
-            normalized.append({
-                "name": e["name"].strip(),
-                "entity_type": e.get("entity_type", "unknown"),
-                "source_label": "LLM",
-                "language": lang
-            })
+        normalized.append({
+            "name": str(e["name"]).strip(),
+            "entity_type": e.get("entity_type", "unknown"),
+            "source_label": "LLM",
+            "language": lang
+        })
+    return normalized
 
-        return normalized
 
-    except Exception as e:
-        print("LLM entity extraction failed:", e)
-        return []
-    
+def _request_entities(items: list[tuple[str, str]]) -> dict[int, list[dict]]:
+    """
+    One chat completion for a group of (text, language) chunks. Returns
+    entities per chunk index; chunks the model skipped are absent.
+    """
+    chunks = "\n\n".join(
+        f"{CHUNK_MARKER.format(index=i, lang=lang)}\n{text}"
+        for i, (text, lang) in enumerate(items)
+    )
+    response = client.chat.completions.create(
+        model=ENTITY_LLM_MODEL,
+        messages=[{"role": "user", "content": ENTITY_PROMPT.format(chunks=chunks)}],
+        temperature=0,
+        response_format={"type": "json_object"}
+    )
+
+    content = response.choices[0].message.content.strip()
+
+    # Defensive cleanup (LLMs sometimes wrap JSON)
+    content = re.sub(r"^```json|```$", "", content, flags=re.MULTILINE).strip()
+
+    data = json.loads(content)
+    if not isinstance(data, dict) or not isinstance(data.get("results", []), list):
+        raise ValueError(f"expected a JSON object with a results list, got {type(data).__name__}")
+
+    found = {}
+    for result in data.get("results", []):
+        try:
+            index = int(result["chunk"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < len(items) and isinstance(result.get("entities"), list):
+            found[index] = _normalize_llm_entities(result["entities"], items[index][1])
+    return found
+
+
+def _extract_group(items: list[tuple[str, str]]) -> dict[int, list[dict]]:
+    """
+    Entities per index of `items`. Chunks missing from a malformed or partial
+    response are asked for again, with backoff, up to ENTITY_LLM_MAX_RETRIES
+    times; API errors are already retried (with backoff) by the client.
+    """
+    results = {}
+    pending = list(range(len(items)))
+    for attempt in range(ENTITY_LLM_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(RETRY_BACKOFF_S * 2 ** (attempt - 1))
+        try:
+            found = _request_entities([items[i] for i in pending])
+        except ValueError as e:
+            # Not JSON, or JSON of the wrong shape (JSONDecodeError is a ValueError)
+            log_error("entities.llm_bad_response", e, metadata={"chunks": len(pending), "attempt": attempt})
+            continue
+        except Exception as e:
+            log_error("entities.llm_failed", e, metadata={"chunks": len(pending)})
+            break
+        results.update((pending[i], entities) for i, entities in found.items())
+        pending = [i for i in pending if i not in results]
+        if not pending:
+            break
+    return results
+
+
+def _pack(items: list[tuple[str, str]], max_chunks: int, max_chars: int) -> list[range]:
+    groups, start, chars = [], 0, 0
+    for i, (text, _) in enumerate(items):
+        if i > start and (i - start >= max_chunks or chars + len(text) > max_chars):
+            groups.append(range(start, i))
+            start, chars = i, 0
+        chars += len(text)
+    if start < len(items):
+        groups.append(range(start, len(items)))
+    return groups
+
+
+def extract_entities_llm_batch(
+    items: list[tuple[str, str]],
+    batch_chunks: int = ENTITY_LLM_BATCH_CHUNKS,
+    max_concurrency: int = ENTITY_LLM_MAX_CONCURRENCY,
+    use_cache: bool = ENTITY_CACHE_ENABLED,
+) -> list[list[dict]]:
+    """
+    Multilingual entity extraction using LLM, for many (text, language)
+    chunks at once. Chunks are packed `batch_chunks` to a request (per-chunk
+    JSON results), requests run `max_concurrency` at a time, and results are
+    cached by chunk hash. Returns entities per chunk, in order; chunks whose
+    extraction failed get [] and are not cached.
+    """
+    cache_model = f"{ENTITY_LLM_MODEL}:v{PROMPT_VERSION}"
+    keys = [chunk_key(text, lang) for text, lang in items]
+    cached = get_entity_cache().get_many(cache_model, list(dict.fromkeys(keys))) if use_cache else {}
+
+    # Identical chunks are extracted once
+    todo = {k: item for k, item in zip(keys, items) if k not in cached}
+    todo_keys, todo_items = list(todo), list(todo.values())
+    groups = _pack(todo_items, batch_chunks, ENTITY_LLM_BATCH_MAX_CHARS)
+
+    fresh = {}
+    if groups:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(groups)))) as pool:
+            for group, found in zip(groups, pool.map(lambda g: _extract_group(todo_items[g.start:g.stop]), groups)):
+                fresh.update((todo_keys[group.start + i], entities) for i, entities in found.items())
+        if use_cache:
+            get_entity_cache().put_many(cache_model, fresh)
+
+    log_event("entities.llm", metadata={
+        "chunks": len(items),
+        "cached": len(items) - sum(k in todo for k in keys),
+        "requests": len(groups),
+        "failed": len(todo) - len(fresh),
+    })
+    return [cached.get(k) or fresh.get(k, []) for k in keys]
+
+
+def extract_entities_llm(text: str, lang: str) -> list[dict]:
+    """
+    Multilingual entity extraction using LLM.
+    Works especially well for Arabic.
+    Returns the SAME entity schema used elsewhere.
+    """
+    return extract_entities_llm_batch([(text, lang)])[0]
+
 def extract_entities_smart(text: str, lang: str) -> list[dict]:
     """
     Automatically selects the best entity extractor
@@ -143,16 +295,54 @@ def extract_entities_smart(text: str, lang: str) -> list[dict]:
     # Arabic & everything else → LLM
     return extract_entities_llm(text, lang)
 
-def extract_entities(text: str):
-    # nlp = get_nlp()
-    print(nlp.pipe_names)
-    doc = nlp(text)
-    print(doc.ents)
-    print([(e.text, e.label_) for e in doc.ents])
+def extract_entities_batch(items: list[tuple[str, str]]) -> list[list[dict]]:
+    """
+    extract_entities_smart for many (text, language) chunks, in order:
+    English through spaCy, everything else through batched LLM requests.
+    """
+    results = [None] * len(items)
+    english = [i for i, (_, lang) in enumerate(items) if lang == "en"]
+    llm = [i for i, (_, lang) in enumerate(items) if lang != "en"]
+    texts = [items[i][0] for i in english]
+
+    if _spacy_processes(len(texts)) > 1:
+        # nlp.pipe forks its workers; a fork taken while LLM threads hold
+        # locks (HTTP pool, logging) can deadlock the child, so fork first
+        spacy_results = extract_entities_spacy_batch(texts)
+        llm_results = extract_entities_llm_batch([items[i] for i in llm]) if llm else []
+    else:
+        # LLM requests are I/O bound: let them run while spaCy uses the CPU
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(extract_entities_llm_batch, [items[i] for i in llm]) if llm else None
+            spacy_results = extract_entities_spacy_batch(texts)
+            llm_results = pending.result() if pending is not None else []
+
+    for i, entities in zip(english, spacy_results):
+        results[i] = entities
+    for i, entities in zip(llm, llm_results):
+        results[i] = entities
+    return results
+
+def _spacy_processes(n_texts: int, batch_size: int = SPACY_BATCH_SIZE, n_process: int = SPACY_N_PROCESS) -> int:
+    # Worker processes only pay off once each gets a full batch
+    return n_process if n_texts >= batch_size * n_process else 1
+
+def extract_entities_spacy_batch(texts: list[str], batch_size: int = SPACY_BATCH_SIZE,
+                                 n_process: int = SPACY_N_PROCESS) -> list[list[dict]]:
+    """
+    spaCy NER over many texts with nlp.pipe, in order. Worker processes
+    are only started when the batch is big enough to amortise them.
+    """
+    if not texts:
+        return []
+    n_process = _spacy_processes(len(texts), batch_size, n_process)
+    docs = get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process)
+    return [_doc_entities(doc) for doc in docs]
 
-    # doc = nlp("Apple was founded by Steve Jobs in California.")
-    # print([(e.text, e.label_) for e in doc.ents])
+def extract_entities(text: str):
+    return extract_entities_spacy_batch([text])[0]
 
+def _doc_entities(doc) -> list[dict]:
     entities = {}
     for ent in doc.ents:
         name = normalize_entity(ent.text)
@@ -211,3 +401,27 @@ def persist_chunks_batch(tx, payload):
         """,
         payload=payload
     )
+
+def remove_document(tx, doc_id: str) -> dict:
+    """
+    Delete a document, its chunks, and any entities no other chunk mentions.
+    """
+    record = tx.run(
+        """
+        MATCH (d:Document {id: $doc_id})
+        OPTIONAL MATCH (d)-[:CONTAINS]->(c:Chunk)
+        OPTIONAL MATCH (c)-[:MENTIONS]->(e:Entity)
+        WITH d, collect(DISTINCT c) AS chunks, collect(DISTINCT e) AS entities
+        FOREACH (c IN chunks | DETACH DELETE c)
+        DETACH DELETE d
+
+        WITH chunks, [e IN entities WHERE NOT (e)<-[:MENTIONS]-()] AS orphans
+        FOREACH (e IN orphans | DETACH DELETE e)
+        RETURN size(chunks) AS chunks_deleted, size(orphans) AS entities_deleted
+        """,
+        doc_id=doc_id
+    ).single()
+
+    if record is None:
+        return {"chunks_deleted": 0, "entities_deleted": 0, "found": False}
+    return {**record.data(), "found": True}
@@ -1,20 +1,162 @@
-from neo4j import GraphDatabase
+import time
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from neo4j import GraphDatabase, AsyncGraphDatabase
 from app.config import *
 
-class Neo4jClient:
+DRIVER_OPTIONS = {
+    "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+    "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT_S,
+    "connection_timeout": NEO4J_CONNECTION_TIMEOUT_S,
+    "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME_S,
+}
+
+_driver = None
+_async_driver = None
+_lock = threading.Lock()
+
+
+class SessionStats:
+    """
+    Session counters for one driver, reported by pool_metrics().
+    """
+
     def __init__(self):
-        self.driver = GraphDatabase.driver(
-            NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD)
-        )
+        self.opened = 0
+        self.active = 0
+        self.peak_active = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.opened += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.seconds += time.perf_counter() - start
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sessions_opened": self.opened,
+                "sessions_active": self.active,
+                "sessions_peak": self.peak_active,
+                "session_errors": self.errors,
+                "avg_session_ms": round(self.seconds / self.opened * 1000, 2) if self.opened else 0.0,
+            }
+
+
+SYNC_STATS = SessionStats()
+ASYNC_STATS = SessionStats()
+
+
+def get_driver():
+    """
+    Process-wide driver; its connection pool is shared by every Neo4jClient.
+    """
+    global _driver
+    with _lock:
+        if _driver is None:
+            _driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), **DRIVER_OPTIONS)
+    return _driver
+
+
+def get_async_driver():
+    """
+    Process-wide async driver. Bound to the event loop that first uses it,
+    so create it from the API lifespan.
+    """
+    global _async_driver
+    with _lock:
+        if _async_driver is None:
+            _async_driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), **DRIVER_OPTIONS)
+    return _async_driver
+
+
+def close_driver():
+    global _driver
+    with _lock:
+        driver, _driver = _driver, None
+    if driver is not None:
+        driver.close()
+
+
+async def close_async_driver():
+    global _async_driver
+    with _lock:
+        driver, _async_driver = _async_driver, None
+    if driver is not None:
+        await driver.close()
+
+
+def pool_metrics() -> dict:
+    # The driver exposes no pool API; an active session holds at most one
+    # pooled connection, so sessions_active bounds the connections in use
+    metrics = {"max_pool_size": NEO4J_MAX_POOL_SIZE}
+    for name, driver, stats in (("sync", _driver, SYNC_STATS), ("async", _async_driver, ASYNC_STATS)):
+        metrics[name] = {"driver": driver is not None, **stats.snapshot()}
+    return metrics
+
+
+class Neo4jClient:
+    def __init__(self, driver=None):
+        # Cheap: sessions come from the shared driver's pool
+        self.driver = driver or get_driver()
+
+    @contextmanager
+    def session(self, **kwargs):
+        with SYNC_STATS.track():
+            with self.driver.session(**kwargs) as session:
+                yield session
 
     def run(self, query, params=None):
-        with self.driver.session() as session:
+        with self.session() as session:
             return list(session.run(query, params or {}))
 
     def document_exists(self, doc_id: str) -> bool:
-        with self.driver.session() as session:
+        with self.session() as session:
             result = session.run(
                 "MATCH (d:Document {id: $id}) RETURN d LIMIT 1",
                 {"id": doc_id}
             )
-            return result.single() is not None
\ No newline at end of file
+            return result.single() is not None
+
+
+class AsyncNeo4jClient:
+    """
+    Neo4jClient for async request handlers, on the shared async driver.
+    """
+
+    def __init__(self, driver=None):
+        self.driver = driver or get_async_driver()
+
+    @asynccontextmanager
+    async def session(self, **kwargs):
+        with ASYNC_STATS.track():
+            async with self.driver.session(**kwargs) as session:
+                yield session
+
+    async def run(self, query, params=None):
+        async with self.session() as session:
+            result = await session.run(query, params or {})
+            return [record async for record in result]
+
+    async def document_exists(self, doc_id: str) -> bool:
+        async with self.session() as session:
+            result = await session.run(
+                "MATCH (d:Document {id: $id}) RETURN d LIMIT 1",
+                {"id": doc_id}
+            )
+            return await result.single() is not None
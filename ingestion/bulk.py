@@ -0,0 +1,377 @@
+"""
+Bulk ingestion of a directory or manifest of PDFs.
+
+    python -m ingestion.bulk ./scans
+    python -m ingestion.bulk --manifest corpus.txt --ocr-workers 4
+
+Documents flow through OCR -> chunking -> embeddings -> entities -> writer
+threads connected by bounded queues, so document N+1 is OCR'd while document
+N is embedded. The writer publishes one FAISS segment and one Neo4j
+transaction per batch of documents instead of one per document.
+
+Every stage is checkpointed like ingest(): rerunning the same command after
+a crash or a failed document resumes where it stopped and skips documents
+that are already ingested.
+"""
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+
+from app.config import (
+    BULK_OCR_WORKERS,
+    BULK_ENTITY_WORKERS,
+    BULK_QUEUE_SIZE,
+    BULK_WRITE_BATCH_DOCS,
+    BULK_WRITE_MAX_WAIT_S,
+    BULK_REPORT_S,
+)
+from ingestion.dedup import document_hash
+from ingestion.checkpoint import IngestCheckpoint
+from ingestion.embeddings import embed_texts
+from ingestion.ingest import (
+    already_ingested,
+    ocr_pages,
+    chunk_document,
+    extract_graph_payload,
+    write_vectors,
+)
+from graph.neo4j_client import Neo4jClient
+from graph.graph_builder import persist_chunks_batch, remove_document
+from observability.logging import log_event, log_error
+
+# End of input; each stage forwards it once all of its workers have seen it
+_END = object()
+
+
+def find_pdfs(root: str) -> list[str]:
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def read_manifest(path: str) -> list[str]:
+    """
+    One PDF path per line; blank lines and '#' comments are ignored.
+    Relative paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+
+class Stats:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def docs_per_min(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed * 60 if elapsed else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "total": self.total,
+            "done": self.done,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "docs_per_min": round(self.docs_per_min(), 2),
+        }
+
+
+class Stage:
+    """
+    `workers` threads applying `fn` to documents from `inbox` and passing
+    them on to `outbox`. A document whose `fn` raises leaves the pipeline;
+    its checkpoint keeps whatever stages it finished for the next run.
+    """
+
+    def __init__(self, name: str, fn, workers: int, outbox: queue.Queue, stats: Stats, queue_size: int):
+        self.name = name
+        self.fn = fn
+        self.workers = max(workers, 1)
+        self.outbox = outbox
+        self.stats = stats
+        self.inbox = queue.Queue(queue_size)
+        self._running = self.workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"bulk-{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            doc = self.inbox.get()
+            if doc is _END:
+                # Leave it for sibling workers
+                self.inbox.put(_END)
+                break
+            try:
+                self.fn(doc)
+            except Exception as e:
+                self.stats.add(failed=1)
+                log_error("bulk.document_failed", e, metadata={
+                    "stage": self.name, "document_id": doc["doc_id"], "path": doc["path"]
+                })
+                continue
+            self.outbox.put(doc)
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last:
+            self.outbox.put(_END)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+# ----------------------------
+# Per-document stages
+# ----------------------------
+
+def run_ocr(doc: dict):
+    if doc["checkpoint"].done("chunks"):
+        # Chunked by an earlier run (bulk or ingest()): the pages are not needed
+        return
+    doc["pages"] = ocr_pages(doc["path"], doc["checkpoint"])
+
+
+def run_chunks(doc: dict):
+    pages = doc.pop("pages", None)
+    doc["chunks"] = doc["checkpoint"].run("chunks", lambda: chunk_document(doc["doc_id"], pages))
+    doc["page_count"] = len(pages) if pages is not None else len({c["page_number"] for c in doc["chunks"]})
+
+
+def run_embeddings(doc: dict):
+    texts = [c["text"] for c in doc["chunks"]]
+    doc["vectors"] = doc["checkpoint"].run("embeddings", lambda: embed_texts(texts))
+
+
+def run_entities(doc: dict):
+    doc["graph_payload"] = doc["checkpoint"].run("entities", lambda: extract_graph_payload(doc["chunks"]))
+
+
+# ----------------------------
+# Cross-document writer
+# ----------------------------
+
+class Writer:
+    """
+    Collects finished documents and writes them BULK_WRITE_BATCH_DOCS at a
+    time (or after BULK_WRITE_MAX_WAIT_S): one FAISS upsert + publish and
+    one Neo4j transaction per batch.
+    """
+
+    def __init__(self, stats: Stats, force: bool, batch_docs: int, max_wait_s: float, queue_size: int):
+        self.stats = stats
+        self.force = force
+        self.batch_docs = max(batch_docs, 1)
+        self.max_wait_s = max_wait_s
+        # Room for a full batch plus what the entity stage has in hand
+        self.inbox = queue.Queue(queue_size + self.batch_docs)
+        self.graph = Neo4jClient()
+        self._thread = threading.Thread(target=self._work, name="bulk-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def join(self):
+        self._thread.join()
+
+    def _work(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                doc = self.inbox.get(timeout=timeout)
+            except queue.Empty:
+                doc = None
+
+            if doc is not None and doc is not _END:
+                batch.append(doc)
+                deadline = deadline or time.monotonic() + self.max_wait_s
+
+            if batch and (doc is None or doc is _END or len(batch) >= self.batch_docs):
+                self._flush(batch)
+                batch, deadline = [], None
+
+            if doc is _END:
+                break
+
+    def _flush(self, batch: list[dict]):
+        start = time.perf_counter()
+        try:
+            self._write(batch)
+        except Exception as e:
+            self.stats.add(failed=len(batch))
+            log_error("bulk.write_failed", e, metadata={"documents": [d["doc_id"] for d in batch]})
+            return
+
+        for doc in batch:
+            doc["checkpoint"].clear()
+        self.stats.add(done=len(batch), chunks=sum(len(d["chunks"]) for d in batch))
+        log_event("bulk.write", metadata={
+            "documents": len(batch),
+            "chunks": sum(len(d["chunks"]) for d in batch),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    def _write(self, batch: list[dict]):
+        # Resumed documents may have reached the vector store last run
+        pending = [d for d in batch if not d["checkpoint"].done("vector_store")]
+        if pending:
+            vectors = np.vstack([np.asarray(d["vectors"], dtype="float32") for d in pending])
+            write_vectors(vectors, [c for d in pending for c in d["chunks"]])
+            for doc in pending:
+                doc["checkpoint"].save("vector_store")
+
+        pending = [d for d in batch if not d["checkpoint"].done("graph")]
+        if pending:
+            removed = [d["doc_id"] for d in pending] if self.force else []
+            payload = [p for d in pending for p in d["graph_payload"]]
+            with self.graph.session() as session:
+                session.execute_write(_write_graph, removed, payload)
+            for doc in pending:
+                doc["checkpoint"].save("graph")
+
+
+def _write_graph(tx, removed: list[str], payload: list[dict]):
+    for doc_id in removed:
+        # Chunk ids are positional, so stale chunks would otherwise linger
+        remove_document(tx, doc_id)
+    if payload:
+        persist_chunks_batch(tx, payload)
+
+
+# ----------------------------
+# Pipeline
+# ----------------------------
+
+def run_bulk(
+    paths: list[str],
+    force: bool = False,
+    ocr_workers: int = BULK_OCR_WORKERS,
+    entity_workers: int = BULK_ENTITY_WORKERS,
+    queue_size: int = BULK_QUEUE_SIZE,
+    batch_docs: int = BULK_WRITE_BATCH_DOCS,
+    max_wait_s: float = BULK_WRITE_MAX_WAIT_S,
+    report_s: float = BULK_REPORT_S,
+) -> dict:
+    stats = Stats(len(paths))
+    writer = Writer(stats, force, batch_docs, max_wait_s, queue_size)
+
+    # Built back to front: each stage feeds the next one's inbox
+    stages = []
+    outbox = writer.inbox
+    for name, fn, workers in reversed([
+        ("ocr", run_ocr, ocr_workers),
+        ("chunks", run_chunks, 1),
+        ("embeddings", run_embeddings, 1),
+        ("entities", run_entities, entity_workers),
+    ]):
+        stage = Stage(name, fn, workers, outbox, stats, queue_size)
+        stages.insert(0, stage)
+        outbox = stage.inbox
+
+    def depths() -> dict:
+        return {**{s.name: s.inbox.qsize() for s in stages}, "write": writer.inbox.qsize()}
+
+    stop_reporting = threading.Event()
+
+    def report():
+        while not stop_reporting.wait(report_s):
+            log_event("bulk.progress", metadata={**stats.snapshot(), "queues": depths()})
+
+    writer.start()
+    for stage in stages:
+        stage.start()
+    threading.Thread(target=report, name="bulk-report", daemon=True).start()
+
+    log_event("bulk.start", metadata={"documents": len(paths), "force": force})
+
+    # Hashing and the skip check are cheap; the OCR inbox bound paces them
+    seen = set()
+    for path in paths:
+        try:
+            doc_id = document_hash(path)
+        except OSError as e:
+            stats.add(failed=1)
+            log_error("bulk.document_failed", e, metadata={"stage": "hash", "path": path})
+            continue
+
+        if doc_id in seen or (not force and already_ingested(doc_id)):
+            stats.add(skipped=1)
+            continue
+        seen.add(doc_id)
+
+        checkpoint = IngestCheckpoint(doc_id)
+        if checkpoint.exists():
+            log_event("ingest.resume", metadata={"document_id": doc_id, "completed": checkpoint.completed()})
+        stages[0].inbox.put({"path": path, "doc_id": doc_id, "checkpoint": checkpoint})
+
+    stages[0].inbox.put(_END)
+    for stage in stages:
+        stage.join()
+    writer.join()
+    stop_reporting.set()
+
+    summary = stats.snapshot()
+    log_event("bulk.done", metadata={
+        **summary, "duration_s": round(time.perf_counter() - stats.started, 1)
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or manifest of PDFs")
+    parser.add_argument("directory", nargs="?", help="Directory to walk for *.pdf files")
+    parser.add_argument("--manifest", help="File listing one PDF path per line")
+    parser.add_argument("--force", action="store_true", help="Re-ingest documents that already exist")
+    parser.add_argument("--ocr-workers", type=int, default=BULK_OCR_WORKERS)
+    parser.add_argument("--entity-workers", type=int, default=BULK_ENTITY_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=BULK_QUEUE_SIZE)
+    parser.add_argument("--batch-docs", type=int, default=BULK_WRITE_BATCH_DOCS)
+    parser.add_argument("--report-s", type=float, default=BULK_REPORT_S)
+    args = parser.parse_args()
+
+    if bool(args.directory) == bool(args.manifest):
+        parser.error("give either a directory or --manifest")
+
+    paths = read_manifest(args.manifest) if args.manifest else find_pdfs(args.directory)
+    summary = run_bulk(
+        paths,
+        force=args.force,
+        ocr_workers=args.ocr_workers,
+        entity_workers=args.entity_workers,
+        queue_size=args.queue_size,
+        batch_docs=args.batch_docs,
+        report_s=args.report_s,
+    )
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+import numpy as np
+from app.config import INGEST_CHECKPOINT_DIR
+from observability.logging import log_event
+
+# Stages in pipeline order; the ones in ARRAY_STAGES hold a vector matrix,
+# the ones in LINE_STAGES a list written one JSON line per item as it streams
+STAGES = ("ocr", "chunks", "embeddings", "vector_store", "entities", "graph")
+ARRAY_STAGES = {"embeddings"}
+LINE_STAGES = {"ocr"}
+
+
+class IngestCheckpoint:
+    """
+    Stage outputs of one document's ingestion, under
+    INGEST_CHECKPOINT_DIR/<document hash>/.
+
+    Each completed stage is written atomically, so a rerun after a failure
+    resumes from the last completed stage instead of paying for OCR and
+    embeddings again. Removed once the document is fully ingested.
+
+    `on_stage(stage, state)` is told when a stage is running, done or
+    resumed from an earlier run (job progress reporting).
+
+    Line stages can also be built item by item: append() adds to a partial
+    file that a rerun reads back with partial(), and finish() marks the
+    stage done, so a failure part-way keeps what was already paid for.
+    """
+
+    def __init__(self, doc_id: str, root: str = INGEST_CHECKPOINT_DIR, on_stage=None):
+        self.doc_id = doc_id
+        self.dir = os.path.join(root, doc_id)
+        self.on_stage = on_stage or (lambda stage, state: None)
+
+    def _path(self, stage: str) -> str:
+        if stage in ARRAY_STAGES:
+            return os.path.join(self.dir, f"{stage}.npy")
+        if stage in LINE_STAGES:
+            return os.path.join(self.dir, f"{stage}.jsonl")
+        return os.path.join(self.dir, f"{stage}.json")
+
+    def _partial_path(self, stage: str) -> str:
+        return self._path(stage) + ".partial"
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.dir)
+
+    def done(self, stage: str) -> bool:
+        return os.path.exists(self._path(stage))
+
+    def completed(self) -> list[str]:
+        return [stage for stage in STAGES if self.done(stage)]
+
+    def load(self, stage: str):
+        if stage in ARRAY_STAGES:
+            return np.load(self._path(stage))
+        if stage in LINE_STAGES:
+            return self._read_lines(self._path(stage))
+        with open(self._path(stage), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _read_lines(path: str, repair: bool = False) -> list:
+        with open(path, "r+b" if repair else "rb") as f:
+            data = f.read()
+            # A last line without a newline was torn by a crash mid-append
+            end = data.rfind(b"\n") + 1
+            if repair and end < len(data):
+                # Later appends then start on a fresh line
+                f.truncate(end)
+        return [json.loads(line) for line in data[:end].decode("utf-8").splitlines()]
+
+    def partial(self, stage: str) -> list:
+        """
+        Items appended to `stage` by an earlier run that did not finish it.
+        """
+        path = self._partial_path(stage)
+        return self._read_lines(path, repair=True) if os.path.exists(path) else []
+
+    def append(self, stage: str, items: list):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self._partial_path(stage), "ab") as f:
+            f.write(self._encode_lines(items))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _encode_lines(items: list) -> bytes:
+        return "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode("utf-8")
+
+    def finish(self, stage: str):
+        """
+        Mark a line stage built with append() as done.
+        """
+        if not os.path.exists(self._partial_path(stage)):
+            self.append(stage, [])
+        os.replace(self._partial_path(stage), self._path(stage))
+
+    def save(self, stage: str, data=None):
+        os.makedirs(self.dir, exist_ok=True)
+        path = self._path(stage)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            if stage in ARRAY_STAGES:
+                np.save(f, np.asarray(data, dtype="float32"))
+            elif stage in LINE_STAGES:
+                f.write(self._encode_lines(data))
+            else:
+                f.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def run(self, stage: str, fn):
+        """
+        Output of `stage`: loaded if a previous run completed it, otherwise
+        computed by `fn()` and checkpointed.
+        """
+        if self.done(stage):
+            log_event("ingest.resume_stage", metadata={"document_id": self.doc_id, "stage": stage})
+            self.on_stage(stage, "resumed")
+            return self.load(stage)
+
+        self.on_stage(stage, "running")
+        data = fn()
+        self.save(stage, data)
+        self.on_stage(stage, "done")
+        return data
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -5,15 +5,19 @@ splitter = RecursiveCharacterTextSplitter(
     chunk_overlap=100
 )
 
-def chunk_pages(doc_id: str, pages: list[dict]) -> list[dict]:
-    chunks = []
+def iter_chunks(doc_id: str, pages):
+    """
+    Chunks of `pages` (any iterable, e.g. pages streaming out of OCR), page by page.
+    """
     for page in pages:
         texts = splitter.split_text(page["text"])
         for idx, t in enumerate(texts):
-            chunks.append({
+            yield {
                 "document_id": doc_id,
                 "page_number": page["page_number"],
                 "chunk_id": f"{doc_id}_p{page['page_number']}_c{idx}",
                 "text": t
-            })
-    return chunks
+            }
+
+def chunk_pages(doc_id: str, pages: list[dict]) -> list[dict]:
+    return list(iter_chunks(doc_id, pages))
@@ -1,5 +1,113 @@
+import re
 import hashlib
+from collections import defaultdict
+from app.config import NEAR_DUP_SCOPE, NEAR_DUP_MAX_DISTANCE
+from observability.logging import log_event
+
+# Read size for hashing; memory stays constant whatever the file size
+HASH_CHUNK = 1 << 20
+
+# SimHash: 64-bit fingerprint split into 4 bands of 16 bits. Fingerprints
+# within Hamming distance 3 agree on at least one whole band
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SHINGLE_WORDS = 3
 
 def document_hash(pdf_path: str) -> str:
+    digest = hashlib.sha256()
     with open(pdf_path, "rb") as f:
-        return hashlib.sha256(f.read()).hexdigest()
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ----------------------------
+# Near-duplicate chunks
+# ----------------------------
+
+def simhash(text: str) -> int:
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def simhash_bands(fingerprint: int) -> list[int]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    return [fingerprint >> (width * i) & ((1 << width) - 1) for i in range(SIMHASH_BANDS)]
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateFilter:
+    """
+    Drops chunks whose SimHash is within `max_distance` bits of a chunk
+    already kept for the document (scope "document"), or of a live chunk of
+    another stored document (scope "corpus").
+
+    In-document duplicates are linked rather than lost: the kept chunk lists
+    the other pages the text appeared on under "duplicate_pages". Kept chunks
+    carry their "simhash", which the metadata store indexes for corpus lookups.
+    """
+
+    def __init__(self, doc_id: str, scope: str = NEAR_DUP_SCOPE, max_distance: int = NEAR_DUP_MAX_DISTANCE, meta=None):
+        self.doc_id = doc_id
+        self.scope = scope
+        self.max_distance = max_distance
+        self.meta = meta
+        if scope == "corpus" and meta is None:
+            from vectorstore.metadata_store import MetadataStore
+            self.meta = MetadataStore()
+        self._bands = [defaultdict(list) for _ in range(SIMHASH_BANDS)]
+        self.kept = 0
+        self.suppressed = 0
+        self.suppressed_corpus = 0
+
+    def _find(self, fingerprint: int):
+        for band, value in zip(self._bands, simhash_bands(fingerprint)):
+            for other, chunk in band.get(value, ()):
+                if hamming(fingerprint, other) <= self.max_distance:
+                    return chunk
+        return None
+
+    def _add(self, fingerprint: int, chunk: dict):
+        for band, value in zip(self._bands, simhash_bands(fingerprint)):
+            band[value].append((fingerprint, chunk))
+
+    def filter(self, chunks):
+        for chunk in chunks:
+            if self.scope == "off":
+                yield chunk
+                continue
+
+            fingerprint = simhash(chunk["text"])
+            kept = self._find(fingerprint)
+            if kept is not None:
+                pages = kept.setdefault("duplicate_pages", [])
+                if chunk["page_number"] != kept["page_number"] and chunk["page_number"] not in pages:
+                    pages.append(chunk["page_number"])
+                self.suppressed += 1
+                continue
+
+            if self.scope == "corpus" and self.meta.has_near_duplicate(fingerprint, self.max_distance, exclude_document=self.doc_id):
+                self.suppressed_corpus += 1
+                continue
+
+            chunk["simhash"] = fingerprint
+            self._add(fingerprint, chunk)
+            self.kept += 1
+            yield chunk
+
+        if self.scope != "off":
+            log_event("ingest.near_duplicates", metadata={
+                "document_id": self.doc_id,
+                "scope": self.scope,
+                "kept": self.kept,
+                "suppressed": self.suppressed,
+                "suppressed_corpus": self.suppressed_corpus,
+            })
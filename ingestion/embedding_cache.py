@@ -0,0 +1,115 @@
+import os
+import time
+import hashlib
+import numpy as np
+from app.config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_MB
+from app.sqlite import LOOKUP_BATCH, ThreadLocalConnection, connect, select_in
+from observability.logging import log_event
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model     TEXT NOT NULL,
+    sha256    TEXT NOT NULL,
+    vector    BLOB NOT NULL,            -- float32 bytes
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (model, sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    id    INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats VALUES (0, 0);
+"""
+
+# Evict down to this fraction of the limit, so eviction runs rarely
+EVICT_TO = 0.9
+# last_used is only rewritten once it is this stale: LRU order at this
+# granularity is enough for eviction, and hot keys cost no write per hit
+LAST_USED_RESOLUTION_S = 3600
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache in SQLite, keyed by (model, sha256(text)).
+
+    Least recently used vectors are evicted once the stored vectors exceed
+    `max_bytes`. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = ThreadLocalConnection(lambda: connect(path, synchronous="NORMAL"))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def get_many(self, model: str, keys: list[str]) -> dict[str, np.ndarray]:
+        """
+        Cached vectors for the given text keys; misses are absent.
+        """
+        conn = self._conn()
+        rows = select_in(
+            conn, "SELECT sha256, vector, last_used FROM embeddings WHERE model = ? AND sha256 IN ({keys})",
+            keys, [model]
+        )
+        found = {key: np.frombuffer(blob, dtype="float32") for key, blob, _ in rows}
+
+        now = int(time.time())
+        stale = [(now, model, key) for key, _, last_used in rows if last_used < now - LAST_USED_RESOLUTION_S]
+        if stale:
+            with conn:
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND sha256 = ?", stale)
+        return found
+
+    def put_many(self, model: str, items: dict[str, np.ndarray]):
+        if not items:
+            return
+
+        now = int(time.time())
+        conn = self._conn()
+        added = 0
+        with conn:
+            for key, vector in items.items():
+                blob = np.asarray(vector, dtype="float32").tobytes()
+                # Same model + same text -> same vector: a concurrent writer's row is as good
+                cur = conn.execute("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)", (model, key, blob, now))
+                added += len(blob) if cur.rowcount == 1 else 0
+            conn.execute("UPDATE stats SET bytes = bytes + ? WHERE id = 0", (added,))
+            total = conn.execute("SELECT bytes FROM stats WHERE id = 0").fetchone()[0]
+
+        if total > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        conn = self._conn()
+        target = int(self.max_bytes * EVICT_TO)
+        evicted = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # The running total kept by put_many, not a scan of every row
+            total = conn.execute("SELECT bytes FROM stats WHERE id = 0").fetchone()[0]
+            while total > target:
+                victims = conn.execute(
+                    "SELECT model, sha256, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?",
+                    (LOOKUP_BATCH,)
+                ).fetchall()
+                if not victims:
+                    total = 0
+                    break
+                batch = []
+                for model, key, size in victims:
+                    if total <= target:
+                        break
+                    batch.append((model, key))
+                    total -= size
+                conn.executemany("DELETE FROM embeddings WHERE model = ? AND sha256 = ?", batch)
+                evicted += len(batch)
+            conn.execute("UPDATE stats SET bytes = ? WHERE id = 0", (total,))
+
+        log_event("embedding_cache.evict", metadata={"evicted": evicted, "bytes": total})
@@ -1,11 +1,366 @@
+import re
+import time
+import zlib
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import openai
+import tiktoken
 from openai import OpenAI
-from app.config import OPENAI_API_KEY
+from app.config import (
+    OPENAI_API_KEY,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIM,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_MAX_ITEMS,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+)
+from ingestion.embedding_cache import EmbeddingCache, text_key
+from observability.logging import log_event
+
+# Per-input limit of the embeddings API; longer inputs are truncated
+MAX_INPUT_TOKENS = 8191
+# Native output size of the OpenAI models; smaller EMBEDDING_DIM is requested via `dimensions`
+OPENAI_MODEL_DIMS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+}
+
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+encoding = tiktoken.get_encoding("cl100k_base")
+
+_cache = None
+_provider = None
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+# -----------------------------------------------------------------------------
+# Batching
+# -----------------------------------------------------------------------------
+
+def token_batches(texts: list[str], max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+                  max_items: int = EMBEDDING_BATCH_MAX_ITEMS) -> tuple[list[str], list[range]]:
+    """
+    Split `texts` into consecutive batches within the per-request token and
+    item limits. Returns the (possibly truncated) texts and the index range
+    of each batch.
+    """
+    texts = list(texts)
+    batches = []
+    start, tokens = 0, 0
+    for i, text in enumerate(texts):
+        ids = encoding.encode(text, disallowed_special=())
+        if len(ids) > MAX_INPUT_TOKENS:
+            texts[i] = encoding.decode(ids[:MAX_INPUT_TOKENS])
+            ids = ids[:MAX_INPUT_TOKENS]
+            log_event("embeddings.truncated", metadata={"tokens": len(ids)})
+
+        if i > start and (tokens + len(ids) > max_tokens or i - start >= max_items):
+            batches.append(range(start, i))
+            start, tokens = i, 0
+        tokens += len(ids)
+
+    if start < len(texts):
+        batches.append(range(start, len(texts)))
+    return texts, batches
+
+
+class AdaptiveConcurrency:
+    """
+    Process-wide cap on in-flight embedding requests (AIMD).
+
+    A 429 halves the cap and pauses new requests for the server's
+    Retry-After; every `limit` consecutive successes raise it by one, back
+    up to the configured maximum.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.resume_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.in_flight < self.limit:
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False, retry_after: float = 0.0):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+                self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            self._cond.notify_all()
+
+
+_limiter = AdaptiveConcurrency(EMBEDDING_MAX_CONCURRENCY)
+
+
+def _retry_after(e: openai.APIStatusError):
+    headers = e.response.headers if e.response is not None else {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def _embed_batch(request, texts: list[str]) -> list[list[float]]:
+    delay = BACKOFF_BASE_S
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        last = attempt == EMBEDDING_MAX_RETRIES
+        _limiter.acquire()
+        try:
+            vectors = request(texts)
+        except openai.RateLimitError as e:
+            wait = _retry_after(e) or delay * (1 + random.random())
+            _limiter.release(throttled=True, retry_after=wait)
+            log_event("embeddings.rate_limited", metadata={
+                "attempt": attempt, "wait_s": round(wait, 2), "concurrency": _limiter.limit
+            })
+            if last:
+                raise
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            _limiter.release()
+            log_event("embeddings.retry", metadata={"attempt": attempt, "error": type(e).__name__})
+            if last:
+                raise
+            time.sleep(delay * (1 + random.random()))
+        except Exception:
+            _limiter.release()
+            raise
+        else:
+            _limiter.release()
+            return vectors
+        delay = min(delay * 2, BACKOFF_MAX_S)
+
+
+def embed_batched(request, texts: list[str]) -> list[list[float]]:
+    """
+    Run `request` (one API call for a list of texts) over `texts` in
+    token-bounded batches, sent concurrently. Vectors come back in input order.
+    """
+    texts, batches = token_batches(texts)
+    if len(batches) <= 1:
+        return _embed_batch(request, texts) if texts else []
+
+    with ThreadPoolExecutor(max_workers=min(EMBEDDING_MAX_CONCURRENCY, len(batches))) as pool:
+        results = pool.map(lambda batch: _embed_batch(request, texts[batch.start:batch.stop]), batches)
+        return [vector for result in results for vector in result]
+
+
+# -----------------------------------------------------------------------------
+# Providers
+# -----------------------------------------------------------------------------
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into `dim`-dimensional vectors. `model` identifies the
+    vector space (it keys the embedding cache); `cacheable` is False for
+    providers that are cheaper to run than to look up.
+    """
+
+    model: str
+    dim: int
+    cacheable = True
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    OpenAI embeddings API through the token-aware, rate-limit-aware batcher.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dim: int = EMBEDDING_DIM):
+        native = OPENAI_MODEL_DIMS.get(model)
+        if native is not None and dim > native:
+            raise ValueError(f"{model} produces at most {native} dimensions, EMBEDDING_DIM is {dim}")
+        # text-embedding-3 models can return shortened vectors natively
+        self.dimensions = dim if native is not None and dim < native else None
+        self.model = model if self.dimensions is None else f"{model}@{dim}"
+        self.api_model = model
+        self.dim = dim
+        self._client = None
+
+    @property
+    def client(self) -> OpenAI:
+        # Created on first use so that importing this module needs no network or key;
+        # retries are done by the batcher, which also adapts concurrency to 429s
+        if self._client is None:
+            self._client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        return self._client
+
+    def _request(self, texts: list[str]) -> list[list[float]]:
+        extra = {"dimensions": self.dimensions} if self.dimensions else {}
+        resp = self.client.embeddings.create(
+            model=self.api_model,
+            input=texts,
+            **extra
+        )
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return embed_batched(self._request, texts)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic local embeddings, no network and no model files.
+
+    Words, word bigrams and character n-grams are hashed (crc32) into `dim`
+    signed buckets and the counts are L2-normalized. The similarity is lexical
+    rather than semantic, which is enough for load tests, offline runs and
+    low-value corpora.
+    """
+
+    cacheable = False
+
+    def __init__(self, dim: int = EMBEDDING_DIM, ngrams: tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngrams = ngrams
+        self.model = f"hashing-{ngrams[0]}-{ngrams[1]}@{dim}"
+
+    def _features(self, text: str) -> list[str]:
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        low, high = self.ngrams
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, min(high, len(padded)) + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype="uint32", count=len(features))
+            # Low bits pick the bucket, the top bit the sign (keeps collisions unbiased)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype("float32")
+            np.add.at(vectors[row], hashes % self.dim, signs)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+        return vectors.tolist()
+
+
+PROVIDERS = {
+    "openai": OpenAIEmbeddingProvider,
+    "hashing": HashingEmbeddingProvider,
+}
+
+
+def get_provider() -> EmbeddingProvider:
+    global _provider
+    if _provider is None:
+        if EMBEDDING_PROVIDER not in PROVIDERS:
+            raise ValueError(f"Unknown EMBEDDING_PROVIDER {EMBEDDING_PROVIDER!r}, expected one of {sorted(PROVIDERS)}")
+        _provider = PROVIDERS[EMBEDDING_PROVIDER]()
+    return _provider
+
+
+def embed_uncached(texts: list[str]) -> list[list[float]]:
+    return get_provider().embed(texts) if texts else []
+
+
+# -----------------------------------------------------------------------------
+# Public API
+# -----------------------------------------------------------------------------
+
+def embed_stream(items, text_of=lambda item: item, max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+                 max_items: int = EMBEDDING_BATCH_MAX_ITEMS, max_in_flight: int = EMBEDDING_MAX_CONCURRENCY):
+    """
+    Embed an iterable as it is produced. Items are grouped into token-bounded
+    batches, at most `max_in_flight` batches are embedded at once (through
+    embed_texts, so the cache applies), and (item, float32 vector) pairs are
+    yielded in input order. Holds at most `max_in_flight` + 1 batches.
+    """
+    max_in_flight = max(1, max_in_flight)
+    in_flight = deque()
+
+    def results():
+        batch, future = in_flight.popleft()
+        return zip(batch, np.asarray(future.result(), dtype="float32"))
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        batch, tokens = [], 0
+        for item in items:
+            n = min(len(encoding.encode(text_of(item), disallowed_special=())), MAX_INPUT_TOKENS)
+            if batch and (tokens + n > max_tokens or len(batch) >= max_items):
+                in_flight.append((batch, pool.submit(embed_texts, [text_of(i) for i in batch])))
+                batch, tokens = [], 0
+                while len(in_flight) >= max_in_flight:
+                    yield from results()
+            batch.append(item)
+            tokens += n
+
+        if batch:
+            in_flight.append((batch, pool.submit(embed_texts, [text_of(i) for i in batch])))
+        while in_flight:
+            yield from results()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
 def embed_texts(texts: list[str]) -> list[list[float]]:
-    resp = client.embeddings.create(
-        model="text-embedding-3-large",
-        input=texts
-    )
-    return [d.embedding for d in resp.data]
+    """
+    Embed `texts` in order with the configured provider. Only texts not seen
+    before (by content) are sent to it; everything else comes from the
+    on-disk cache.
+    """
+    provider = get_provider()
+    if not texts or not EMBEDDING_CACHE_ENABLED or not provider.cacheable:
+        return embed_uncached(texts)
+
+    cache = get_cache()
+    keys = [text_key(t) for t in texts]
+    vectors = cache.get_many(provider.model, list(dict.fromkeys(keys)))
+
+    # Identical texts within one call are embedded once
+    missing = {k: t for k, t in zip(keys, texts) if k not in vectors}
+    if missing:
+        embedded = embed_uncached(list(missing.values()))
+        fresh = {k: np.asarray(v, dtype="float32") for k, v in zip(missing, embedded)}
+        cache.put_many(provider.model, fresh)
+        vectors.update(fresh)
+
+    log_event("embeddings.cache", metadata={
+        "texts": len(texts),
+        "hits": len(texts) - sum(k in missing for k in keys),
+        "embedded": len(missing),
+    })
+    return [vectors[k].tolist() for k in keys]
@@ -1,11 +1,18 @@
-from app.language import detect_language
-from ingestion.ocr import ocr_pdf_with_azure
-from ingestion.chunking import chunk_pages
-from ingestion.embeddings import embed_texts
-from ingestion.dedup import document_hash
-from vectorstore.faiss_store import FaissStore
+import itertools
+import numpy as np
+from app.language import detect_languages
+from ingestion.ocr import iter_ocr_pages
+from ingestion.chunking import iter_chunks
+from ingestion.embeddings import embed_texts, embed_stream
+from ingestion.dedup import document_hash, NearDuplicateFilter
+from vectorstore.faiss_store import FaissStore, get_store
 from graph.neo4j_client import Neo4jClient
-from graph.graph_builder import extract_entities_smart, persist_chunks_batch
+from graph.graph_builder import extract_entities_batch, persist_chunks_batch, remove_document
+from ingestion.checkpoint import IngestCheckpoint
+from observability.logging import log_event
+
+# Chunks per language-ID call while streaming
+LANGUAGE_BATCH = 64
 
 SIGNAL_KEYWORDS = {
     "velocity",
@@ -34,70 +41,113 @@ def is_valid_entity(entity: dict) -> bool:
     return True
 
 def faiss_document_exists(doc_id: str) -> bool:
-    store = FaissStore()
-    try:
-        store.load()
-    except Exception:
-        return False
-
-    return any(
-        meta.get("document_id") == doc_id
-        for meta in store.metadata
-    )
+    # Rows of a save() that never published sit at or above next_id
+    store = get_store()
+    return store.meta.document_exists(doc_id, below=store.next_id)
+
+def already_ingested(doc_id: str) -> bool:
+    # A checkpoint means an earlier run stopped part-way: resume, don't skip
+    return not IngestCheckpoint(doc_id).exists() and faiss_document_exists(doc_id)
+
+def iter_checkpointed_pages(pdf_path: str, checkpoint: IngestCheckpoint):
+    """
+    OCR pages in page order, appended to the checkpoint's ocr stage as they
+    arrive. A rerun replays the pages an earlier run already paid for and
+    OCRs only the rest.
+    """
+    if checkpoint.done("ocr"):
+        log_event("ingest.resume_stage", metadata={"document_id": checkpoint.doc_id, "stage": "ocr"})
+        yield from checkpoint.load("ocr")
+        return
+
+    done = checkpoint.partial("ocr")
+    if done:
+        log_event("ingest.resume_stage", metadata={
+            "document_id": checkpoint.doc_id, "stage": "ocr", "pages": len(done)
+        })
+    yield from done
 
-def ingest(pdf_path: str, force: bool = False) -> dict:
-    doc_id = document_hash(pdf_path)
-    faiss_exists = faiss_document_exists(doc_id)
+    first_page = done[-1]["page_number"] + 1 if done else 1
+    for page in iter_ocr_pages(pdf_path, first_page=first_page):
+        checkpoint.append("ocr", [page])
+        yield page
+    checkpoint.finish("ocr")
 
-    # 1. OCR
-    pages = ocr_pdf_with_azure(pdf_path)
+def ocr_pages(pdf_path: str, checkpoint: IngestCheckpoint) -> list[dict]:
+    pages = list(iter_checkpointed_pages(pdf_path, checkpoint))
     if not pages:
         raise RuntimeError("OCR produced no text")
-
-    # 2. Chunking
-    chunks = chunk_pages(doc_id, pages)
+    return pages
+
+def iter_document_chunks(doc_id: str, pages):
+    # Near-duplicates (repeated headers, boilerplate pages) never reach the embedder
+    chunks = NearDuplicateFilter(doc_id).filter(iter_chunks(doc_id, pages))
+    while batch := list(itertools.islice(chunks, LANGUAGE_BATCH)):
+        for chunk, language in zip(batch, detect_languages([c["text"] for c in batch])):
+            chunk["language"] = language
+            yield chunk
+
+def chunk_document(doc_id: str, pages: list[dict]) -> list[dict]:
+    chunks = list(iter_document_chunks(doc_id, pages))
+    if not chunks:
+        raise RuntimeError("No chunks generated")
+    return chunks
+
+def stream_document(doc_id: str, pdf_path: str, checkpoint: IngestCheckpoint) -> tuple[list[dict], np.ndarray, int]:
+    """
+    OCR, chunking + language detection and embeddings as one generator
+    pipeline: pages are chunked as their OCR part finishes and chunks are
+    embedded in bounded batches while later pages are still being read.
+    Only chunk texts and float32 vectors are kept for the whole document.
+    Returns (chunks, vectors, page count). OCR pages are checkpointed as they
+    stream, chunks and embeddings once the document is done.
+    """
+    stages = ("ocr", "chunks", "embeddings")
+    for stage in stages:
+        checkpoint.on_stage(stage, "running")
+
+    page_count = 0
+
+    def pages():
+        nonlocal page_count
+        for page in iter_checkpointed_pages(pdf_path, checkpoint):
+            page_count += 1
+            yield page
+
+    chunks, vectors = [], []
+    for chunk, vector in embed_stream(iter_document_chunks(doc_id, pages()), text_of=lambda c: c["text"]):
+        chunks.append(chunk)
+        vectors.append(vector)
+
+    if not page_count:
+        raise RuntimeError("OCR produced no text")
     if not chunks:
         raise RuntimeError("No chunks generated")
 
-    for chunk in chunks:
-        lang = detect_language(chunk["text"])
-        chunk["language"] = lang
-
-    # 3. Embeddings (batched, deterministic order)
-    texts = [c["text"] for c in chunks]
-    vectors = embed_texts(texts)
+    vectors = np.vstack(vectors)
+    checkpoint.save("chunks", chunks)
+    checkpoint.save("embeddings", vectors)
+    for stage in stages:
+        checkpoint.on_stage(stage, "done")
+    return chunks, vectors, page_count
 
-    if not force and faiss_exists:
-        return {
-            "status": "skipped",
-            "reason": "document already ingested",
-            "document_id": doc_id
-        }
-
-    # 4. Vector store
+def write_vectors(vectors, chunks: list[dict]):
     store = FaissStore()
     try:
-        store.load()
+        # Appending a segment only needs the manifest, not the existing vectors
+        store.load(read_segments=False)
     except Exception:
         pass
 
-    store.add(vectors, chunks)
+    # Replaces any chunks already stored for this document (force re-ingest,
+    # or a resumed run whose previous attempt already got this far)
+    store.upsert(vectors, chunks)
     store.save()
 
-    # 5. Graph ingestion (BATCHED)
-    graph = Neo4jClient()
-    
-    if not force and graph.document_exists(doc_id):
-        return {
-            "status": "skipped",
-            "reason": "document already ingested",
-            "document_id": doc_id
-        }
-    
+def extract_graph_payload(chunks: list[dict]) -> list[dict]:
     graph_payload = []
-    for chunk in chunks:
-        raw_entities = extract_entities_smart(chunk["text"], lang)
-
+    extracted = extract_entities_batch([(c["text"], c["language"]) for c in chunks])
+    for chunk, raw_entities in zip(chunks, extracted):
         entities = [
             e for e in raw_entities
             if is_valid_entity(e)
@@ -110,15 +160,87 @@ def ingest(pdf_path: str, force: bool = False) -> dict:
             "chunk": chunk,
             "entities": entities
         })
+    return graph_payload
+
+def ingest(pdf_path: str, force: bool = False, on_stage=None, doc_id: str = None) -> dict:
+    # Callers that hashed the file while receiving it pass the hash in
+    doc_id = doc_id or document_hash(pdf_path)
+    checkpoint = IngestCheckpoint(doc_id, on_stage=on_stage)
+
+    # Decide before paying for OCR and embeddings
+    if not force and already_ingested(doc_id):
+        return {
+            "status": "skipped",
+            "reason": "document already ingested",
+            "document_id": doc_id
+        }
+
+    if checkpoint.exists():
+        log_event("ingest.resume", metadata={"document_id": doc_id, "completed": checkpoint.completed()})
 
-    if graph_payload:
-        with graph.driver.session() as session:
-            session.execute_write(persist_chunks_batch, graph_payload)
+    # 1-3. OCR -> chunking + language detection -> embeddings, streamed
+    # (batched, deterministic order; unchanged chunks come from the cache)
+    if checkpoint.done("chunks"):
+        chunks = checkpoint.run("chunks", None)
+        vectors = checkpoint.run("embeddings", lambda: embed_texts([c["text"] for c in chunks]))
+        page_count = len({c["page_number"] for c in chunks})
+    else:
+        chunks, vectors, page_count = stream_document(doc_id, pdf_path, checkpoint)
+
+    # 4. Vector store
+    checkpoint.run("vector_store", lambda: write_vectors(vectors, chunks))
+
+    # 5. Graph ingestion (BATCHED)
+    graph = Neo4jClient()
+    
+    if not force and not checkpoint.done("entities") and graph.document_exists(doc_id):
+        checkpoint.clear()
+        return {
+            "status": "skipped",
+            "reason": "document already ingested",
+            "document_id": doc_id
+        }
+
+    graph_payload = checkpoint.run("entities", lambda: extract_graph_payload(chunks))
+
+    def write_graph():
+        with graph.session() as session:
+            if force:
+                # Chunk ids are positional, so stale chunks would otherwise linger
+                session.execute_write(remove_document, doc_id)
+            if graph_payload:
+                session.execute_write(persist_chunks_batch, graph_payload)
+
+    checkpoint.run("graph", write_graph)
+    checkpoint.clear()
 
     return {
         "status": "success",
         "document_id": doc_id,
-        "pages": len(pages),
+        "pages": page_count,
         "chunks": len(chunks),
         "entities_created": sum(len(p["entities"]) for p in graph_payload)
     }
+
+def delete_document(doc_id: str) -> dict:
+    """
+    Remove a document from the vector index and the knowledge graph.
+    """
+    store = FaissStore()
+    try:
+        store.load(read_segments=False)
+    except Exception:
+        pass
+    vectors_deleted = store.remove_document(doc_id)
+
+    graph = Neo4jClient()
+    with graph.session() as session:
+        graph_result = session.execute_write(remove_document, doc_id)
+
+    return {
+        "document_id": doc_id,
+        "found": bool(vectors_deleted) or graph_result["found"],
+        "vectors_deleted": vectors_deleted,
+        "chunks_deleted": graph_result["chunks_deleted"],
+        "entities_deleted": graph_result["entities_deleted"]
+    }
@@ -0,0 +1,386 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from fastapi.concurrency import run_in_threadpool
+from app.config import (
+    INGEST_JOBS_PATH,
+    INGEST_UPLOAD_DIR,
+    INGEST_WORKERS,
+    INGEST_JOB_MAX_ATTEMPTS,
+    INGEST_JOB_STALE_S,
+    INGEST_JOB_RETRY_DELAY_S,
+)
+from app.sqlite import ThreadLocalConnection, connect
+from ingestion.checkpoint import STAGES
+from ingestion.dedup import HASH_CHUNK
+from observability.logging import log_event, log_error
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,          -- queued | running | succeeded | failed
+    pdf_path    TEXT NOT NULL,
+    document_id TEXT,
+    force       INTEGER NOT NULL DEFAULT 0,
+    stage       TEXT,                   -- stage currently running
+    stages      TEXT NOT NULL,          -- JSON {stage: pending | running | done | resumed}
+    result      TEXT,                   -- JSON result of ingest()
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    heartbeat   REAL,
+    not_before  REAL                    -- a retried job is not claimed before this
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_document ON jobs (document_id, status);
+"""
+
+HEARTBEAT_S = 10
+IDLE_POLL_S = 1.0
+MONITOR_S = 5.0
+
+# Held by whichever process runs the API's worker pool
+POOL_LOCK_PATH = os.path.join(os.path.dirname(INGEST_JOBS_PATH) or ".", "ingest-workers.lock")
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds to wait before the next attempt, after `attempts` failed ones.
+    """
+    return INGEST_JOB_RETRY_DELAY_S * 2 ** max(attempts - 1, 0)
+
+
+# -----------------------------------------------------------------------------
+# Queue
+# -----------------------------------------------------------------------------
+
+class JobQueue:
+    """
+    Durable ingestion job queue in SQLite, shared by the API and workers.
+
+    Jobs survive restarts: a running job whose worker stopped heartbeating
+    is put back in the queue and resumes from its ingestion checkpoint.
+    """
+
+    def __init__(self, path: str = INGEST_JOBS_PATH):
+        self.path = path
+        self._conn = ThreadLocalConnection(lambda: connect(path, row_factory=sqlite3.Row))
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["force"] = bool(job["force"])
+        job["stages"] = json.loads(job["stages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, pdf_path: str, document_id: str = None, force: bool = False) -> tuple[str, bool]:
+        """
+        Queue `pdf_path`. Returns (job id, created): a document that is
+        already queued or running returns that job instead of a new one.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if document_id is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE document_id = ? AND status IN ('queued', 'running') "
+                    "ORDER BY created_at LIMIT 1",
+                    (document_id,)
+                ).fetchone()
+                if row is not None:
+                    log_event("jobs.enqueue_duplicate", metadata={"job_id": row["id"], "document_id": document_id})
+                    return row["id"], False
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, status, pdf_path, document_id, force, stages, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, pdf_path, document_id, int(force), json.dumps({s: "pending" for s in STAGES}), time.time())
+            )
+        log_event("jobs.enqueue", metadata={"job_id": job_id, "document_id": document_id})
+        return job_id, True
+
+    def get(self, job_id: str):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def claim(self, worker: str):
+        """
+        Atomically take the oldest queued job that is due, or None.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND (not_before IS NULL OR not_before <= ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "started_at = COALESCE(started_at, ?), heartbeat = ? WHERE id = ?",
+                (worker, now, now, row["id"])
+            )
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+
+    def set_stage(self, job_id: str, stage: str, state: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row["stages"])
+            stages[stage] = state
+            conn.execute(
+                "UPDATE jobs SET stages = ?, stage = ?, heartbeat = ? WHERE id = ?",
+                (json.dumps(stages), stage if state == "running" else None, time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, result: dict):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', result = ?, document_id = COALESCE(?, document_id), "
+                "stage = NULL, error = NULL, finished_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), result.get("document_id"), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str, retry: bool = False, delay: float = 0.0):
+        """
+        Mark the job failed, or with `retry` queue it again in `delay` seconds.
+        """
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, stage = NULL, worker = NULL, "
+                "not_before = ?, finished_at = ? WHERE id = ?",
+                ("queued" if retry else "failed", error, now + delay if retry else None,
+                 None if retry else now, job_id)
+            )
+
+    def requeue_stale(self, stale_after: float = INGEST_JOB_STALE_S,
+                      max_attempts: int = INGEST_JOB_MAX_ATTEMPTS) -> int:
+        """
+        Put running jobs whose worker died (no heartbeat) back in the queue,
+        after the usual retry delay. A job that has already used its
+        `max_attempts` is failed instead: it keeps killing its worker.
+        """
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            rows = conn.execute(
+                "UPDATE jobs SET "
+                "status = CASE WHEN attempts >= :max THEN 'failed' ELSE 'queued' END, "
+                "error = CASE WHEN attempts >= :max THEN 'worker stopped heartbeating' ELSE error END, "
+                "finished_at = CASE WHEN attempts >= :max THEN :now END, "
+                "not_before = CASE WHEN attempts < :max THEN :now + :delay * (1 << MAX(attempts - 1, 0)) END, "
+                "stage = NULL, worker = NULL "
+                "WHERE status = 'running' AND heartbeat < :stale "
+                "RETURNING status, pdf_path",
+                {"max": max_attempts, "now": now, "delay": INGEST_JOB_RETRY_DELAY_S, "stale": now - stale_after}
+            ).fetchall()
+
+        failed = [row["pdf_path"] for row in rows if row["status"] == "failed"]
+        for pdf_path in failed:
+            _remove_upload(pdf_path)
+        if rows:
+            log_event("jobs.requeue_stale", metadata={"requeued": len(rows) - len(failed), "failed": len(failed)})
+        return len(rows) - len(failed)
+
+
+def _remove_upload(pdf_path: str):
+    try:
+        os.remove(pdf_path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+async def spool_upload(upload, max_bytes: int, suffix: str = ".pdf") -> tuple[str, str]:
+    """
+    Stream an UploadFile to INGEST_UPLOAD_DIR in fixed-size chunks, hashing
+    it in the same pass. Returns (path, sha256 document id). Raises
+    UploadTooLarge as soon as more than `max_bytes` have arrived.
+    """
+    os.makedirs(INGEST_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(INGEST_UPLOAD_DIR, f"{uuid.uuid4().hex}{suffix}")
+    digest = hashlib.sha256()
+    size = 0
+    # File I/O runs in the threadpool: a slow disk must not stall the event loop
+    f = None
+    try:
+        f = await run_in_threadpool(open, path, "wb")
+        while block := await upload.read(HASH_CHUNK):
+            size += len(block)
+            if size > max_bytes:
+                raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+            digest.update(block)
+            await run_in_threadpool(f.write, block)
+        await run_in_threadpool(f.close)
+    except BaseException:
+        if f is not None:
+            f.close()
+            _remove_upload(path)
+        raise
+    return path, digest.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# Workers
+# -----------------------------------------------------------------------------
+
+def run_job(queue: JobQueue, job: dict):
+    from ingestion.ingest import ingest
+
+    job_id = job["id"]
+    stop = threading.Event()
+
+    def beat():
+        # Stages (OCR, LLM calls) can run for minutes; keep the claim alive
+        while not stop.wait(HEARTBEAT_S):
+            queue.heartbeat(job_id)
+
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        result = ingest(
+            job["pdf_path"],
+            force=job["force"],
+            doc_id=job["document_id"],
+            on_stage=lambda stage, state: queue.set_stage(job_id, stage, state)
+        )
+    except Exception as e:
+        retry = job["attempts"] < INGEST_JOB_MAX_ATTEMPTS
+        queue.fail(job_id, f"{type(e).__name__}: {e}", retry=retry, delay=retry_delay(job["attempts"]))
+        log_error("jobs.failed", e, metadata={"job_id": job_id, "attempt": job["attempts"], "retry": retry})
+        if retry:
+            return
+    else:
+        queue.finish(job_id, result)
+        log_event("jobs.succeeded", metadata={"job_id": job_id, "document_id": result.get("document_id")})
+    finally:
+        stop.set()
+
+    # Done with the upload (the checkpoint keeps whatever a retry would need)
+    _remove_upload(job["pdf_path"])
+
+
+def worker_loop(stop_event=None):
+    """
+    Claim and run jobs until `stop_event` is set. Runs in its own process.
+    """
+    queue = JobQueue()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    log_event("jobs.worker_start", metadata={"worker": worker})
+
+    while stop_event is None or not stop_event.is_set():
+        queue.requeue_stale()
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(IDLE_POLL_S)
+            continue
+        run_job(queue, job)
+
+
+class WorkerPool:
+    """
+    INGEST_WORKERS worker processes, started and stopped with the API. A
+    monitor thread replaces any worker that dies (OOM kill, native crash).
+    """
+
+    def __init__(self, size: int = INGEST_WORKERS, target=worker_loop):
+        self.size = size
+        self._target = target
+        # spawn: workers must not inherit the API's threads, sockets or FAISS state
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._processes = []
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def _spawn(self, i: int):
+        process = self._ctx.Process(target=self._target, args=(self._stop,), name=f"ingest-worker-{i}", daemon=True)
+        process.start()
+        return process
+
+    def start(self):
+        with self._lock:
+            self._processes = [self._spawn(i) for i in range(self.size)]
+        if self.size:
+            self._monitor = threading.Thread(target=self._watch, name="ingest-worker-monitor", daemon=True)
+            self._monitor.start()
+
+    def _watch(self):
+        while not self._stop.wait(MONITOR_S):
+            self.respawn_dead()
+
+    def respawn_dead(self) -> int:
+        """
+        Replace workers that exited while the pool is running.
+        """
+        respawned = 0
+        with self._lock:
+            for i, process in enumerate(self._processes):
+                if process.is_alive() or self._stop.is_set():
+                    continue
+                log_event("jobs.worker_respawn", metadata={"worker": process.name, "exitcode": process.exitcode})
+                process.join()
+                self._processes[i] = self._spawn(i)
+                respawned += 1
+        return respawned
+
+    def stop(self, timeout: float = 5.0):
+        # Jobs still running are picked up again (from their checkpoint) after restart
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+        with self._lock:
+            for process in self._processes:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+
+
+def main():
+    # Standalone workers, e.g. on another host or with INGEST_WORKERS=0 on the API
+    parser = argparse.ArgumentParser(description="Run ingestion job workers")
+    parser.add_argument("--workers", type=int, default=max(INGEST_WORKERS, 1))
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.workers)
+    pool.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,51 @@
-from app.config import AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT, AZURE_DOCUMENT_INTELLIGENCE_KEY
-import os
-from collections import defaultdict
+from app.config import (
+    AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
+    AZURE_DOCUMENT_INTELLIGENCE_KEY,
+    OCR_BACKEND,
+    OCR_PAGES_PER_PART,
+    OCR_MAX_PART_MB,
+    OCR_MAX_CONCURRENCY,
+    OCR_STUB_LATENCY_MS,
+)
+import io
+import time
+import itertools
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
+from pypdf import PdfReader, PdfWriter
+from observability.logging import log_event
 
-azure_client = DocumentAnalysisClient(endpoint=AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT, credential=AzureKeyCredential(AZURE_DOCUMENT_INTELLIGENCE_KEY))
+_azure_client = None
 
-def ocr_pdf_with_azure(pdf_path: str) -> list[dict]:
+
+def azure_client():
+    # Created on first use: the stub backend and tests need no Azure credentials
+    global _azure_client
+    if _azure_client is None:
+        from azure.ai.formrecognizer import DocumentAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+
+        _azure_client = DocumentAnalysisClient(
+            endpoint=AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
+            credential=AzureKeyCredential(AZURE_DOCUMENT_INTELLIGENCE_KEY)
+        )
+    return _azure_client
+
+
+# -----------------------------------------------------------------------------
+# Backends: analyse one PDF (part) -> pages numbered from 1 within it
+# -----------------------------------------------------------------------------
+
+def analyze_with_azure(document: bytes) -> list[dict]:
     """
     OCR a scanned PDF using Azure Document Intelligence.
     Returns page-level text suitable for chunking & citation.
     """
-
-    with open(pdf_path, "rb") as f:
-        poller = azure_client.begin_analyze_document(
-            model_id="prebuilt-read",
-            document=f
-        )
+    poller = azure_client().begin_analyze_document(
+        model_id="prebuilt-read",
+        document=document
+    )
 
     result = poller.result()
 
@@ -34,4 +62,122 @@ def ocr_pdf_with_azure(pdf_path: str) -> list[dict]:
             "text": "\n".join(lines).strip()
         }
         for page, lines in sorted(pages.items())
-    ]
\ No newline at end of file
+    ]
+
+
+def analyze_with_stub(document: bytes) -> list[dict]:
+    """
+    Offline stand-in for Azure: the PDF's own text layer (or a placeholder
+    line for image-only pages), after OCR_STUB_LATENCY_MS per page.
+    """
+    reader = PdfReader(io.BytesIO(document))
+    time.sleep(len(reader.pages) * OCR_STUB_LATENCY_MS / 1000)
+    return [
+        {
+            "page_number": i,
+            "text": (page.extract_text() or "").strip() or f"Stub OCR text for page {i}."
+        }
+        for i, page in enumerate(reader.pages, start=1)
+    ]
+
+
+OCR_BACKENDS = {
+    "azure": analyze_with_azure,
+    "stub": analyze_with_stub,
+}
+
+
+# -----------------------------------------------------------------------------
+# Splitting and parallel OCR
+# -----------------------------------------------------------------------------
+
+def _write_part(reader: PdfReader, start: int, end: int) -> bytes:
+    writer = PdfWriter()
+    for i in range(start, end):
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def iter_pdf_parts(pdf_path: str, pages_per_part: int = OCR_PAGES_PER_PART,
+                   max_part_bytes: int = OCR_MAX_PART_MB * 1024 * 1024, first_page: int = 1):
+    """
+    Split a PDF, from `first_page` on, into parts of at most `pages_per_part`
+    pages (halved further while a part is over `max_part_bytes`). Yields
+    (first page number, part bytes) in page order, writing each part only
+    when it is asked for.
+    """
+    reader = PdfReader(pdf_path)
+    ranges = [(start, min(start + pages_per_part, len(reader.pages)))
+              for start in range(first_page - 1, len(reader.pages), pages_per_part)]
+
+    while ranges:
+        start, end = ranges.pop(0)
+        data = _write_part(reader, start, end)
+        if len(data) > max_part_bytes and end - start > 1:
+            middle = (start + end) // 2
+            ranges[:0] = [(start, middle), (middle, end)]
+            continue
+        yield start + 1, data
+
+
+def iter_ocr_pages(pdf_path: str, backend: str = OCR_BACKEND, pages_per_part: int = OCR_PAGES_PER_PART,
+                   max_concurrency: int = OCR_MAX_CONCURRENCY, first_page: int = 1):
+    """
+    OCR a PDF of any size, yielding pages in page order as soon as their
+    part is analysed. At most `max_concurrency` parts are in flight (or
+    held as bytes) at once, so callers can chunk and embed the first pages
+    while later ones are still being read. `first_page` resumes part-way.
+    """
+    analyze = OCR_BACKENDS[backend]
+    started = time.perf_counter()
+
+    parts = iter_pdf_parts(pdf_path, pages_per_part, first_page=first_page)
+    head = list(itertools.islice(parts, 2))
+    if len(head) == 1 and first_page == 1:
+        # Small document: send the original file rather than a rewritten copy
+        with open(pdf_path, "rb") as f:
+            head = [(1, f.read())]
+    parts = itertools.chain(head, parts)
+
+    def run(part):
+        first_page, data = part
+        pages = [
+            {**page, "page_number": page["page_number"] + first_page - 1}
+            for page in analyze(data)
+        ]
+        return sorted(pages, key=lambda page: page["page_number"])
+
+    part_count = page_count = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        in_flight = deque()
+        for part in parts:
+            in_flight.append(pool.submit(run, part))
+            part_count += 1
+            # Parts finish out of order; pages go out in order
+            while len(in_flight) >= max(1, max_concurrency):
+                for page in in_flight.popleft().result():
+                    page_count += 1
+                    yield page
+        while in_flight:
+            for page in in_flight.popleft().result():
+                page_count += 1
+                yield page
+
+    log_event("ocr.document", metadata={
+        "backend": backend,
+        "parts": part_count,
+        "pages": page_count,
+        "seconds": round(time.perf_counter() - started, 2),
+    })
+
+
+def ocr_pdf(pdf_path: str, backend: str = OCR_BACKEND, pages_per_part: int = OCR_PAGES_PER_PART,
+            max_concurrency: int = OCR_MAX_CONCURRENCY) -> list[dict]:
+    """
+    OCR a PDF of any size: page-range parts are analysed concurrently
+    (at most `max_concurrency` at once) and their pages renumbered into
+    document page numbers.
+    """
+    return list(iter_ocr_pages(pdf_path, backend, pages_per_part, max_concurrency))
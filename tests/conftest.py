@@ -0,0 +1,10 @@
+import os
+
+# Small enough to train every index kind in a few seconds; read by
+# app.config at import, so set before any test module imports the store
+os.environ.setdefault("FAISS_IVF_NLIST", "16")
+os.environ.setdefault("FAISS_PQ_M", "8")
+
+# OpenAI clients are created at import and refuse to start without a key;
+# tests point them at benchmarks.fake_openai
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,70 @@
+"""
+The bulk pipeline's stage and writer threads, without OCR, embeddings or
+Neo4j behind them.
+
+    python -m pytest tests/test_bulk.py
+"""
+import queue
+
+import pytest
+
+from ingestion import bulk
+from ingestion.checkpoint import IngestCheckpoint
+
+
+@pytest.fixture
+def docs(tmp_path):
+    def make(n: int) -> list[dict]:
+        return [
+            {"doc_id": f"doc-{i}", "path": f"doc-{i}.pdf", "chunks": [{"chunk_id": f"doc-{i}-0"}],
+             "checkpoint": IngestCheckpoint(f"doc-{i}", root=str(tmp_path))}
+            for i in range(n)
+        ]
+    return make
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path):
+    manifest = tmp_path / "corpus.txt"
+    manifest.write_text("# scans\na.pdf\n\nsub/b.pdf\n/archive/c.pdf\n")
+    assert bulk.read_manifest(str(manifest)) == [
+        str(tmp_path / "a.pdf"), str(tmp_path / "sub" / "b.pdf"), "/archive/c.pdf"
+    ]
+
+
+def test_stage_drops_failed_documents(docs):
+    stats = bulk.Stats(6)
+    outbox = queue.Queue()
+
+    def fn(doc):
+        if doc["doc_id"] == "doc-3":
+            raise RuntimeError("unreadable page")
+
+    stage = bulk.Stage("test", fn, workers=3, outbox=outbox, stats=stats, queue_size=2)
+    stage.start()
+    for doc in docs(6):
+        stage.inbox.put(doc)
+    stage.inbox.put(bulk._END)
+    stage.join()
+
+    out = [outbox.get() for _ in range(outbox.qsize())]
+    # The last worker to stop forwards the end marker, after every document
+    assert out[-1] is bulk._END and out.count(bulk._END) == 1
+    assert sorted(doc["doc_id"] for doc in out[:-1]) == ["doc-0", "doc-1", "doc-2", "doc-4", "doc-5"]
+    assert stats.failed == 1
+
+
+def test_writer_flushes_full_batches_and_the_rest(docs, monkeypatch):
+    monkeypatch.setattr(bulk, "Neo4jClient", lambda: None)
+    batches = []
+    monkeypatch.setattr(bulk.Writer, "_write", lambda self, batch: batches.append([d["doc_id"] for d in batch]))
+
+    stats = bulk.Stats(5)
+    writer = bulk.Writer(stats, force=False, batch_docs=2, max_wait_s=60, queue_size=4)
+    writer.start()
+    for doc in docs(5):
+        writer.inbox.put(doc)
+    writer.inbox.put(bulk._END)
+    writer.join()
+
+    assert batches == [["doc-0", "doc-1"], ["doc-2", "doc-3"], ["doc-4"]]
+    assert stats.done == 5 and stats.chunks == 5
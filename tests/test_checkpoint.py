@@ -0,0 +1,67 @@
+"""
+IngestCheckpoint in a temporary checkpoint directory.
+
+    python -m pytest tests/test_checkpoint.py
+"""
+import os
+
+import numpy as np
+import pytest
+
+from ingestion.checkpoint import IngestCheckpoint
+
+
+def test_rerun_loads_completed_stages(tmp_path):
+    calls = []
+
+    def compute(value):
+        def fn():
+            calls.append(value)
+            return value
+        return fn
+
+    checkpoint = IngestCheckpoint("doc", root=str(tmp_path))
+    chunks = checkpoint.run("chunks", compute([{"chunk_id": "doc-0", "text": "chunk 0"}]))
+    vectors = checkpoint.run("embeddings", compute(np.eye(2, 4, dtype="float32")))
+
+    rerun = IngestCheckpoint("doc", root=str(tmp_path))
+    assert rerun.exists()
+    assert rerun.completed() == ["chunks", "embeddings"]
+    assert rerun.run("chunks", compute(None)) == chunks
+    assert np.array_equal(rerun.run("embeddings", compute(None)), vectors)
+    assert len(calls) == 2
+
+    rerun.clear()
+    assert not rerun.exists()
+
+
+def test_failed_stage_is_not_marked_done(tmp_path):
+    checkpoint = IngestCheckpoint("doc", root=str(tmp_path))
+    checkpoint.run("chunks", lambda: ["chunk"])
+
+    def fail():
+        raise RuntimeError("embedding API down")
+
+    with pytest.raises(RuntimeError):
+        checkpoint.run("embeddings", fail)
+    assert checkpoint.completed() == ["chunks"]
+
+
+def test_line_stage_resumes_after_torn_append(tmp_path):
+    checkpoint = IngestCheckpoint("doc", root=str(tmp_path))
+    pages = [{"page_number": i, "text": f"page {i}"} for i in range(1, 4)]
+
+    checkpoint.append("ocr", pages[:2])
+    # A crash in the middle of the next append
+    with open(checkpoint._partial_path("ocr"), "ab") as f:
+        f.write(b'{"page_number": 3, "te')
+
+    rerun = IngestCheckpoint("doc", root=str(tmp_path))
+    assert not rerun.done("ocr")
+    assert rerun.partial("ocr") == pages[:2]
+
+    rerun.append("ocr", pages[2:])
+    rerun.finish("ocr")
+    assert rerun.done("ocr")
+    assert rerun.load("ocr") == pages
+    assert not os.path.exists(rerun._partial_path("ocr"))
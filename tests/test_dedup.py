@@ -0,0 +1,116 @@
+"""
+SimHash near-duplicate filtering, within a document and against a
+MetadataStore in a temporary directory.
+
+    python -m pytest tests/test_dedup.py
+"""
+import pytest
+
+from ingestion import dedup
+from ingestion.dedup import NearDuplicateFilter, hamming, simhash, simhash_bands
+from vectorstore.metadata_store import MetadataStore
+
+BASE = 0x0123_4567_89AB_CDEF
+
+
+def _chunk(text: str, page: int) -> dict:
+    return {"document_id": "doc", "chunk_id": f"{page}-{text}", "page_number": page, "text": text}
+
+
+def _flip(fingerprint: int, *bits: int) -> int:
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+@pytest.fixture
+def fingerprints(monkeypatch):
+    # Chunk text -> fingerprint, to place chunks at exact Hamming distances
+    table = {}
+    monkeypatch.setattr(dedup, "simhash", lambda text: table[text])
+    return table
+
+
+# -----------------------------------------------------------------------------
+# Fingerprints
+# -----------------------------------------------------------------------------
+
+def test_simhash_ignores_case_and_punctuation():
+    text = "The quarterly revenue grew by twelve percent over the previous year"
+    assert simhash(text) == simhash(text.upper().replace(" ", " , "))
+    assert hamming(simhash(text), simhash("An unrelated sentence about rainfall in the northern hills")) > 3
+
+
+def test_close_fingerprints_share_a_band():
+    # Three flipped bits, one in each of three bands: the fourth still agrees
+    other = _flip(BASE, 0, 16, 32)
+    assert hamming(BASE, other) == 3
+    assert sum(a == b for a, b in zip(simhash_bands(BASE), simhash_bands(other))) == 1
+
+
+# -----------------------------------------------------------------------------
+# Document scope
+# -----------------------------------------------------------------------------
+
+def test_distance_threshold(fingerprints):
+    fingerprints.update({
+        "original": BASE,
+        "three bits": _flip(BASE, 0, 16, 32),
+        "four bits": _flip(BASE, 1, 17, 33, 49),
+    })
+    chunks = [_chunk("original", 1), _chunk("three bits", 2), _chunk("four bits", 3)]
+
+    dedup_filter = NearDuplicateFilter("doc", scope="document", max_distance=3)
+    kept = list(dedup_filter.filter(chunks))
+    assert [chunk["text"] for chunk in kept] == ["original", "four bits"]
+    assert (dedup_filter.kept, dedup_filter.suppressed) == (2, 1)
+
+    strict = NearDuplicateFilter("doc", scope="document", max_distance=2)
+    assert len(list(strict.filter(_chunk(c["text"], c["page_number"]) for c in chunks))) == 3
+
+
+def test_duplicate_pages_are_recorded_once(fingerprints):
+    fingerprints.update({"header": BASE, "body": _flip(BASE, *range(0, 64, 2))})
+    chunks = [
+        _chunk("header", 1), _chunk("body", 1),
+        _chunk("header", 1), _chunk("header", 4), _chunk("header", 2), _chunk("header", 4),
+    ]
+
+    dedup_filter = NearDuplicateFilter("doc", scope="document")
+    kept = list(dedup_filter.filter(chunks))
+    assert [chunk["text"] for chunk in kept] == ["header", "body"]
+    # The kept chunk's own page is not listed, and repeats are listed once
+    assert kept[0]["duplicate_pages"] == [4, 2]
+    assert "duplicate_pages" not in kept[1]
+    assert kept[0]["simhash"] == BASE
+    assert dedup_filter.suppressed == 4
+
+
+def test_scope_off_keeps_everything():
+    chunks = [_chunk("same", 1), _chunk("same", 2)]
+    kept = list(NearDuplicateFilter("doc", scope="off").filter(chunks))
+    assert kept == chunks
+    assert all("simhash" not in chunk for chunk in kept)
+
+
+# -----------------------------------------------------------------------------
+# Corpus scope
+# -----------------------------------------------------------------------------
+
+def test_corpus_scope_checks_other_live_documents(tmp_path):
+    meta = MetadataStore(str(tmp_path / "metadata.db"))
+    text = "Shipments are inspected at the dock before they are signed for"
+    stored = {**_chunk(text, 1), "document_id": "stored", "simhash": simhash(text)}
+    meta.write(0, [stored])
+
+    def run(doc_id: str) -> NearDuplicateFilter:
+        dedup_filter = NearDuplicateFilter(doc_id, scope="corpus", meta=meta)
+        list(dedup_filter.filter([_chunk(text, 1)]))
+        return dedup_filter
+
+    assert run("new").suppressed_corpus == 1
+    # A document is never a duplicate of its own earlier copy
+    assert run("stored").kept == 1
+
+    meta.mark_deleted([0])
+    assert run("new").kept == 1
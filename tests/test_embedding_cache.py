@@ -0,0 +1,61 @@
+"""
+EmbeddingCache against a temporary database.
+
+    python -m pytest tests/test_embedding_cache.py
+"""
+import numpy as np
+
+from ingestion import embedding_cache
+from ingestion.embedding_cache import EmbeddingCache, text_key
+
+DIM = 4
+
+
+def _vector(seed: int) -> np.ndarray:
+    return np.full(DIM, seed, dtype="float32")
+
+
+def _last_used(cache: EmbeddingCache) -> dict:
+    return dict(cache._conn().execute("SELECT sha256, last_used FROM embeddings").fetchall())
+
+
+def test_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    cache.put_many("m", {text_key("a"): _vector(1)})
+
+    found = cache.get_many("m", [text_key("a"), text_key("b")])
+    assert list(found) == [text_key("a")]
+    assert np.array_equal(found[text_key("a")], _vector(1))
+    assert cache.get_many("other-model", [text_key("a")]) == {}
+
+
+def test_hits_only_refresh_stale_last_used(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"))
+    clock = [1_000_000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+    cache.put_many("m", {"a": _vector(1)})
+
+    clock[0] += embedding_cache.LAST_USED_RESOLUTION_S / 2
+    cache.get_many("m", ["a"])
+    assert _last_used(cache) == {"a": 1_000_000}
+
+    clock[0] += embedding_cache.LAST_USED_RESOLUTION_S
+    cache.get_many("m", ["a"])
+    assert _last_used(cache) == {"a": int(clock[0])}
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    row = DIM * 4
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_bytes=4 * row)
+    clock = [1_000_000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+
+    for key in "abcd":
+        cache.put_many("m", {key: _vector(ord(key))})
+        clock[0] += embedding_cache.LAST_USED_RESOLUTION_S * 2
+    cache.get_many("m", ["a"])  # "a" is now the most recent
+
+    cache.put_many("m", {"e": _vector(5)})
+    # Down to EVICT_TO of the limit: the two oldest ("b", "c") go
+    assert set(_last_used(cache)) == {"a", "d", "e"}
+    assert cache._conn().execute("SELECT bytes FROM stats").fetchone()[0] == 3 * row
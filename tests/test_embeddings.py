@@ -0,0 +1,171 @@
+"""
+The embedding providers, and the batcher against benchmarks.fake_openai
+served in-process with spurious 429s (--fail-rate).
+
+    python -m pytest tests/test_embeddings.py
+"""
+import random
+import threading
+import time
+from functools import partial
+
+import numpy as np
+import pytest
+from openai import OpenAI
+
+from benchmarks.fake_openai import fake_embedding, make_server
+from ingestion import embeddings
+from ingestion.embeddings import (
+    AdaptiveConcurrency,
+    EmbeddingProvider,
+    HashingEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+)
+
+DIM = 8
+TEXTS = [f"chunk {i} " + "word " * (i % 7) for i in range(40)]
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = make_server(0, dim=DIM, latency_ms=5, rpm=1_000_000, tpm=1_000_000_000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # A fresh limiter per test, and enough retries to outlast --fail-rate
+    monkeypatch.setattr(embeddings, "_limiter", AdaptiveConcurrency(4))
+    monkeypatch.setattr(embeddings, "EMBEDDING_MAX_RETRIES", 50)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def provider(fake_openai):
+    provider = OpenAIEmbeddingProvider(model="fake-embedding", dim=DIM)
+    provider._client = OpenAI(
+        base_url=f"http://127.0.0.1:{fake_openai.server_address[1]}/v1", api_key="test", max_retries=0
+    )
+    return provider
+
+
+def _expected(texts: list[str]) -> np.ndarray:
+    return np.array([fake_embedding(text, DIM) for text in texts], dtype="float32")
+
+
+def test_token_batches_respect_limits():
+    texts, batches = embeddings.token_batches(TEXTS, max_tokens=60, max_items=5)
+    assert texts == TEXTS
+    assert [i for batch in batches for i in batch] == list(range(len(TEXTS)))
+    for batch in batches:
+        assert len(batch) <= 5
+        tokens = sum(len(embeddings.encoding.encode(TEXTS[i])) for i in batch)
+        assert tokens <= 60 or len(batch) == 1
+
+
+def test_vectors_keep_input_order_through_429s(fake_openai, provider, monkeypatch):
+    # Seeded so that the first requests draw some 429s
+    random.seed(1)
+    fake_openai.fail_rate = 0.2
+    monkeypatch.setattr(embeddings, "token_batches", partial(embeddings.token_batches, max_items=4))
+
+    vectors = np.array(provider.embed(TEXTS), dtype="float32")
+    assert np.allclose(vectors, _expected(TEXTS), atol=1e-6)
+    assert fake_openai.stats.get(429)
+
+
+def test_429_waits_for_retry_after_and_halves_concurrency(fake_openai, provider):
+    fake_openai.fail_rate = 1.0
+    sent = []
+
+    def request(texts):
+        sent.append(time.monotonic())
+        try:
+            return provider._request(texts)
+        finally:
+            # Only the first request is rejected
+            fake_openai.fail_rate = 0.0
+
+    vectors = embeddings._embed_batch(request, TEXTS[:3])
+    assert np.allclose(vectors, _expected(TEXTS[:3]), atol=1e-6)
+    assert len(sent) == 2
+    # The fake server asks for ~1s through retry-after-ms
+    assert sent[1] - sent[0] >= 1.0
+    assert embeddings._limiter.limit == 2
+
+
+def test_concurrency_recovers_after_successes(fake_openai, provider):
+    limiter = embeddings._limiter
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0.0)
+    assert limiter.limit == 2
+
+    # `limit` consecutive successes raise the cap by one, up to the maximum
+    for _ in range(2 + 3 + 4):
+        embeddings._embed_batch(provider._request, TEXTS[:2])
+    assert limiter.limit == limiter.max_limit == 4
+
+
+def test_limiter_caps_requests_in_flight():
+    limiter = AdaptiveConcurrency(2)
+    peak, lock = [0], threading.Lock()
+
+    def work():
+        limiter.acquire()
+        with lock:
+            peak[0] = max(peak[0], limiter.in_flight)
+        time.sleep(0.01)
+        limiter.release()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2 and limiter.in_flight == 0
+
+
+def test_hashing_provider_is_deterministic_and_lexical():
+    provider = HashingEmbeddingProvider(dim=256)
+    texts = ["invoice total due", "total due on the invoice", "river delta sediment", ""]
+    vectors = np.array(provider.embed(texts), dtype="float32")
+
+    assert np.array_equal(vectors, np.array(provider.embed(texts), dtype="float32"))
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+    assert not vectors[3].any()
+
+
+def test_openai_provider_dimensions():
+    provider = OpenAIEmbeddingProvider(model="text-embedding-3-large", dim=1024)
+    # Shortened natively by the API, cached apart from full-size vectors
+    assert provider.dimensions == 1024
+    assert provider.model == "text-embedding-3-large@1024"
+    assert OpenAIEmbeddingProvider(model="text-embedding-3-large", dim=3072).dimensions is None
+
+    with pytest.raises(ValueError):
+        OpenAIEmbeddingProvider(model="text-embedding-3-small", dim=3072)
+    with pytest.raises(TypeError):
+        EmbeddingProvider()
+
+
+def test_embed_stream_yields_in_input_order(fake_openai, provider, monkeypatch):
+    random.seed(1)
+    fake_openai.fail_rate = 0.2
+    monkeypatch.setattr(embeddings, "_provider", provider)
+    monkeypatch.setattr(embeddings, "EMBEDDING_CACHE_ENABLED", False)
+
+    produced = []
+
+    def items():
+        for i, text in enumerate(TEXTS):
+            produced.append(i)
+            yield {"id": i, "text": text}
+
+    pairs = []
+    for item, vector in embeddings.embed_stream(items(), text_of=lambda item: item["text"],
+                                                max_items=3, max_in_flight=2):
+        # Never more than max_in_flight + 1 batches read ahead of the consumer
+        assert len(produced) - len(pairs) <= 3 * 3
+        pairs.append((item["id"], vector))
+
+    assert [i for i, _ in pairs] == list(range(len(TEXTS)))
+    assert np.allclose(np.array([v for _, v in pairs]), _expected(TEXTS), atol=1e-6)
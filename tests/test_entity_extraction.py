@@ -0,0 +1,79 @@
+"""
+LLM entity extraction against benchmarks.fake_openai, served in-process.
+
+    python -m pytest tests/test_entity_extraction.py
+"""
+import random
+import threading
+import types
+
+import pytest
+from openai import OpenAI
+
+from benchmarks.fake_openai import fake_entities, make_server
+from graph import graph_builder
+
+CHUNKS = [
+    ("Siemens opened a plant near Geneva", "fr"),
+    ("تقرير أرامكو السنوي عن المملكة", "ar"),
+    ("Airbus and Nairobi officials met", "fr"),
+    ("توصيات اللجنة في الرياض", "ar"),
+    ("Rapport annuel de Siemens", "fr"),
+    ("نتائج المراجعة السنوية", "ar"),
+]
+
+
+def _expected(text: str, lang: str) -> list[dict]:
+    return graph_builder._normalize_llm_entities(fake_entities(text), lang)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = make_server(0, latency_ms=0, rpm=1_000_000, tpm=1_000_000_000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="test", max_retries=0)
+    monkeypatch.setattr(graph_builder, "client", client)
+
+    # Record the backoff instead of sleeping through it
+    delays = []
+    monkeypatch.setattr(graph_builder, "time", types.SimpleNamespace(sleep=delays.append))
+    server.delays = delays
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_dropped_chunks_are_asked_again_with_backoff(fake_openai, monkeypatch):
+    random.seed(0)
+    fake_openai.drop_rate = 0.5
+    monkeypatch.setattr(graph_builder, "ENTITY_LLM_MAX_RETRIES", 20)
+
+    found = graph_builder._extract_group(CHUNKS)
+    assert found == {i: _expected(*chunk) for i, chunk in enumerate(CHUNKS)}
+    assert fake_openai.delays
+    assert fake_openai.delays == [graph_builder.RETRY_BACKOFF_S * 2 ** i for i in range(len(fake_openai.delays))]
+
+
+def test_json_that_is_not_an_object_is_retried(fake_openai, monkeypatch):
+    create = graph_builder.client.chat.completions.create
+    calls = []
+
+    def list_first(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            message = types.SimpleNamespace(content='["Siemens", "Geneva"]')
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+        return create(**kwargs)
+
+    monkeypatch.setattr(graph_builder.client.chat.completions, "create", list_first)
+
+    found = graph_builder._extract_group(CHUNKS[:2])
+    assert found == {0: _expected(*CHUNKS[0]), 1: _expected(*CHUNKS[1])}
+    assert len(calls) == 2
+    assert fake_openai.delays == [graph_builder.RETRY_BACKOFF_S]
+
+
+def test_batches_keep_input_order(fake_openai):
+    items = CHUNKS * 3
+    results = graph_builder.extract_entities_llm_batch(items, batch_chunks=2, max_concurrency=3, use_cache=False)
+    assert results == [_expected(*chunk) for chunk in items]
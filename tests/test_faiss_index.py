@@ -0,0 +1,70 @@
+"""
+Load-and-search smoke test for every index type and encoding, read normally
+and memory-mapped.
+
+    python -m pytest tests/test_faiss_index.py
+"""
+import faiss
+import numpy as np
+import pytest
+
+from vectorstore.faiss_store import (
+    INDEX_TYPES,
+    ENCODINGS,
+    build_index,
+    index_config,
+    min_train_size,
+    normalize_config,
+    read_index_mmap,
+    rerank_exact,
+    search_parameters,
+)
+
+DIM = 32
+K = 5
+
+
+def _vectors(n: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+@pytest.mark.parametrize("encoding", sorted(ENCODINGS))
+@pytest.mark.parametrize("index_type", sorted(INDEX_TYPES))
+def test_load_and_search(tmp_path, index_type, encoding, mmap):
+    index_type, encoding = normalize_config(index_type, encoding)
+    vectors = _vectors(max(min_train_size(index_type, encoding), 1000), seed=0)
+
+    inner = build_index(DIM, index_type, encoding)
+    if not inner.is_trained:
+        inner.train(vectors)
+    index = faiss.IndexIDMap2(inner)
+    ids = np.arange(len(vectors), dtype="int64") + 100
+    index.add_with_ids(vectors, ids)
+
+    path = str(tmp_path / "segment.index")
+    faiss.write_index(index, path)
+    loaded = read_index_mmap(path) if mmap else faiss.read_index(path)
+
+    assert loaded.ntotal == len(vectors)
+    assert index_config(loaded) == (index_type, encoding)
+
+    # Stored vectors as queries: each should find itself among its top k
+    queries = vectors[:10]
+    _, found = loaded.search(queries, K, params=search_parameters(loaded, nprobe=16, ef_search=64))
+    assert (found == ids[:10, None]).any(axis=1).mean() >= 0.8
+    assert set(found.ravel()) <= set(ids)
+
+
+def test_rerank_exact_orders_candidates_by_full_vectors():
+    vectors = _vectors(100, seed=1)
+    # Coarse candidates in no particular order, padded with -1 by FAISS
+    candidates = np.array([50, 7, -1, 3, 90], dtype="int64")
+    distances, ids = rerank_exact(vectors[7], candidates, vectors, k=2)
+
+    assert ids[0] == 7 and distances[0] == pytest.approx(0.0, abs=1e-6)
+    assert len(ids) == 2 and distances[0] <= distances[1]
+    exact = np.linalg.norm(vectors[[3, 50, 90]] - vectors[7], axis=1) ** 2
+    assert distances[1] == pytest.approx(exact.min(), rel=1e-5)
@@ -0,0 +1,174 @@
+"""
+FaissStore search over a small store built in a temporary data directory.
+
+    python -m pytest tests/test_faiss_store.py
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+import pytest
+
+from vectorstore import faiss_store
+from vectorstore.faiss_store import FaissStore, min_train_size, truncate_vectors
+
+DIM = 32
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(faiss_store, "start_background_compaction", lambda: None)
+    # Send every filter through the segment indexes, not the exact scan
+    monkeypatch.setattr(faiss_store, "FAISS_FILTER_EXACT_MAX", 0)
+
+    def build(index_type: str, encoding: str) -> FaissStore:
+        n = max(min_train_size(index_type, encoding), 1000)
+        vectors = np.random.default_rng(0).standard_normal((n, DIM)).astype("float32")
+        faiss.normalize_L2(vectors)
+        meta = [
+            {"document_id": f"doc-{i % 4}", "chunk_id": f"doc-{i % 4}-{i}", "page_number": 1,
+             "language": "en", "text": f"chunk {i}"}
+            for i in range(n)
+        ]
+        s = FaissStore(dim=DIM, index_type=index_type, encoding=encoding)
+        s.add(vectors, meta)
+        s.save()
+        s.compact()
+        s.load()
+        return s, vectors
+
+    return build
+
+
+def test_truncate_vectors_leaves_input_untouched():
+    for rows in (1, 4):
+        vectors = np.random.default_rng(0).standard_normal((rows, 16)).astype("float32")
+        original = vectors.copy()
+        prefix = truncate_vectors(vectors, 8)
+        assert np.array_equal(vectors, original)
+        assert np.allclose(np.linalg.norm(prefix, axis=1), 1.0)
+
+
+@pytest.mark.parametrize("index_type,encoding", [("flat", "pq"), ("flat", "float32"), ("hnsw", "int8")])
+def test_filtered_search(store, index_type, encoding):
+    s, vectors = store(index_type, encoding)
+    assert faiss_store.index_config(s.segments[0].index) == (index_type, encoding)
+
+    hits = s.search(vectors[1], k=5, document_id="doc-1")
+    assert len(hits) == 5
+    assert {h["document_id"] for h in hits} == {"doc-1"}
+    assert hits[0]["chunk_id"] == "doc-1-1"
+
+
+@pytest.mark.parametrize("index_type,encoding", [("flat", "pq"), ("flat", "float32"), ("ivf_flat", "float32")])
+def test_search_skips_removed_document(store, index_type, encoding):
+    s, vectors = store(index_type, encoding)
+    assert s.remove_document("doc-1") > 0
+
+    hits = s.search(vectors[1], k=5)
+    assert len(hits) == 5
+    assert "doc-1" not in {h["document_id"] for h in hits}
+    # Unfiltered searches exclude tombstones with a cached selector
+    if index_type != "flat" or encoding != "pq":
+        assert isinstance(s._selectors[(None, None)], faiss.IDSelectorNot)
+
+
+def test_filter_cache_under_concurrent_searches(store, monkeypatch):
+    s, vectors = store("hnsw", "int8")
+    # Four documents through a two-entry cache: every search may evict
+    monkeypatch.setattr(faiss_store, "FILTER_CACHE_SIZE", 2)
+
+    def search(n: int):
+        doc = n % 4
+        hits = s.search(vectors[doc], k=3, document_id=f"doc-{doc}")
+        return {h["document_id"] for h in hits}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        found = list(pool.map(search, range(400)))
+    assert found == [{f"doc-{n % 4}"} for n in range(400)]
+    assert len(s._filter_ids) <= 2
+
+
+def test_reader_keeps_its_snapshot(store):
+    s, vectors = store("flat", "float32")
+    version = s.version
+
+    writer = FaissStore(dim=DIM)
+    writer.load()
+    writer.remove_document("doc-1")
+    assert writer.version > version
+
+    # Tombstones and marked rows are not visible to the earlier snapshot
+    hits = s.search(vectors[1], k=5)
+    assert hits[0]["chunk_id"] == "doc-1-1"
+
+    s.load()
+    assert s.version == writer.version
+    assert "doc-1" not in {h["document_id"] for h in s.search(vectors[1], k=5)}
+
+
+def test_search_many_matches_search(store):
+    s, vectors = store("hnsw", "int8")
+    queries = vectors[:3]
+
+    batched = s.search_many(queries, k=5)
+    assert [[h["chunk_id"] for h in hits] for hits in batched] == [
+        [h["chunk_id"] for h in s.search(query, k=5)] for query in queries
+    ]
+    # Re-scored against the full vectors: each query finds itself exactly
+    assert [hits[0]["score"] for hits in batched] == pytest.approx([1.0] * 3, abs=1e-5)
+    assert s.search_many([], k=5) == []
+
+
+def test_compaction_reuses_trained_index(store):
+    s, vectors = store("ivf_flat", "float32")
+    trained = s._manifest["trained"]
+    assert trained is not None
+
+    s.add(vectors[:10], [{"document_id": "more", "chunk_id": f"more-{i}", "text": ""} for i in range(10)])
+    s.save()
+    s.compact()
+    s.load()
+    assert s._manifest["trained"] == trained
+
+    s.migrate("ivf_flat", "fp16")
+    assert s._manifest["trained"] != trained
+
+
+def test_background_compaction_merges_small_segments(store):
+    s, vectors = store("ivf_flat", "float32")
+    base = s._manifest["segments"][0]
+    trained = s._manifest["trained"]
+
+    for n in range(faiss_store.FAISS_MAX_SEGMENTS):
+        s.add(vectors[:5], [{"document_id": f"small-{n}", "chunk_id": f"small-{n}-{i}", "text": ""} for i in range(5)])
+        s.save()
+    s.remove_document("small-0")
+    s.load()
+    assert s.needs_compaction(s._manifest)
+
+    s.compact(full=False)
+    s.load()
+    manifest = s._manifest
+    # The big trained segment is left alone; the small ones were merged
+    assert manifest["segments"][0] == base and manifest["trained"] == trained
+    assert len(manifest["segments"]) == faiss_store.FAISS_MAX_SEGMENTS // 2
+    assert manifest["deleted"] == []
+    assert not s.needs_compaction(manifest)
+
+    hits = s.search(vectors[2], k=20)
+    assert {h["document_id"] for h in hits if h["chunk_id"].endswith("-2")} >= {"doc-2", "small-1", "small-7"}
+    assert "small-0" not in {h["document_id"] for h in hits}
+
+
+def test_untrainable_store_does_not_keep_compacting(store):
+    s, _ = store("flat", "float32")
+    s.index_type, s.encoding = "ivf_flat", "float32"
+    needed = min_train_size("ivf_flat", "float32")
+    manifest = {"next_id": needed, "trained": None, "segments": [{}], "deleted": [0]}
+    # Not enough live vectors: compacting would build the same flat index again
+    assert not s.needs_compaction(manifest)
+    manifest["deleted"] = []
+    assert s.needs_compaction(manifest)
@@ -0,0 +1,194 @@
+"""
+JobQueue, run_job, WorkerPool and spool_upload against a temporary jobs
+database and upload directory.
+
+    python -m pytest tests/test_jobs.py
+"""
+import os
+import sys
+import time
+import types
+import asyncio
+import hashlib
+
+import pytest
+
+from ingestion import jobs
+from ingestion.jobs import JobQueue, UploadTooLarge, WorkerPool, run_job, spool_upload
+from vectorstore.locking import try_lock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def _upload(tmp_path, name="a.pdf") -> str:
+    path = tmp_path / name
+    path.write_bytes(b"%PDF")
+    return str(path)
+
+
+def _exit_now(stop_event):
+    pass
+
+
+class FakeUpload:
+    def __init__(self, data: bytes, chunk: int = 3):
+        self._data = data
+        self._chunk = chunk
+
+    async def read(self, size: int) -> bytes:
+        block, self._data = self._data[:min(size, self._chunk)], self._data[min(size, self._chunk):]
+        return block
+
+
+# -----------------------------------------------------------------------------
+# Queue
+# -----------------------------------------------------------------------------
+
+def test_claim_takes_oldest_and_counts_attempts(queue, tmp_path):
+    first, _ = queue.enqueue(_upload(tmp_path, "a.pdf"), document_id="a")
+    second, _ = queue.enqueue(_upload(tmp_path, "b.pdf"), document_id="b")
+
+    job = queue.claim("w1")
+    assert job["id"] == first
+    assert job["status"] == "running" and job["worker"] == "w1" and job["attempts"] == 1
+    assert queue.claim("w2")["id"] == second
+    assert queue.claim("w3") is None
+
+
+def test_enqueue_returns_in_flight_job(queue, tmp_path):
+    job_id, created = queue.enqueue(_upload(tmp_path), document_id="a")
+    assert created
+    assert queue.enqueue(_upload(tmp_path), document_id="a") == (job_id, False)
+
+    queue.claim("w1")
+    assert queue.enqueue(_upload(tmp_path), document_id="a") == (job_id, False)
+
+    queue.finish(job_id, {"document_id": "a"})
+    again, created = queue.enqueue(_upload(tmp_path), document_id="a")
+    assert created and again != job_id
+
+
+def test_retry_waits_before_next_claim(queue, tmp_path):
+    job_id, _ = queue.enqueue(_upload(tmp_path), document_id="a")
+    queue.claim("w1")
+
+    queue.fail(job_id, "boom", retry=True, delay=60)
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue.claim("w1") is None
+
+    queue.fail(job_id, "boom", retry=True, delay=0)
+    assert queue.claim("w1")["attempts"] == 2
+
+
+def test_retry_delay_doubles(monkeypatch):
+    monkeypatch.setattr(jobs, "INGEST_JOB_RETRY_DELAY_S", 10.0)
+    assert [jobs.retry_delay(n) for n in (1, 2, 3)] == [10.0, 20.0, 40.0]
+
+
+def test_requeue_stale_fails_exhausted_jobs(queue, tmp_path):
+    pdf_path = _upload(tmp_path)
+    job_id, _ = queue.enqueue(pdf_path, document_id="a")
+
+    queue.claim("w1")
+    assert queue.requeue_stale(stale_after=-1, max_attempts=2) == 1
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["worker"] is None
+    # Requeued behind the retry delay, like a failed attempt
+    assert job["not_before"] > time.time()
+
+    queue.fail(job_id, "not yet", retry=True, delay=0)
+    queue.claim("w2")
+    assert queue.requeue_stale(stale_after=-1, max_attempts=2) == 0
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["finished_at"]
+    assert not os.path.exists(pdf_path)
+
+
+def test_requeue_stale_keeps_live_jobs(queue, tmp_path):
+    job_id, _ = queue.enqueue(_upload(tmp_path), document_id="a")
+    queue.claim("w1")
+    assert queue.requeue_stale(stale_after=60) == 0
+    assert queue.get(job_id)["status"] == "running"
+
+
+def test_run_job_retries_then_fails(queue, tmp_path, monkeypatch):
+    def ingest(pdf_path, **kwargs):
+        raise RuntimeError("OCR backend down")
+
+    monkeypatch.setitem(sys.modules, "ingestion.ingest", types.SimpleNamespace(ingest=ingest))
+    monkeypatch.setattr(jobs, "INGEST_JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(jobs, "INGEST_JOB_RETRY_DELAY_S", 0.0)
+    pdf_path = _upload(tmp_path)
+    job_id, _ = queue.enqueue(pdf_path, document_id="a")
+
+    run_job(queue, queue.claim("w1"))
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["error"] == "RuntimeError: OCR backend down"
+    assert os.path.exists(pdf_path)
+
+    run_job(queue, queue.claim("w1"))
+    assert queue.get(job_id)["status"] == "failed"
+    assert not os.path.exists(pdf_path)
+
+
+# -----------------------------------------------------------------------------
+# Workers
+# -----------------------------------------------------------------------------
+
+def test_pool_respawns_dead_workers():
+    pool = WorkerPool(2, target=_exit_now)
+    pool.start()
+    try:
+        for process in pool._processes:
+            process.join(30)
+        assert pool.respawn_dead() == 2
+        assert all(process.pid for process in pool._processes)
+    finally:
+        pool.stop()
+    assert pool.respawn_dead() == 0
+
+
+def test_pool_lock_is_held_by_one_process(tmp_path):
+    path = str(tmp_path / "ingest-workers.lock")
+    held = try_lock(path)
+    assert held is not None
+    assert try_lock(path) is None
+    held.close()
+    assert try_lock(path) is not None
+
+
+# -----------------------------------------------------------------------------
+# Uploads
+# -----------------------------------------------------------------------------
+
+def test_spool_upload_hashes_in_one_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "INGEST_UPLOAD_DIR", str(tmp_path / "uploads"))
+    data = b"%PDF-1.7 some bytes"
+
+    path, doc_id = asyncio.run(spool_upload(FakeUpload(data), max_bytes=len(data)))
+    assert doc_id == hashlib.sha256(data).hexdigest()
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+
+def test_spool_upload_rejects_past_limit(tmp_path, monkeypatch):
+    upload_dir = tmp_path / "uploads"
+    monkeypatch.setattr(jobs, "INGEST_UPLOAD_DIR", str(upload_dir))
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_upload(FakeUpload(b"x" * 10), max_bytes=9))
+    assert os.listdir(upload_dir) == []
+
+
+def test_spool_upload_open_failure_propagates(tmp_path, monkeypatch):
+    # The upload dir is missing: open() itself fails and there is nothing to remove
+    monkeypatch.setattr(jobs, "INGEST_UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(jobs.os, "makedirs", lambda *args, **kwargs: None)
+
+    with pytest.raises(FileNotFoundError) as excinfo:
+        asyncio.run(spool_upload(FakeUpload(b"x"), max_bytes=9))
+    # open()'s error, not a second one from cleaning up a file that never existed
+    assert excinfo.value.__context__ is None
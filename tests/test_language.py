@@ -0,0 +1,62 @@
+"""
+Language identification: the Unicode-script fast path and when it defers
+to langdetect.
+
+    python -m pytest tests/test_language.py
+"""
+import pytest
+
+from app import language
+from app.language import detect_language, detect_languages
+
+ENGLISH = "What is the refund policy for orders that arrive damaged?"
+ARABIC = "ما هي سياسة استرداد الأموال للطلبات التي تصل تالفة؟"
+URDU = "خراب پہنچنے والے آرڈرز کے لیے رقم کی واپسی کی پالیسی کیا ہے؟"
+FRENCH = "Quelle est la politique de remboursement pour les commandes abîmées ?"
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    # Records what reaches langdetect; every test starts with an empty cache
+    calls = []
+
+    def model_language(text):
+        calls.append(text)
+        return "model"
+
+    monkeypatch.setattr(language, "_model_language", model_language)
+    detect_language.cache_clear()
+    yield calls
+    detect_language.cache_clear()
+
+
+@pytest.mark.parametrize("text, expected", [(ENGLISH, "en"), (ARABIC, "ar")])
+def test_script_decides_without_the_model(model_calls, text, expected):
+    assert detect_language(text) == expected
+    assert model_calls == []
+
+
+@pytest.mark.parametrize("text", [
+    URDU,                                   # Arabic script, Urdu letters
+    FRENCH,                                 # Latin, but not English
+    "Refund?",                              # too few letters to judge
+    "Refund policy: " + ARABIC,             # neither script dominates
+])
+def test_ambiguous_text_goes_to_the_model(model_calls, text):
+    assert detect_language(text) == "model"
+    assert model_calls == [text]
+
+
+def test_batch_detects_each_distinct_text_once(model_calls):
+    texts = [FRENCH, ENGLISH, FRENCH, URDU, FRENCH]
+    assert detect_languages(texts) == ["model", "en", "model", "model", "model"]
+    assert model_calls == [FRENCH, URDU]
+
+    detect_languages(texts)
+    assert model_calls == [FRENCH, URDU]
+
+
+def test_model_agrees_with_fast_path():
+    assert language._model_language(ENGLISH) == "en"
+    assert language._model_language(ARABIC) == "ar"
+    assert language._model_language(FRENCH) == "fr"
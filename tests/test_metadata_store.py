@@ -0,0 +1,69 @@
+"""
+MetadataStore against a SQLite file in a temporary directory.
+
+    python -m pytest tests/test_metadata_store.py
+"""
+import pickle
+import sqlite3
+
+from vectorstore.metadata_store import MetadataStore
+
+
+def _chunks(doc_id: str, n: int) -> list[dict]:
+    return [{"document_id": doc_id, "chunk_id": f"{doc_id}-{i}", "text": f"chunk {i}"} for i in range(n)]
+
+
+def test_document_exists_only_below_published_ids(tmp_path):
+    meta = MetadataStore(str(tmp_path / "metadata.db"))
+    meta.write(0, _chunks("published", 3))
+    # A writer that crashed before publishing its segment
+    meta.write(3, _chunks("unpublished", 2))
+
+    assert meta.document_exists("published", below=3)
+    assert not meta.document_exists("unpublished", below=3)
+    assert meta.document_exists("unpublished")
+
+
+def test_legacy_pickle_needs_legacy_index(tmp_path, monkeypatch):
+    # Legacy paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    with open("data/metadata.pkl", "wb") as f:
+        pickle.dump(_chunks("legacy", 2), f)
+
+    assert MetadataStore("data/without-index.db").max_id() == -1
+
+    open("data/faiss.index", "wb").close()
+    assert MetadataStore("data/with-index.db").max_id() == 1
+
+
+def test_marked_rows_resolve_until_purged(tmp_path):
+    meta = MetadataStore(str(tmp_path / "metadata.db"))
+    meta.write(0, _chunks("doc", 3))
+    meta.mark_deleted([0, 1, 2])
+
+    # Readers of the snapshot before the delete still resolve the rows
+    assert [row["chunk_id"] for row in meta.get([2, 0])] == ["doc-2", "doc-0"]
+    # Writers no longer see the document
+    assert meta.ids_for_documents(["doc"]) == []
+    assert not meta.document_exists("doc")
+
+    meta.purge([0, 1, 2])
+    assert meta.get([0, 1, 2]) == []
+
+
+def test_existing_database_gains_deleted_column(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    # A database written before rows could be marked deleted
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE chunks (id INTEGER PRIMARY KEY, document_id TEXT NOT NULL, chunk_id TEXT NOT NULL,"
+            " page_number INTEGER, language TEXT, text TEXT, extra TEXT)"
+        )
+        conn.execute("INSERT INTO chunks (id, document_id, chunk_id, text) VALUES (0, 'old', 'old-0', 'chunk 0')")
+    conn.close()
+
+    meta = MetadataStore(path)
+    assert meta.ids_for_documents(["old"]) == [0]
+    meta.mark_deleted([0])
+    assert not meta.document_exists("old")
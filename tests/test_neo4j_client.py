@@ -0,0 +1,44 @@
+"""
+The process-wide Neo4j drivers and session counters. Drivers connect
+lazily, so no server is needed.
+
+    python -m pytest tests/test_neo4j_client.py
+"""
+import pytest
+
+from graph import neo4j_client
+from graph.neo4j_client import Neo4jClient, SessionStats, close_driver, get_driver, pool_metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_drivers(monkeypatch):
+    monkeypatch.setattr(neo4j_client, "_driver", None)
+    monkeypatch.setattr(neo4j_client, "_async_driver", None)
+    yield
+    close_driver()
+
+
+def test_clients_share_one_driver():
+    assert not pool_metrics()["sync"]["driver"]
+    first, second = Neo4jClient(), Neo4jClient()
+    assert first.driver is second.driver is get_driver()
+    assert pool_metrics()["sync"]["driver"]
+
+    close_driver()
+    assert get_driver() is not first.driver
+
+
+def test_session_stats_track_peak_and_errors():
+    stats = SessionStats()
+    with stats.track():
+        with stats.track():
+            assert stats.active == 2
+    with pytest.raises(ValueError):
+        with stats.track():
+            raise ValueError("query failed")
+
+    snapshot = stats.snapshot()
+    assert snapshot["sessions_opened"] == 3
+    assert snapshot["sessions_active"] == 0
+    assert snapshot["sessions_peak"] == 2
+    assert snapshot["session_errors"] == 1
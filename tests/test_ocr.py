@@ -0,0 +1,94 @@
+"""
+Page-range splitting and parallel OCR against the stub backend, on PDFs
+whose pages carry their own page number as text.
+
+    python -m pytest tests/test_ocr.py
+"""
+import io
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from ingestion.ocr import iter_ocr_pages, iter_pdf_parts, ocr_pdf
+
+PAGES = 10
+
+
+def _numbered_pdf(path, pages: int = PAGES) -> str:
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for number in range(1, pages + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td (Page {number}) Tj ET".encode())
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return _numbered_pdf(tmp_path / "numbered.pdf")
+
+
+def _page_texts(data: bytes) -> list[str]:
+    return [page.extract_text().strip() for page in PdfReader(io.BytesIO(data)).pages]
+
+
+# -----------------------------------------------------------------------------
+# Splitting
+# -----------------------------------------------------------------------------
+
+def test_parts_cover_every_page_in_order(pdf_path):
+    parts = list(iter_pdf_parts(pdf_path, pages_per_part=4))
+    assert [first for first, _ in parts] == [1, 5, 9]
+    texts = [text for _, data in parts for text in _page_texts(data)]
+    assert texts == [f"Page {n}" for n in range(1, PAGES + 1)]
+
+
+def test_oversized_parts_are_halved(pdf_path):
+    # A limit just under a 4-page part's size forces every part to split
+    limit = len(next(iter_pdf_parts(pdf_path, pages_per_part=4))[1]) - 1
+    parts = list(iter_pdf_parts(pdf_path, pages_per_part=4, max_part_bytes=limit))
+
+    assert [first for first, _ in parts] == [1, 3, 5, 7, 9]
+    assert all(len(data) <= limit for _, data in parts)
+    texts = [text for _, data in parts for text in _page_texts(data)]
+    assert texts == [f"Page {n}" for n in range(1, PAGES + 1)]
+
+
+def test_single_page_over_limit_is_still_sent(pdf_path):
+    parts = list(iter_pdf_parts(pdf_path, pages_per_part=4, max_part_bytes=1))
+    assert [first for first, _ in parts] == list(range(1, PAGES + 1))
+
+
+def test_parts_start_at_first_page(pdf_path):
+    parts = list(iter_pdf_parts(pdf_path, pages_per_part=4, first_page=7))
+    assert [first for first, _ in parts] == [7]
+    assert _page_texts(parts[0][1]) == ["Page 7", "Page 8", "Page 9", "Page 10"]
+
+
+# -----------------------------------------------------------------------------
+# OCR
+# -----------------------------------------------------------------------------
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_pages_renumbered_into_document_order(pdf_path, max_concurrency):
+    pages = ocr_pdf(pdf_path, backend="stub", pages_per_part=3, max_concurrency=max_concurrency)
+    assert [page["page_number"] for page in pages] == list(range(1, PAGES + 1))
+    assert all(page["text"] == f"Page {page['page_number']}" for page in pages)
+
+
+def test_resume_numbers_from_first_page(pdf_path):
+    pages = list(iter_ocr_pages(pdf_path, backend="stub", pages_per_part=3, first_page=5))
+    assert [page["page_number"] for page in pages] == list(range(5, PAGES + 1))
+    assert all(page["text"] == f"Page {page['page_number']}" for page in pages)
@@ -0,0 +1,60 @@
+"""
+get_store(): one FaissStore per process, swapped for a fresh copy once a
+save() publishes new index files.
+
+    python -m pytest tests/test_shared_store.py
+"""
+import numpy as np
+import pytest
+
+from vectorstore import faiss_store
+from vectorstore.faiss_store import FaissStore, get_store
+
+DIM = 3072
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    # Data paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(faiss_store, "_shared_store", None)
+    monkeypatch.setattr(faiss_store, "_shared_signature", None)
+
+
+def _add(store: FaissStore, ids: range):
+    vectors = np.eye(DIM, dtype="float32")[list(ids)]
+    store.add(vectors, [
+        {"document_id": "doc", "chunk_id": f"doc-{i}", "page_number": 1, "language": "en", "text": f"chunk {i}"}
+        for i in ids
+    ])
+    store.save()
+
+
+def test_store_is_shared_until_files_change():
+    query = np.eye(DIM, dtype="float32")[0]
+    empty = get_store()
+    assert empty.search(query) == []
+    assert get_store() is empty
+
+    writer = FaissStore()
+    _add(writer, range(2))
+    store = get_store()
+    assert store is not empty and get_store() is store
+    assert [h["chunk_id"] for h in store.search(query, k=5)] == ["doc-0", "doc-1"]
+
+    _add(writer, range(2, 3))
+    reloaded = get_store()
+    assert reloaded is not store
+    assert [h["chunk_id"] for h in reloaded.search(query, k=5)] == ["doc-0", "doc-1", "doc-2"]
+    # Readers holding the previous copy keep their snapshot
+    assert len(store.search(query, k=5)) == 2
+
+
+def test_failed_reload_keeps_serving_previous_store(monkeypatch):
+    writer = FaissStore()
+    _add(writer, range(2))
+    store = get_store()
+
+    _add(writer, range(2, 3))
+    monkeypatch.setattr(FaissStore, "load", lambda *args, **kwargs: 1 / 0)
+    assert get_store() is store
@@ -0,0 +1,94 @@
+"""
+spaCy entity extraction on a small rule-based pipeline saved to a temporary
+directory (no trained model needed).
+
+    python -m pytest tests/test_spacy_ner.py
+"""
+import pytest
+import spacy
+
+from graph import graph_builder
+
+TEXTS = [
+    "Siemens Mobility builds trains in Vienna.",
+    "Nothing to see here.",
+    "Airbus Defence signed with Siemens Mobility.",
+    "Vienna hosted the meeting.",
+]
+
+
+@pytest.fixture
+def use_model(monkeypatch):
+    def use(path: str):
+        monkeypatch.setattr(graph_builder, "SPACY_MODEL", path)
+        monkeypatch.setattr(graph_builder, "_nlp", None)
+        return graph_builder.get_nlp()
+    return use
+
+
+@pytest.fixture
+def ruler_model(tmp_path) -> str:
+    nlp = spacy.blank("en")
+    nlp.add_pipe("tok2vec")
+    ruler = nlp.add_pipe("entity_ruler")
+    nlp.initialize()
+    # After initialize(), which resets the ruler's patterns
+    ruler.add_patterns([
+        {"label": "ORG", "pattern": [{"LOWER": "siemens"}, {"LOWER": "mobility"}]},
+        {"label": "ORG", "pattern": [{"LOWER": "airbus"}, {"LOWER": "defence"}]},
+        {"label": "GPE", "pattern": [{"LOWER": "vienna"}]},
+    ])
+    nlp.to_disk(tmp_path / "ruler")
+    return str(tmp_path / "ruler")
+
+
+def test_tok2vec_disabled_when_ner_does_not_use_it(use_model, ruler_model):
+    nlp = use_model(ruler_model)
+    assert "tok2vec" not in nlp.pipe_names
+
+    found = graph_builder.extract_entities(TEXTS[2])
+    assert [(e["name"], e["source_label"]) for e in found] == [("Airbus Defence", "ORG"), ("Siemens Mobility", "ORG")]
+
+
+def test_tok2vec_kept_when_ner_listens(use_model, tmp_path):
+    nlp = spacy.blank("en")
+    nlp.add_pipe("tok2vec")
+    nlp.add_pipe("ner", config={"model": {
+        "@architectures": "spacy.TransitionBasedParser.v2", "state_type": "ner", "extra_state_tokens": False,
+        "hidden_width": 16, "maxout_pieces": 2, "use_upper": True, "nO": None,
+        "tok2vec": {"@architectures": "spacy.Tok2VecListener.v1", "width": 96, "upstream": "*"},
+    }}).add_label("ORG")
+    nlp.initialize()
+    nlp.to_disk(tmp_path / "listener")
+
+    nlp = use_model(str(tmp_path / "listener"))
+    assert nlp.pipe_names == ["tok2vec", "ner"]
+
+
+def test_worker_processes_match_single_process(use_model, ruler_model):
+    use_model(ruler_model)
+    single = graph_builder.extract_entities_spacy_batch(TEXTS, batch_size=2, n_process=1)
+    assert graph_builder.extract_entities_spacy_batch(TEXTS, batch_size=2, n_process=2) == single
+    assert [len(found) for found in single] == [2, 0, 2, 1]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_batch_forks_spacy_before_llm_threads(monkeypatch, processes):
+    events = []
+
+    def spacy_batch(texts):
+        events.append("spacy")
+        return [[{"name": text}] for text in texts]
+
+    def llm_batch(items):
+        events.append("llm")
+        return [[{"name": text}] for text, _ in items]
+
+    monkeypatch.setattr(graph_builder, "_spacy_processes", lambda n: processes)
+    monkeypatch.setattr(graph_builder, "extract_entities_spacy_batch", spacy_batch)
+    monkeypatch.setattr(graph_builder, "extract_entities_llm_batch", llm_batch)
+
+    items = [("a", "en"), ("b", "ar"), ("c", "en"), ("d", "fr")]
+    assert graph_builder.extract_entities_batch(items) == [[{"name": t}] for t, _ in items]
+    if processes > 1:
+        assert events == ["spacy", "llm"]
@@ -1,32 +1,1157 @@
 import os
+import json
+import uuid
 import faiss
-import pickle
+import threading
 import numpy as np
-from app.config import FAISS_INDEX_PATH, METADATA_PATH
+from app.config import (
+    FAISS_INDEX_PATH,
+    FAISS_SEGMENTS_DIR,
+    FAISS_MANIFEST_PATH,
+    FAISS_MAX_SEGMENTS,
+    FAISS_VECTORS_PATH,
+    FAISS_INDEX_TYPE,
+    FAISS_VECTOR_ENCODING,
+    FAISS_RERANK_FACTOR,
+    FAISS_COARSE_DIM,
+    FAISS_COARSE_CANDIDATES,
+    FAISS_IVF_NLIST,
+    FAISS_IVF_NPROBE,
+    FAISS_PQ_M,
+    FAISS_HNSW_M,
+    FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_HNSW_EF_SEARCH,
+    FAISS_MMAP,
+    FAISS_FILTER_EXACT_MAX,
+    EMBEDDING_DIM,
+)
+from vectorstore.metadata_store import MetadataStore
+from vectorstore.locking import file_lock
+from observability.logging import log_event, log_error
+
+INDEX_TYPES = {"flat", "ivf_flat", "ivf_pq", "hnsw"}
+ENCODINGS = {"float32", "fp16", "int8", "pq"}
+
+SQ_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# k-means wants ~39 points per centroid; more than 256 per centroid is wasted
+IVF_MIN_TRAIN_PER_LIST = 39
+IVF_MAX_TRAIN_PER_LIST = 256
+# PQ trains 256 centroids per sub-quantizer; int8 only learns per-dimension ranges
+PQ_MIN_TRAIN = 256 * IVF_MIN_TRAIN_PER_LIST
+SQ_MIN_TRAIN = 1024
+
+# Rows streamed from the full-vector file per add() during compaction
+COMPACTION_BLOCK = 65536
+# Deleted-but-not-compacted ids tolerated before compaction drops them
+MAX_TOMBSTONE_RATIO = 0.05
+MIN_TOMBSTONES_FOR_COMPACTION = 1000
+
+# Inverted lists (IVF) are mapped with IO_FLAG_MMAP, flat code arrays (flat /
+# HNSW storage) with IO_FLAG_MMAP_IFC. The IVF on-disk reader rejects the
+# combined flags, and older faiss builds only know IO_FLAG_MMAP
+MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+MMAP_IFC_IO_FLAGS = MMAP_IO_FLAGS | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+# Filters whose matching ids (and FAISS selectors) are kept per loaded snapshot
+FILTER_CACHE_SIZE = 64
+
+MANIFEST_LOCK_PATH = os.path.join(FAISS_SEGMENTS_DIR, "manifest.lock")
+COMPACTION_LOCK_PATH = os.path.join(FAISS_SEGMENTS_DIR, "compaction.lock")
+
+
+def normalize_config(index_type: str, encoding: str) -> tuple[str, str]:
+    """
+    IVF with PQ codes is ivf_pq whichever way it was asked for.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {sorted(INDEX_TYPES)})")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown FAISS vector encoding: {encoding} (expected one of {sorted(ENCODINGS)})")
+
+    if index_type == "ivf_pq" or (index_type == "ivf_flat" and encoding == "pq"):
+        return "ivf_pq", "pq"
+    return index_type, encoding
+
+
+def build_index(dim: int, index_type: str, encoding: str = "float32") -> faiss.Index:
+    """
+    Create an empty (possibly untrained) index of the given type and encoding.
+    """
+    index_type, encoding = normalize_config(index_type, encoding)
+
+    if index_type == "flat":
+        if encoding == "float32":
+            return faiss.IndexFlatL2(dim)
+        if encoding == "pq":
+            return faiss.IndexPQ(dim, FAISS_PQ_M, 8)
+        return faiss.IndexScalarQuantizer(dim, SQ_TYPES[encoding], faiss.METRIC_L2)
+
+    if index_type == "ivf_flat":
+        quantizer = faiss.IndexFlatL2(dim)
+        if encoding == "float32":
+            return faiss.IndexIVFFlat(quantizer, dim, FAISS_IVF_NLIST)
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, FAISS_IVF_NLIST, SQ_TYPES[encoding], faiss.METRIC_L2)
+
+    if index_type == "ivf_pq":
+        quantizer = faiss.IndexFlatL2(dim)
+        return faiss.IndexIVFPQ(quantizer, dim, FAISS_IVF_NLIST, FAISS_PQ_M, 8)
+
+    if encoding == "float32":
+        index = faiss.IndexHNSWFlat(dim, FAISS_HNSW_M)
+    elif encoding == "pq":
+        index = faiss.IndexHNSWPQ(dim, FAISS_PQ_M, FAISS_HNSW_M)
+    else:
+        index = faiss.IndexHNSWSQ(dim, SQ_TYPES[encoding], FAISS_HNSW_M)
+    index.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+    return index
+
+
+def _codes_encoding(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "float32"
+
+
+def is_id_map(index: faiss.Index) -> bool:
+    return isinstance(faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIDMap2))
+
+
+def index_config(index: faiss.Index) -> tuple[str, str]:
+    """
+    Map a (loaded) FAISS index back to its (index type, encoding).
+    """
+    index = faiss.downcast_index(index)
+    if is_id_map(index):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw", _codes_encoding(index.storage)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq", "pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat", _codes_encoding(index)
+    return "flat", _codes_encoding(index)
+
+
+def index_kind(index: faiss.Index) -> str:
+    return index_config(index)[0]
+
+
+def min_train_size(index_type: str, encoding: str = "float32") -> int:
+    index_type, encoding = normalize_config(index_type, encoding)
+    if index_type in {"ivf_flat", "ivf_pq"}:
+        return FAISS_IVF_NLIST * IVF_MIN_TRAIN_PER_LIST
+    if encoding == "pq":
+        return PQ_MIN_TRAIN
+    if encoding == "int8":
+        return SQ_MIN_TRAIN
+    return 0
+
+
+def takes_selector(index: faiss.Index) -> bool:
+    # IndexPQ::search rejects any search parameters, so flat PQ segments
+    # are searched without a selector and filtered afterwards
+    return index_config(index) != ("flat", "pq")
+
+
+def search_parameters(index: faiss.Index, nprobe: int = None, ef_search: int = None, sel=None):
+    """
+    Per-call search parameters, so concurrent readers never mutate the shared index.
+    `sel` (an IDSelector) restricts the search to the ids it accepts; only
+    pass one when takes_selector(index).
+    """
+    kind = index_kind(index)
+    if kind in {"ivf_flat", "ivf_pq"}:
+        return faiss.SearchParametersIVF(nprobe=nprobe or FAISS_IVF_NPROBE, sel=sel)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or FAISS_HNSW_EF_SEARCH, sel=sel)
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+def id_selector(ids: np.ndarray) -> faiss.IDSelector:
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    # IDSelectorBatch copies the ids into its own hash set
+    return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+
+
+def rerank_exact(query: np.ndarray, candidate_ids: np.ndarray, vectors: np.ndarray, k: int):
+    """
+    Re-score candidates with exact L2 against full-precision vectors.
+    Returns (distances, ids) of the best k, closest first.
+    """
+    ids = np.sort(candidate_ids[candidate_ids >= 0])  # sorted ids -> sequential reads from the memmap
+    if len(ids) == 0:
+        return np.empty(0, dtype="float32"), ids
+
+    diff = np.asarray(vectors[ids], dtype="float32") - query
+    distances = np.einsum("ij,ij->i", diff, diff)
+    order = np.argsort(distances)[:k]
+    return distances[order], ids[order]
+
+
+def truncate_vectors(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Matryoshka truncation: keep the first `dim` components and renormalize.
+    text-embedding-3 vectors are trained so that a prefix is itself a usable embedding.
+    """
+    # Always a copy: normalize_L2 works in place, and a one-row prefix
+    # slice is already contiguous, so ascontiguousarray would return a view
+    prefix = np.array(vectors[:, :dim], dtype="float32", copy=True)
+    faiss.normalize_L2(prefix)
+    return prefix
+
+
+# -----------------------------------------------------------------------------
+# Segments & manifest
+# -----------------------------------------------------------------------------
+
+class Segment:
+    """
+    One immutable FAISS index file. Segments are IndexIDMap2 indexes that
+    return FAISS ids directly; segments written before ids were stored
+    (including a legacy faiss.index) hold ids [start, start + count) by position.
+    """
+
+    def __init__(self, index: faiss.Index, start: int = None, file: str = None):
+        self.index = index
+        self.start = start
+        self.file = file
+        self.offset = 0 if is_id_map(index) else start
+
+    @property
+    def count(self) -> int:
+        return self.index.ntotal
+
+    def ids(self) -> np.ndarray:
+        index = faiss.downcast_index(self.index)
+        if is_id_map(index):
+            return faiss.vector_to_array(index.id_map)
+        return np.arange(self.count, dtype="int64") + self.start
+
+    def vectors(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, vectors) rebuilt from the index codes (lossy for compressed encodings).
+        """
+        ids = self.ids()
+        index = faiss.downcast_index(self.index)
+        if is_id_map(index):
+            index = faiss.downcast_index(index.index)
+
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        return ids, index.reconstruct_n(0, index.ntotal)
+
+
+def segment_path(file: str) -> str:
+    return os.path.join(FAISS_SEGMENTS_DIR, file)
+
+
+def read_manifest():
+    try:
+        with open(FAISS_MANIFEST_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(manifest: dict):
+    """
+    Publish a manifest atomically as the next snapshot version; readers see
+    the old or the new one. Caller holds MANIFEST_LOCK_PATH.
+    """
+    manifest["version"] = manifest.get("version", 0) + 1
+    tmp = FAISS_MANIFEST_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, FAISS_MANIFEST_PATH)
+
+
+def write_index_file(index: faiss.Index, prefix: str = "seg") -> str:
+    """
+    Write `index` under a fresh, never reused name in the segments directory.
+    """
+    os.makedirs(FAISS_SEGMENTS_DIR, exist_ok=True)
+    file = f"{prefix}-{uuid.uuid4().hex}.index"
+    faiss.write_index(index, segment_path(file) + ".tmp")
+    os.replace(segment_path(file) + ".tmp", segment_path(file))
+    return file
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """
+    Memory-map an index file, whatever its kind. The kind is only known once
+    read, so flat code mapping is tried first and IVF files fall back.
+    """
+    if MMAP_IFC_IO_FLAGS != MMAP_IO_FLAGS:
+        try:
+            return faiss.read_index(path, MMAP_IFC_IO_FLAGS)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path, MMAP_IO_FLAGS)
+
+
+def read_index_file(file: str, mmap: bool = False) -> faiss.Index:
+    """
+    Read a segment file. With `mmap` the index data stays in the file and is
+    paged in on demand; the index must then never be modified.
+    """
+    path = segment_path(file)
+    if not os.path.exists(path):
+        # Compaction removed it after we read the manifest
+        raise FileNotFoundError(path)
+    if mmap:
+        return read_index_mmap(path)
+    return faiss.read_index(path)
+
+
+def too_many_tombstones(manifest: dict) -> bool:
+    deleted = len(manifest.get("deleted", []))
+    return deleted > max(MIN_TOMBSTONES_FOR_COMPACTION, manifest["next_id"] * MAX_TOMBSTONE_RATIO)
+
+
+def can_train(manifest: dict, index_type: str, encoding: str) -> bool:
+    """
+    Enough live vectors to train `index_type` for the first time. Counts
+    live vectors, as compaction does: until tombstoned rows are replaced,
+    compacting again would only rebuild the same untrained index.
+    """
+    needed = min_train_size(index_type, encoding)
+    live = manifest["next_id"] - len(manifest.get("deleted", []))
+    return bool(needed) and manifest["trained"] is None and live >= needed
+
+
+def empty_manifest(dim: int, embedding_dim: int) -> dict:
+    # dim: what the index stores (a Matryoshka prefix when coarse);
+    # embedding_dim: the full vectors, i.e. the embedding provider's output
+    return {"next_id": 0, "dim": dim, "embedding_dim": embedding_dim, "trained": None, "segments": [], "deleted": []}
+
 
 class FaissStore:
-    def __init__(self, dim=3072):
-        self.index = faiss.IndexFlatL2(dim)
-        self.metadata = []
+    """
+    Vector index split into append-only segments.
+
+    Every save() writes the vectors added since load() as one new segment and
+    publishes it through the manifest, so ingest cost is proportional to the
+    document, not the corpus. Searches merge hits across segments. Once there
+    are more than FAISS_MAX_SEGMENTS, a background thread merges the smallest
+    ones; compact() folds them all back into one.
+
+    Every vector has a stable FAISS id (row in the metadata store and in the
+    full-vector file). Removing a document publishes its ids as tombstones,
+    which searches skip and compaction drops.
+
+    Each manifest is an immutable snapshot (its `version` counts publishes).
+    Writers serialize on MANIFEST_LOCK_PATH only while publishing, after
+    writing new files under fresh names; readers never lock and keep serving
+    the snapshot they loaded, whose segments, vector rows and metadata rows
+    stay valid until they load the next one.
+
+    load(mmap=True) opens the store read-only: segments and metadata are
+    memory-mapped, so serving processes share the page cache and start
+    without reading whole files. Such a store cannot be written to.
+    """
+
+    def __init__(self, dim=None, index_type=None, encoding=None, coarse_dim=None):
+        self.dim = dim or EMBEDDING_DIM
+        self.index_type, self.encoding = normalize_config(
+            index_type or FAISS_INDEX_TYPE, encoding or FAISS_VECTOR_ENCODING
+        )
+        self.coarse_dim = FAISS_COARSE_DIM if coarse_dim is None else coarse_dim
+        if self.coarse_dim >= self.dim:
+            self.coarse_dim = 0
+
+        # Published segments, the next FAISS id, and deleted ids not compacted yet
+        self.segments = []
+        self.next_id = 0
+        self.deleted = np.empty(0, dtype="int64")
+        # Manifest version this store reflects (0 = nothing published yet)
+        self.version = 0
+        # Empty, trained index that new segments of trained types are cloned from
+        self.trained = None
+        self._manifest = empty_manifest(self.index_dim, self.dim)
+
+        # Chunk metadata lives in SQLite keyed by FAISS id
+        self.meta = MetadataStore()
+
+        # Full-precision copy of every vector, row i == FAISS id i.
+        # Memory-mapped from FAISS_VECTORS_PATH
+        self.full_vectors = None
+
+        # Vectors added since load(), and documents they replace; written by save()
+        self._pending = []
+        self._pending_meta = []
+        self._replace_documents = set()
+        self.read_only = False
+
+        # Filter -> matching ids / per-segment selectors, valid for this
+        # snapshot. Concurrent requests share the store, hence the lock
+        self._filter_ids = {}
+        self._selectors = {}
+        self._filter_lock = threading.Lock()
+
+    @property
+    def index_dim(self) -> int:
+        return self.coarse_dim or self.dim
+
+    @property
+    def ntotal(self) -> int:
+        return self.next_id
+
+    def _index_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        if self.coarse_dim:
+            return truncate_vectors(vectors, self.coarse_dim)
+        return vectors
+
+    def _new_segment_index(self) -> faiss.Index:
+        if self.trained is not None:
+            return faiss.clone_index(self.trained)
+        if min_train_size(self.index_type, self.encoding):
+            # Not enough data to train yet; compaction upgrades it later
+            return faiss.IndexFlatL2(self.index_dim)
+        return build_index(self.index_dim, self.index_type, self.encoding)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("FaissStore was loaded read-only (mmap); load() a separate store to write")
 
     def add(self, vectors, meta):
-        self.index.add(np.array(vectors).astype("float32"))
-        self.metadata.extend(meta)
+        self._check_writable()
+        vectors = np.array(vectors).astype("float32")
+        self._pending_meta.extend(meta)
+        self._pending.append(vectors)
+
+    def upsert(self, vectors, meta):
+        """
+        Like add(), but every document in `meta` replaces its previously
+        stored chunks when save() publishes.
+        """
+        self.add(vectors, meta)
+        self._replace_documents.update(m["document_id"] for m in meta)
+
+    def can_rerank(self) -> bool:
+        lossy = self.coarse_dim or any(index_config(seg.index)[1] != "float32" for seg in self.segments)
+        return bool(lossy) and self.full_vectors is not None and len(self.full_vectors) >= self.next_id
+
+    def _reset_filters(self):
+        with self._filter_lock:
+            self._filter_ids = {}
+            self._selectors = {}
+
+    def _filter(self, language: str = None, document_id: str = None):
+        """
+        (key, sorted live ids in this snapshot matching the filter), or None
+        without a filter. Cached per store, so repeated filters (e.g.
+        per-language traffic) behave like a prebuilt partition.
+        """
+        if language is None and document_id is None:
+            return None
+
+        key = (language, document_id)
+        with self._filter_lock:
+            ids = self._filter_ids.get(key)
+        if ids is not None:
+            return key, ids
+
+        # Looked up outside the lock: two requests may both compute a new
+        # filter, and the second simply replaces the first's identical ids
+        ids = np.array(self.meta.ids_matching(language, document_id), dtype="int64")
+        # Rows published after this snapshot are not in its segments
+        ids = np.setdiff1d(ids[ids < self.next_id], self.deleted, assume_unique=True)
+        with self._filter_lock:
+            if key not in self._filter_ids and len(self._filter_ids) >= FILTER_CACHE_SIZE:
+                evicted = next(iter(self._filter_ids))
+                del self._filter_ids[evicted]
+                self._selectors = {k: v for k, v in self._selectors.items() if k[0] != evicted}
+            self._filter_ids[key] = ids
+        return key, ids
+
+    def _selector(self, seg: Segment, key: tuple, ids: np.ndarray, exclude: bool = False) -> faiss.IDSelector:
+        # IDMap segments select by FAISS id and share one selector;
+        # positional segments need their own, shifted to local ids.
+        # With `exclude` the selector admits every id except `ids`
+        local = not is_id_map(seg.index)
+        cache_key = (key, seg.file if local else None)
+        with self._filter_lock:
+            sel = self._selectors.get(cache_key)
+            if sel is None:
+                if local:
+                    ids = ids[(ids >= seg.start) & (ids < seg.start + seg.count)] - seg.start
+                sel = id_selector(ids)
+                if exclude:
+                    sel = faiss.IDSelectorNot(sel)
+                self._selectors[cache_key] = sel
+        return sel
 
-    def search(self, query_vec, k=5):
-        D, I = self.index.search(
-            np.array([query_vec]).astype("float32"), k
+    def _search_ids(self, queries: np.ndarray, k: int, nprobe=None, ef_search=None, subset=None):
+        """
+        Nearest live FAISS ids for each row of `queries`, one search call per
+        segment for the whole batch. Returns [(distances, ids)] per query,
+        closest first. `subset` is a (key, allowed ids) pair from _filter().
+        """
+        empty = (np.empty(0, dtype="float32"), np.empty(0, dtype="int64"))
+        if subset is not None:
+            key, allowed = subset
+            if len(allowed) == 0:
+                return [empty] * len(queries)
+            if len(allowed) <= FAISS_FILTER_EXACT_MAX and self.full_vectors is not None \
+                    and len(self.full_vectors) >= self.next_id:
+                # Small subsets (one document, a rare language): exact scan
+                # beats an index search that would mostly visit other ids
+                return [rerank_exact(query, allowed, self.full_vectors, k) for query in queries]
+
+        rerank = self.can_rerank()
+
+        fetch = k
+        if rerank:
+            fetch = max(k * FAISS_RERANK_FACTOR, FAISS_COARSE_CANDIDATES if self.coarse_dim else 0)
+
+        probe = self._index_vectors(queries)
+        distances, ids = [], []
+        post_filter = False
+        for seg in self.segments:
+            sel = None
+            seg_fetch = fetch
+            if not takes_selector(seg.index):
+                # Flat PQ scans every code anyway: over-fetch (all codes when
+                # filtering) and drop what a selector would have rejected below
+                seg_fetch = seg.count if subset is not None else fetch + len(self.deleted)
+                post_filter = True
+            elif subset is not None:
+                # The selector only admits live matching ids: no over-fetch
+                sel = self._selector(seg, key, allowed)
+            elif len(self.deleted):
+                # Tombstones are skipped inside the search, so they cannot starve the top k
+                sel = self._selector(seg, None, self.deleted, exclude=True)
+            seg_fetch = min(seg_fetch, seg.count)
+            if seg_fetch == 0:
+                continue
+            D, I = seg.index.search(probe, seg_fetch, params=search_parameters(seg.index, nprobe, ef_search, sel))
+            distances.append(D)
+            # FAISS pads with -1 when a segment holds fewer than `fetch` vectors
+            ids.append(np.where(I >= 0, I + seg.offset, -1))
+
+        if not ids:
+            return [empty] * len(queries)
+
+        distances, ids = np.hstack(distances), np.hstack(ids)
+        dropped = ids < 0
+        if post_filter:
+            # Hits from segments searched without a selector
+            if subset is not None:
+                dropped |= ~np.isin(ids, allowed)
+            elif len(self.deleted):
+                dropped |= np.isin(ids, self.deleted)
+        distances = np.where(dropped, np.inf, distances)
+
+        order = np.argsort(distances, axis=1)[:, :fetch]
+        distances = np.take_along_axis(distances, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+
+        results = []
+        for query, D, I in zip(queries, distances, ids):
+            live = np.isfinite(D)
+            D, I = D[live], I[live]
+            if rerank:
+                D, I = rerank_exact(query, I, self.full_vectors, k)
+            results.append((D[:k], I[:k]))
+        return results
+
+    def search(self, query_vec, k=5, nprobe=None, ef_search=None, language=None, document_id=None):
+        """
+        Top-k chunk metadata for one query vector, optionally restricted to
+        one language and/or document.
+        """
+        query = np.array([query_vec]).astype("float32")
+        subset = self._filter(language, document_id)
+        _, ids = self._search_ids(query, k, nprobe, ef_search, subset)[0]
+        return self.meta.get(ids)
+
+    def search_many(self, query_vecs, k=5, nprobe=None, ef_search=None,
+                    language=None, document_id=None) -> list[list[dict]]:
+        """
+        Batched search: per-query chunk metadata, closest first, each with a
+        "score" (cosine similarity for unit-length embeddings).
+        """
+        queries = np.array(query_vecs).astype("float32").reshape(-1, self.dim)
+        if len(queries) == 0:
+            return []
+
+        subset = self._filter(language, document_id)
+        hits = self._search_ids(queries, k, nprobe, ef_search, subset)
+        rows = self.meta.get_by_id(np.unique(np.concatenate([ids for _, ids in hits])))
+        return [
+            [{**rows[int(i)], "score": float(1 - d / 2)} for d, i in zip(D, I) if int(i) in rows]
+            for D, I in hits
+        ]
+
+    def _reconstruct_published(self) -> np.ndarray:
+        """
+        Published vectors rebuilt from the segment codes (lossy for compressed encodings).
+        """
+        if self.coarse_dim:
+            raise RuntimeError("Full vectors are missing and cannot be reconstructed from a coarse index")
+
+        vectors = np.zeros((self.next_id, self.dim), dtype="float32")
+        for seg in self.segments:
+            ids, seg_vectors = seg.vectors()
+            vectors[ids] = seg_vectors
+        return vectors
+
+    def vectors(self) -> np.ndarray:
+        """
+        All vectors in FAISS id order, including ones not saved yet. Exact when
+        the full-precision side file is complete.
+        """
+        if self.full_vectors is not None and len(self.full_vectors) >= self.next_id:
+            published = np.asarray(self.full_vectors[:self.next_id])
+        else:
+            published = self._reconstruct_published()
+        return np.vstack([published] + self._pending)
+
+    def describe(self) -> str:
+        kinds = sorted({"/".join(index_config(seg.index)) for seg in self.segments}) or ["empty"]
+        return (f"{', '.join(kinds)} d={self.index_dim} ({len(self.segments)} segments, "
+                f"{self.next_id} vectors, version {self.version})")
+
+    def _full_vectors_on_disk(self) -> int:
+        if not os.path.exists(FAISS_VECTORS_PATH):
+            return 0
+        return os.path.getsize(FAISS_VECTORS_PATH) // (self.dim * 4)
+
+    def _backfill_full_vectors(self, upto: int):
+        """
+        Stores that predate the side file: rebuild rows [on disk, upto) from
+        the loaded segments. Caller holds the manifest lock.
+        """
+        on_disk = self._full_vectors_on_disk()
+        if on_disk >= upto:
+            return
+        if self.next_id < upto:
+            raise RuntimeError(f"Full vector file has {on_disk} rows, {upto} are published")
+
+        with open(FAISS_VECTORS_PATH, "r+b" if os.path.exists(FAISS_VECTORS_PATH) else "wb") as f:
+            f.seek(on_disk * self.dim * 4)
+            f.write(np.ascontiguousarray(self._reconstruct_published()[on_disk:upto], dtype="float32").tobytes())
+        log_event("vectorstore.backfill_full_vectors", metadata={"rows": upto - on_disk})
+
+    def _save_full_vectors(self, start: int):
+        """
+        Write pending vectors as rows [start, start + n) of the side file.
+        Caller holds the manifest lock.
+        """
+        row_bytes = self.dim * 4
+        self._backfill_full_vectors(start)
+
+        with open(FAISS_VECTORS_PATH, "r+b" if os.path.exists(FAISS_VECTORS_PATH) else "wb") as f:
+            # Rows past `start` were never published, and readers only
+            # touch rows below their manifest's next_id
+            f.truncate(start * row_bytes)
+            f.seek(start * row_bytes)
+            for block in self._pending:
+                f.write(block.tobytes())
+
+        self._open_full_vectors()
+
+    def _open_full_vectors(self):
+        row_bytes = self.dim * 4
+        size = os.path.getsize(FAISS_VECTORS_PATH) if os.path.exists(FAISS_VECTORS_PATH) else 0
+        if size < row_bytes:
+            self.full_vectors = None
+            return
+        self.full_vectors = np.memmap(
+            FAISS_VECTORS_PATH, dtype="float32", mode="r", shape=(size // row_bytes, self.dim)
         )
-        return [self.metadata[i] for i in I[0]]
 
     def save(self):
-        os.makedirs(os.path.dirname(FAISS_INDEX_PATH), exist_ok=True)
-        faiss.write_index(self.index, FAISS_INDEX_PATH)
-        pickle.dump(self.metadata, open(METADATA_PATH, "wb"))
-
-    def load(self):
-        if not os.path.exists(FAISS_INDEX_PATH):
-            raise FileNotFoundError("FAISS index not found")
-        
-        self.index = faiss.read_index(FAISS_INDEX_PATH)
-        self.metadata = pickle.load(open(METADATA_PATH, "rb"))
+        """
+        Publish the vectors added since load() as one new segment.
+        Cost is proportional to what was added, not to the corpus.
+        """
+        if not self._pending:
+            return
+
+        self._check_writable()
+        vectors = np.vstack(self._pending)
+        os.makedirs(FAISS_SEGMENTS_DIR, exist_ok=True)
+        with file_lock(MANIFEST_LOCK_PATH):
+            # Another writer may have published since we loaded
+            manifest = read_manifest() or self._manifest
+            if manifest["dim"] != self.index_dim:
+                raise RuntimeError(
+                    f"Store index dim {self.index_dim} does not match published dim {manifest['dim']}"
+                )
+            start = manifest["next_id"]
+            ids = np.arange(start, start + len(vectors), dtype="int64")
+            replaced = self.meta.ids_for_documents(self._replace_documents)
+
+            # Full vectors and metadata first: a published segment only
+            # references rows that are already on disk
+            self._save_full_vectors(start)
+            self.meta.write(start, self._pending_meta)
+
+            index = faiss.IndexIDMap2(self._new_segment_index())
+            index.add_with_ids(self._index_vectors(vectors), ids)
+            segment = Segment(index, start, write_index_file(index))
+
+            manifest["segments"].append({"file": segment.file, "start": start, "count": segment.count})
+            manifest["next_id"] = start + segment.count
+            manifest["embedding_dim"] = self.dim
+            manifest["deleted"] = sorted(set(manifest.get("deleted", [])) | set(replaced))
+            write_manifest(manifest)
+            # Only after publishing: readers of the previous snapshot still
+            # resolve the replaced rows, and a crash before this point leaves
+            # them findable so the next upsert tombstones them again
+            self.meta.mark_deleted(replaced)
+
+        self.segments.append(segment)
+        self.version = manifest["version"]
+        self.next_id = manifest["next_id"]
+        self.deleted = np.array(manifest["deleted"], dtype="int64")
+        self._reset_filters()
+        self._manifest = manifest
+        self._pending = []
+        self._pending_meta = []
+        self._replace_documents = set()
+
+        if self.needs_compaction(manifest):
+            start_background_compaction()
+
+    def remove_document(self, doc_id: str) -> int:
+        """
+        Delete every chunk of `doc_id`. Returns the number of vectors removed.
+        """
+        self._check_writable()
+        os.makedirs(FAISS_SEGMENTS_DIR, exist_ok=True)
+        with file_lock(MANIFEST_LOCK_PATH):
+            ids = self.meta.ids_for_documents([doc_id])
+            if not ids:
+                return 0
+
+            manifest = read_manifest() or self._manifest
+            manifest["deleted"] = sorted(set(manifest.get("deleted", [])) | set(ids))
+            write_manifest(manifest)
+            self.meta.mark_deleted(ids)
+
+        self.version = manifest["version"]
+        self.deleted = np.array(manifest["deleted"], dtype="int64")
+        self._reset_filters()
+        self._manifest = manifest
+        log_event("vectorstore.remove_document", metadata={"document_id": doc_id, "vectors": len(ids)})
+
+        if self.needs_compaction(manifest):
+            start_background_compaction()
+        return len(ids)
+
+    def needs_compaction(self, manifest: dict) -> bool:
+        return (
+            len(manifest["segments"]) > FAISS_MAX_SEGMENTS
+            or too_many_tombstones(manifest)
+            or can_train(manifest, self.index_type, self.encoding)
+        )
+
+    def load(self, previous: "FaissStore" = None, read_segments: bool = True, mmap: bool = False):
+        """
+        Load the published manifest. Segments already held by `previous` are
+        reused instead of read again (segment files are immutable). Writers
+        that only append can pass read_segments=False. mmap=True maps the
+        segment files and opens the metadata read-only.
+        """
+        if mmap:
+            self.read_only = True
+            self.meta = MetadataStore(read_only=True)
+
+        # A concurrent compaction can delete segment files between reading
+        # the manifest and opening them; the new manifest is then consistent
+        for attempt in range(3):
+            try:
+                return self._load(previous, read_segments)
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _load(self, previous: "FaissStore", read_segments: bool):
+        mmap = self.read_only
+        manifest = read_manifest()
+
+        if manifest is None:
+            if not os.path.exists(FAISS_INDEX_PATH):
+                raise FileNotFoundError("FAISS index not found")
+
+            # Pre-segment layout: the single index file becomes segment 0
+            legacy = read_index_mmap(FAISS_INDEX_PATH) if mmap else faiss.read_index(FAISS_INDEX_PATH)
+            file = os.path.relpath(FAISS_INDEX_PATH, FAISS_SEGMENTS_DIR)
+            manifest = {
+                "next_id": legacy.ntotal,
+                "dim": legacy.d,
+                "trained": None,
+                "segments": [{"file": file, "start": 0, "count": legacy.ntotal}],
+                "deleted": [],
+            }
+            segments = [Segment(legacy, 0, file)]
+        elif read_segments:
+            reuse = previous is not None and previous.read_only == mmap
+            loaded = {seg.file: seg for seg in previous.segments} if reuse else {}
+            segments = [
+                loaded.get(s["file"]) or Segment(read_index_file(s["file"], mmap), s["start"], s["file"])
+                for s in manifest["segments"]
+            ]
+        else:
+            segments = []
+
+        embedding_dim = manifest.get("embedding_dim", self.dim)
+        if manifest["dim"] > self.dim or embedding_dim != self.dim:
+            raise RuntimeError(
+                f"FAISS index holds {embedding_dim}-dim embeddings, store expects {self.dim} "
+                f"(EMBEDDING_DIM / EMBEDDING_PROVIDER changed? re-ingest into a fresh data directory)"
+            )
+
+        if self.meta.max_id() < manifest["next_id"] - 1:
+            raise RuntimeError(
+                f"FAISS index has {manifest['next_id']} vectors but metadata ends at id {self.meta.max_id()}"
+            )
+
+        self.segments = segments
+        self.version = manifest.get("version", 0)
+        self.next_id = manifest["next_id"]
+        self.deleted = np.array(manifest.get("deleted", []), dtype="int64")
+        self._reset_filters()
+        self.trained = read_index_file(manifest["trained"]) if manifest["trained"] else None
+        # An index narrower than the embeddings is a Matryoshka coarse index
+        self.coarse_dim = manifest["dim"] if manifest["dim"] < self.dim else 0
+        self._manifest = manifest
+
+        self._pending = []
+        self._pending_meta = []
+        self._replace_documents = set()
+        self._open_full_vectors()
+
+        if any(index_config(seg.index)[1] != "float32" for seg in segments) or self.coarse_dim:
+            if not self.can_rerank():
+                log_event("vectorstore.rerank_unavailable", metadata={
+                    "vectors": self.next_id,
+                    "full_vectors": 0 if self.full_vectors is None else len(self.full_vectors),
+                })
+
+    def compact(self, index_type: str = None, encoding: str = None, coarse_dim: int = None, full: bool = True):
+        """
+        Merge all published segments into one index of the configured (or
+        given) type, rebuilt from the full-precision vectors. Trained index
+        types are trained here once enough vectors exist (and again only when
+        the type or dimension changes), and the trained empty index is kept
+        so later segments and compactions can be cloned from it.
+
+        With full=False only the smallest segments are merged (see
+        _merge_segments), unless training, tombstones or a dimension change
+        call for the full rebuild.
+        """
+        index_type, encoding = normalize_config(index_type or self.index_type, encoding or self.encoding)
+        if coarse_dim is None:
+            coarse_dim = self.coarse_dim
+        index_dim = coarse_dim if 0 < coarse_dim < self.dim else self.dim
+
+        # One compaction at a time across processes; ingests keep publishing
+        with file_lock(COMPACTION_LOCK_PATH):
+            self._compact(index_type, encoding, index_dim, full)
+
+    def _read_full(self, ids: np.ndarray, index_dim: int) -> np.ndarray:
+        block = np.asarray(self.full_vectors[ids], dtype="float32")
+        return truncate_vectors(block, index_dim) if index_dim < self.dim else block
+
+    def _merge_segments(self, manifest: dict, index_dim: int):
+        """
+        Tiered merge: fold the run of adjacent segments holding the fewest
+        vectors into one, until half of FAISS_MAX_SEGMENTS are left. A merged
+        segment is only rewritten again once newer ones have grown to its
+        size, so each vector is rewritten O(log corpus) times instead of on
+        every compaction. Tombstones in the merged segments are dropped.
+        """
+        segments = manifest["segments"]
+        n = max(len(segments) - FAISS_MAX_SEGMENTS // 2 + 1, 2)
+        # Neighbours only: merged segments keep their start in id order
+        first = min(range(len(segments) - n + 1), key=lambda i: sum(s["count"] for s in segments[i:i + n]))
+        merge = segments[first:first + n]
+        deleted = np.array(manifest.get("deleted", []), dtype="int64")
+
+        if manifest["trained"]:
+            inner = faiss.clone_index(read_index_file(manifest["trained"]))
+        else:
+            inner = self._new_segment_index()
+        index = faiss.IndexIDMap2(inner)
+        dropped = set()
+        for s in merge:
+            ids = Segment(read_index_file(s["file"], mmap=True), s["start"], s["file"]).ids()
+            live = np.setdiff1d(ids, deleted)
+            dropped.update(np.intersect1d(ids, deleted).tolist())
+            for block_start in range(0, len(live), COMPACTION_BLOCK):
+                block = live[block_start:block_start + COMPACTION_BLOCK]
+                index.add_with_ids(self._read_full(block, index_dim), block)
+        file = write_index_file(index)
+
+        with file_lock(MANIFEST_LOCK_PATH):
+            current = read_manifest()
+            # Ingests only append, and compactions hold COMPACTION_LOCK_PATH
+            merged = {s["file"] for s in merge}
+            kept = [s for s in current["segments"] if s["file"] not in merged]
+            start = min(s["start"] for s in merge)
+            current["segments"] = sorted(
+                kept + [{"file": file, "start": start, "count": index.ntotal}], key=lambda s: s["start"]
+            )
+            current["deleted"] = sorted(set(current.get("deleted", [])) - dropped)
+            write_manifest(current)
+            self.meta.purge(dropped)
+
+        for old in merged:
+            try:
+                os.remove(segment_path(old))
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                log_event("vectorstore.compact_cleanup_skipped", metadata={"file": old})
+
+        log_event("vectorstore.merge_segments", metadata={
+            "segments_merged": len(merge),
+            "segments_left": len(current["segments"]),
+            "vectors": index.ntotal,
+            "deleted_dropped": len(dropped),
+        })
+
+    def _compact(self, index_type: str, encoding: str, index_dim: int, full: bool = True):
+        with file_lock(MANIFEST_LOCK_PATH):
+            manifest = read_manifest()
+        if manifest is None:
+            # Legacy layout: publish it as a segment first
+            self.load()
+            with file_lock(MANIFEST_LOCK_PATH):
+                manifest = read_manifest()
+                if manifest is None:
+                    manifest = self._manifest
+                    write_manifest(manifest)
+
+        covered = manifest["next_id"]
+        deleted = set(manifest.get("deleted", []))
+        if self._full_vectors_on_disk() < covered:
+            self.load()
+            with file_lock(MANIFEST_LOCK_PATH):
+                self._backfill_full_vectors(self.next_id)
+            covered = self.next_id
+        self._open_full_vectors()
+
+        rebuild = (
+            full
+            or manifest["dim"] != index_dim
+            or too_many_tombstones(manifest)
+            or can_train(manifest, index_type, encoding)
+        )
+        if not rebuild:
+            if len(manifest["segments"]) > FAISS_MAX_SEGMENTS:
+                self._merge_segments(manifest, index_dim)
+            return
+
+        def add_live(index: faiss.Index, start: int, end: int, skip: set):
+            # Tombstoned ids are dropped here rather than carried forward
+            for block_start in range(start, end, COMPACTION_BLOCK):
+                ids = np.arange(block_start, min(block_start + COMPACTION_BLOCK, end), dtype="int64")
+                if skip:
+                    ids = np.setdiff1d(ids, np.fromiter(skip, dtype="int64"), assume_unique=True)
+                if len(ids):
+                    index.add_with_ids(self._read_full(ids, index_dim), ids)
+
+        inner = build_index(index_dim, index_type, encoding)
+        trained_file = None
+        if not inner.is_trained and manifest["trained"]:
+            # Trained by an earlier compaction; only a migration to another
+            # type, encoding or dimension has to train again
+            trained = read_index_file(manifest["trained"])
+            if index_config(trained) == (index_type, encoding) and trained.d == index_dim:
+                inner = faiss.clone_index(trained)
+                trained_file = manifest["trained"]
+        if not inner.is_trained:
+            needed = min_train_size(index_type, encoding)
+            live = np.setdiff1d(np.arange(covered, dtype="int64"), np.fromiter(deleted, dtype="int64"))
+            if len(live) >= needed:
+                sample_size = min(len(live), max(needed, FAISS_IVF_NLIST * IVF_MAX_TRAIN_PER_LIST))
+                sample = np.sort(np.random.default_rng(0).choice(live, sample_size, replace=False))
+                inner.train(self._read_full(sample, index_dim))
+                trained_file = write_index_file(inner, prefix="trained")
+            else:
+                inner = faiss.IndexFlatL2(index_dim)
+
+        index = faiss.IndexIDMap2(inner)
+        add_live(index, 0, covered, deleted)
+        file = write_index_file(index)
+
+        with file_lock(MANIFEST_LOCK_PATH):
+            current = read_manifest()
+            added = [s for s in current["segments"] if s["start"] >= covered]
+            # Deletes published while we were building still apply
+            remaining = set(current.get("deleted", [])) - deleted
+            dropped = set(deleted)
+
+            if added and current["dim"] != index_dim:
+                # Segments published meanwhile use the old dimension: fold them in
+                self._open_full_vectors()
+                folded = {i for i in remaining if i >= covered}
+                add_live(index, covered, current["next_id"], folded)
+                remaining -= folded
+                dropped |= folded
+                os.remove(segment_path(file))
+                file = write_index_file(index)
+                added = []
+
+            replaced = [s["file"] for s in current["segments"] if s not in added]
+            if current["trained"] and current["trained"] != trained_file:
+                replaced.append(current["trained"])
+
+            write_manifest({
+                "version": current.get("version", 0),
+                "next_id": current["next_id"],
+                "dim": index_dim,
+                "embedding_dim": self.dim,
+                "trained": trained_file,
+                "segments": [{"file": file, "start": 0, "count": index.ntotal}] + added,
+                "deleted": sorted(remaining),
+            })
+            # No published snapshot holds these vectors any more; readers of
+            # older snapshots filter them out with their own tombstone list
+            self.meta.purge(dropped)
+
+        # Readers that already loaded (or mapped) the old segments keep them
+        for old in replaced:
+            try:
+                os.remove(segment_path(old))
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                # Windows refuses to delete a file another process has mapped
+                log_event("vectorstore.compact_cleanup_skipped", metadata={"file": old})
+
+        log_event("vectorstore.compact", metadata={
+            "index_type": index_type,
+            "encoding": encoding,
+            "dim": index_dim,
+            "vectors": index.ntotal,
+            "segments_merged": len(replaced),
+            "deleted_dropped": len(dropped),
+        })
+
+    def migrate(self, index_type: str, encoding: str = "float32", coarse_dim: int = None):
+        """
+        Rebuild the whole store as `index_type`/`encoding` (optionally over the
+        first `coarse_dim` dimensions). FAISS ids are preserved.
+        """
+        self.index_type, self.encoding = normalize_config(index_type, encoding)
+        self.compact(index_type, encoding, coarse_dim)
+        self.load()
+
+
+# -----------------------------------------------------------------------------
+# Background compaction
+# -----------------------------------------------------------------------------
+
+_compaction_thread = None
+_compaction_lock = threading.Lock()
+
+
+def _run_compaction():
+    try:
+        FaissStore().compact(full=False)
+    except Exception as e:
+        log_error("vectorstore.compact", e)
+
+
+def start_background_compaction():
+    """
+    Compact in a daemon thread, at most one at a time per process.
+    """
+    global _compaction_thread
+
+    with _compaction_lock:
+        if _compaction_thread is not None and _compaction_thread.is_alive():
+            return
+        _compaction_thread = threading.Thread(target=_run_compaction, name="faiss-compaction", daemon=True)
+        _compaction_thread.start()
+
+
+# -----------------------------------------------------------------------------
+# Process-wide shared store
+# -----------------------------------------------------------------------------
+
+_shared_store = None
+_shared_signature = None
+_shared_lock = threading.Lock()
+
+
+def _files_signature():
+    """
+    (path, inode, mtime, size) of the manifest (or of the legacy index
+    file), or None if neither exists. Every publish renames a new manifest
+    into place, so the inode alone changes per snapshot version.
+
+    Segment files are immutable and metadata is not watched: SQLite readers
+    always see committed rows, and rows are committed before the segment
+    that references them is published.
+    """
+    for path in (FAISS_MANIFEST_PATH, FAISS_INDEX_PATH):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        return (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    return None
+
+
+def get_store() -> FaissStore:
+    """
+    Return the long-lived store for this process.
+
+    The manifest is only stat()ed on the hot path. When it changed on disk
+    (e.g. after an ingest) a fresh FaissStore is fully loaded, reusing the
+    segments that did not change, and then swapped in with a single reference
+    assignment, so readers always see either the
+    previous or the new index, never a half-loaded one.
+    """
+    global _shared_store, _shared_signature
+
+    signature = _files_signature()
+    store = _shared_store
+    if store is not None and signature == _shared_signature:
+        return store
+
+    with _shared_lock:
+        if _shared_store is not None and signature == _shared_signature:
+            return _shared_store
+
+        fresh = FaissStore()
+        if signature is not None:
+            try:
+                fresh.load(previous=_shared_store, mmap=FAISS_MMAP)
+            except Exception as e:
+                log_error("vectorstore.reload", e, metadata={"manifest": FAISS_MANIFEST_PATH})
+                if _shared_store is not None:
+                    # Keep serving the previous copy, retry on the next call
+                    return _shared_store
+                fresh = FaissStore()
+                signature = None
+
+        # Record the signature observed *before* loading: if the files were
+        # replaced while we were reading them, the next call reloads again
+        _shared_store = fresh
+        _shared_signature = signature
+        log_event("vectorstore.reload", metadata={
+            "version": fresh.version,
+            "vectors": fresh.ntotal,
+            "segments": len(fresh.segments),
+            "mmap": fresh.read_only,
+        })
+        return fresh
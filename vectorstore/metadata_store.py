@@ -0,0 +1,253 @@
+import os
+import json
+import pickle
+import sqlite3
+from app.config import METADATA_PATH, LEGACY_METADATA_PATH, FAISS_INDEX_PATH
+from app.sqlite import ThreadLocalConnection, connect, select_in
+from ingestion.dedup import simhash_bands, hamming
+from observability.logging import log_event
+
+COLUMNS = ("document_id", "chunk_id", "page_number", "language", "text")
+# Chunk keys stored outside the chunks row
+INDEXED_KEYS = {"simhash"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id          INTEGER PRIMARY KEY,    -- FAISS id
+    document_id TEXT NOT NULL,
+    chunk_id    TEXT NOT NULL,
+    page_number INTEGER,
+    language    TEXT,
+    text        TEXT,
+    extra       TEXT,                   -- JSON for any other chunk keys
+    deleted     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks (document_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_chunk_id ON chunks (chunk_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_language ON chunks (language);
+
+-- SimHash of each chunk, split into 16-bit bands for near-duplicate lookups
+CREATE TABLE IF NOT EXISTS chunk_fingerprints (
+    id      INTEGER PRIMARY KEY,        -- chunks.id
+    simhash INTEGER NOT NULL,           -- signed 64-bit
+    b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_b0 ON chunk_fingerprints (b0);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_b1 ON chunk_fingerprints (b1);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_b2 ON chunk_fingerprints (b2);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_b3 ON chunk_fingerprints (b3);
+"""
+
+INSERT = (
+    "INSERT INTO chunks (id, document_id, chunk_id, page_number, language, text, extra) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Let SQLite read pages through mmap instead of copying them into its cache
+MMAP_SIZE = 1 << 30
+
+
+def _signed(fingerprint: int) -> int:
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+class MetadataStore:
+    """
+    Chunk metadata in SQLite, keyed by FAISS id.
+
+    Replaces the pickled list: searches fetch only the rows they hit and
+    document lookups go through an index instead of a scan.
+
+    With read_only=True connections are opened with mode=ro and serve pages
+    through mmap, so query workers share the OS page cache for the file.
+
+    Deleted chunks are only marked: readers holding an older index snapshot
+    may still return their ids, so rows stay readable through get() until
+    compaction drops the vectors and purges them.
+    """
+
+    def __init__(self, path: str = METADATA_PATH, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self._conn = ThreadLocalConnection(lambda: self._connect(read_only))
+
+        if read_only and os.path.exists(path):
+            return
+
+        # Schema and legacy import need a writable connection, once
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect(read_only=False) if read_only else self._conn()
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+        self._import_legacy_pickle(conn)
+        if read_only:
+            conn.close()
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+            conn.row_factory = sqlite3.Row
+        else:
+            conn = connect(self.path, row_factory=sqlite3.Row)
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+        if "deleted" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE chunks ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+
+    def _import_legacy_pickle(self, conn: sqlite3.Connection):
+        """
+        One-off migration from metadata.pkl; list position == FAISS id.
+        Only alongside the legacy index those positions refer to.
+        """
+        if not os.path.exists(LEGACY_METADATA_PATH) or not os.path.exists(FAISS_INDEX_PATH):
+            return
+
+        if conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone():
+            return
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone():
+                return
+            with open(LEGACY_METADATA_PATH, "rb") as f:
+                metadata = pickle.load(f)
+            conn.executemany(INSERT, (self._row(i, meta) for i, meta in enumerate(metadata)))
+        log_event("metadata.import_legacy", metadata={"rows": len(metadata), "source": LEGACY_METADATA_PATH})
+
+    @staticmethod
+    def _row(row_id: int, meta: dict) -> tuple:
+        extra = {k: v for k, v in meta.items() if k not in COLUMNS and k not in INDEXED_KEYS}
+        return (
+            row_id,
+            meta["document_id"],
+            meta["chunk_id"],
+            meta.get("page_number"),
+            meta.get("language"),
+            meta.get("text"),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    @staticmethod
+    def _meta(row: sqlite3.Row) -> dict:
+        meta = {k: row[k] for k in COLUMNS if row[k] is not None}
+        if row["extra"]:
+            meta.update(json.loads(row["extra"]))
+        return meta
+
+    def write(self, start_id: int, metas: list[dict]):
+        """
+        Store `metas` under ids start_id, start_id + 1, ... Rows at or past
+        `start_id` belong to a writer that never published its index and are replaced.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM chunks WHERE id >= ?", (start_id,))
+            conn.execute("DELETE FROM chunk_fingerprints WHERE id >= ?", (start_id,))
+            conn.executemany(INSERT, (self._row(start_id + i, meta) for i, meta in enumerate(metas)))
+            conn.executemany(
+                "INSERT INTO chunk_fingerprints (id, simhash, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (start_id + i, _signed(meta["simhash"]), *simhash_bands(meta["simhash"]))
+                    for i, meta in enumerate(metas) if meta.get("simhash") is not None
+                )
+            )
+
+    def get(self, ids) -> list[dict]:
+        """
+        Metadata for `ids`, in the same order. Unknown ids are skipped.
+        """
+        ids = [int(i) for i in ids]
+        by_id = self.get_by_id(ids)
+        return [by_id[i] for i in ids if i in by_id]
+
+    def get_by_id(self, ids) -> dict[int, dict]:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+
+        rows = select_in(self._conn(), "SELECT * FROM chunks WHERE id IN ({keys})", ids)
+        return {row["id"]: self._meta(row) for row in rows}
+
+    def mark_deleted(self, ids):
+        """
+        Hide `ids` from document lookups; get() still resolves them.
+        """
+        conn = self._conn()
+        with conn:
+            conn.executemany("UPDATE chunks SET deleted = 1 WHERE id = ?", ((int(i),) for i in ids))
+
+    def purge(self, ids):
+        """
+        Drop rows for good, once no published index holds their vectors.
+        """
+        conn = self._conn()
+        with conn:
+            ids = [(int(i),) for i in ids]
+            conn.executemany("DELETE FROM chunks WHERE id = ?", ids)
+            conn.executemany("DELETE FROM chunk_fingerprints WHERE id = ?", ids)
+
+    def ids_for_documents(self, doc_ids) -> list[int]:
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return []
+
+        rows = select_in(self._conn(), "SELECT id FROM chunks WHERE document_id IN ({keys}) AND deleted = 0", doc_ids)
+        return [row[0] for row in rows]
+
+    def ids_matching(self, language: str = None, document_id: str = None) -> list[int]:
+        """
+        Ids of live chunks with the given language and/or document id, ascending.
+        """
+        clauses, params = ["deleted = 0"], []
+        if language is not None:
+            clauses.append("language = ?")
+            params.append(language)
+        if document_id is not None:
+            clauses.append("document_id = ?")
+            params.append(document_id)
+
+        rows = self._conn().execute(
+            f"SELECT id FROM chunks WHERE {' AND '.join(clauses)} ORDER BY id", params
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def has_near_duplicate(self, fingerprint: int, max_distance: int, exclude_document: str = None) -> bool:
+        """
+        Whether a live chunk (of another document than `exclude_document`)
+        has a SimHash within `max_distance` bits of `fingerprint`.
+        """
+        b0, b1, b2, b3 = simhash_bands(fingerprint)
+        rows = self._conn().execute(
+            "SELECT f.simhash FROM chunk_fingerprints f JOIN chunks c ON c.id = f.id "
+            "WHERE (f.b0 = ? OR f.b1 = ? OR f.b2 = ? OR f.b3 = ?) AND c.deleted = 0 AND c.document_id != ?",
+            (b0, b1, b2, b3, exclude_document or "")
+        )
+        return any(hamming(fingerprint, row[0] & (1 << 64) - 1) <= max_distance for row in rows)
+
+    def sample_texts(self, n: int, language: str = None) -> list[str]:
+        clause, params = ("AND language = ?", [language]) if language else ("", [])
+        rows = self._conn().execute(
+            f"SELECT text FROM chunks WHERE deleted = 0 AND text IS NOT NULL {clause} ORDER BY RANDOM() LIMIT ?",
+            (*params, n)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def document_exists(self, doc_id: str, below: int = None) -> bool:
+        """
+        Whether `doc_id` has live chunks; with `below`, only ids under it
+        count (rows are written before the segment holding them is published).
+        """
+        clause, params = ("AND id < ?", [below]) if below is not None else ("", [])
+        return self._conn().execute(
+            f"SELECT 1 FROM chunks WHERE document_id = ? AND deleted = 0 {clause} LIMIT 1", (doc_id, *params)
+        ).fetchone() is not None
+
+    def max_id(self) -> int:
+        row = self._conn().execute("SELECT MAX(id) FROM chunks").fetchone()
+        return -1 if row[0] is None else row[0]
@@ -0,0 +1,34 @@
+"""
+Rebuild the on-disk FAISS index as another index type and/or vector encoding.
+
+    python -m vectorstore.migrate --index-type hnsw
+    python -m vectorstore.migrate --index-type flat --encoding int8
+    python -m vectorstore.migrate --index-type flat --coarse-dim 256
+
+Running API processes pick up the migrated index automatically
+(see vectorstore.faiss_store.get_store).
+"""
+import argparse
+
+from vectorstore.faiss_store import FaissStore, INDEX_TYPES, ENCODINGS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the FAISS index to another index type")
+    parser.add_argument("--index-type", choices=sorted(INDEX_TYPES), required=True)
+    parser.add_argument("--encoding", choices=sorted(ENCODINGS), default="float32")
+    parser.add_argument("--coarse-dim", type=int, default=None,
+                        help="Index only the first N dimensions (0 = full dimension, default: keep current)")
+    args = parser.parse_args()
+
+    store = FaissStore()
+    store.load()
+    before = store.describe()
+
+    store.migrate(args.index_type, args.encoding, args.coarse_dim)
+
+    print(f"Migrated {before} -> {store.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+from ingestion.embeddings import embed_texts
+from vectorstore.faiss_store import FaissStore, get_store
+
+
+class Retriever:
+    """
+    Text-in, chunks-out search over the vector store.
+
+    search_many() embeds all queries in one embeddings call and runs one
+    FAISS search per segment for the whole batch, so bulk evaluation,
+    multi-query expansion or batched questions cost one round trip instead of N.
+    """
+
+    def __init__(self, store: FaissStore = None, k: int = 5):
+        # Without an explicit store, follow the process-wide one across reloads
+        self._store = store
+        self.k = k
+
+    @property
+    def store(self) -> FaissStore:
+        return self._store or get_store()
+
+    def search(self, query: str, k: int = None, language: str = None, document_id: str = None) -> list[dict]:
+        return self.search_many([query], k, language=language, document_id=document_id)[0]
+
+    def search_many(self, queries: list[str], k: int = None,
+                    language: str = None, document_id: str = None) -> list[list[dict]]:
+        """
+        Top-k chunks for each query, in query order, optionally restricted
+        to one language and/or document. Each chunk carries a "score"
+        (cosine similarity, higher is closer).
+        """
+        if not queries:
+            return []
+
+        vectors = embed_texts(queries)
+        return self.store.search_many(vectors, k or self.k, language=language, document_id=document_id)